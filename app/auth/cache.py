@@ -0,0 +1,189 @@
+import itertools
+import time
+import uuid
+from typing import Any, Dict, Optional, Set
+
+import jwt
+from fastapi_users import exceptions, models
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
+from fastapi_users.manager import BaseUserManager
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.events import snapshot
+from app.core.logger import bind_user
+from app.core.metrics import auth_attempts
+from app.core.pubsub import LocalPubSub, pubsub
+from app.models import User
+
+INVALIDATION_CHANNEL = "auth.invalidate"
+
+
+class TokenCache:
+    """
+    Bounded TTL cache of raw token -> user column snapshot.
+
+    Entries are dropped per user when the user changes. Invalidations are
+    broadcast over pub/sub so that every worker drops its copies. A per-user
+    generation prevents a lookup that raced with an invalidation from caching
+    the stale row it read.
+
+    A generation is a stamp never handed out before, and an invalidation
+    forgets the user's stamp. Generations are therefore bounded like the
+    entries: one that was evicted or expired only makes the next put() skip
+    caching, it can never match a stamp taken before an invalidation.
+    """
+
+    def __init__(
+        self, maxsize: int, ttl: float, bus: LocalPubSub, generation_ttl: float
+    ) -> None:
+        self._entries: TTLCache[Dict[str, Any]] = TTLCache(
+            maxsize, ttl, on_evict=self._forget_token
+        )
+        self._tokens_by_user: Dict[uuid.UUID, Set[str]] = {}
+        self._generations: TTLCache[int] = TTLCache(maxsize, generation_ttl)
+        self._stamps = itertools.count(1)
+        self._bus = bus
+        bus.subscribe(INVALIDATION_CHANNEL, self._on_invalidation)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(token)
+
+    def generation(self, user_id: uuid.UUID) -> int:
+        generation = self._generations.peek(user_id)
+        if generation is None:
+            generation = next(self._stamps)
+            self._generations.set(user_id, generation)
+        return generation
+
+    def put(
+        self, token: str, user: Dict[str, Any], ttl: float, generation: int
+    ) -> None:
+        user_id = user["id"]
+        if self._generations.peek(user_id) != generation:
+            return
+        self._entries.set(token, user, ttl)
+        self._tokens_by_user.setdefault(user_id, set()).add(token)
+
+    async def invalidate_user(self, user_id: uuid.UUID) -> None:
+        self._drop(user_id)
+        await self._bus.publish(INVALIDATION_CHANNEL, user_id.bytes)
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+    def _on_invalidation(self, message: bytes) -> None:
+        self._drop(uuid.UUID(bytes=message))
+
+    def _drop(self, user_id: uuid.UUID) -> None:
+        self._generations.delete(user_id)
+        for token in list(self._tokens_by_user.pop(user_id, ())):
+            self._entries.delete(token)
+
+    def _forget_token(self, token: str, user: Dict[str, Any]) -> None:
+        tokens = self._tokens_by_user.get(user["id"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user["id"]]
+
+
+token_cache = TokenCache(
+    settings.AUTH_CACHE_SIZE,
+    settings.AUTH_CACHE_TTL,
+    pubsub,
+    # A user's stamp is kept as long as any of their tokens may be in use
+    generation_ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+# Token -> user id for read_subject(); the token's signature alone vouches for it
+_subjects: TTLCache[str] = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+
+
+def _detached_user(user: Dict[str, Any]) -> User:
+    """
+    Rebuild a User from its snapshot as a detached instance: it carries its
+    identity key, so a later session.add() updates the row instead of inserting.
+    """
+    instance = User(**user)
+    make_transient_to_detached(instance)
+    return instance
+
+
+class CachedJWTStrategy(JWTStrategy[models.UP, models.ID]):
+    """
+    JWT strategy that skips signature verification and the user lookup for
+    tokens it has already resolved, for at most AUTH_CACHE_TTL seconds and
+    never past the token's own expiry.
+    """
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager[models.UP, models.ID]
+    ) -> Optional[models.UP]:
+        if token is None:
+            return None
+        user = await self._read_token(token, user_manager)
+        if user is None:
+            auth_attempts.inc("token", "failure")
+        else:
+            auth_attempts.inc("token", "success")
+            bind_user(user.id)
+        return user
+
+    def read_subject(self, token: str) -> Optional[str]:
+        """
+        Id of the user a token was issued to, or None for an invalid token.
+        Checks the signature and expiry only, without loading the user, for
+        callers that run before routing such as the rate limiter.
+        """
+        subject = _subjects.get(token)
+        if subject is not None:
+            return subject
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+        except jwt.PyJWTError:
+            return None
+        subject = data.get("sub")
+        if subject is None:
+            return None
+        ttl = settings.AUTH_CACHE_TTL
+        if data.get("exp") is not None:
+            ttl = min(ttl, data["exp"] - time.time())
+        if ttl > 0:
+            _subjects.set(token, subject, ttl)
+        return subject
+
+    async def _read_token(
+        self, token: str, user_manager: BaseUserManager[models.UP, models.ID]
+    ) -> Optional[models.UP]:
+        cached = token_cache.get(token)
+        if cached is not None:
+            return _detached_user(cached)
+
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+            user_id = data.get("sub")
+            if user_id is None:
+                return None
+        except jwt.PyJWTError:
+            return None
+
+        try:
+            parsed_id = user_manager.parse_id(user_id)
+            generation = token_cache.generation(parsed_id)
+            user = await user_manager.get(parsed_id)
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+        ttl = settings.AUTH_CACHE_TTL
+        if data.get("exp") is not None:
+            ttl = min(ttl, data["exp"] - time.time())
+        if ttl > 0:
+            token_cache.put(token, snapshot(user), ttl, generation)
+        return user
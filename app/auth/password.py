@@ -0,0 +1,113 @@
+"""
+Password hashing off the event loop.
+
+Argon2 and bcrypt are deliberately CPU-heavy: one login costs tens to hundreds
+of milliseconds of CPU. Run inline, that stalls every other request on the
+worker. `PooledPasswordHelper` runs hashing and verification in a bounded
+thread or process pool. A semaphore caps how many jobs are submitted at once,
+so a login storm queues cheaply on the event loop instead of in the pool.
+
+Hashes are created with the Argon2 parameters from the settings. Hashes made
+with other parameters, or with bcrypt, still verify. `verify_and_update`
+returns a fresh hash for them, which `UserManager.authenticate` stores, so
+changing the parameters migrates users as they log in.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional, Tuple, TypeVar
+
+from fastapi_users.password import PasswordHelper
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from pwdlib.hashers.bcrypt import BcryptHasher
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def _password_hash(time_cost: int, memory_cost: int, parallelism: int) -> PasswordHash:
+    # Built once per parameter set and process (pool workers included)
+    return PasswordHash(
+        (
+            Argon2Hasher(
+                time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+            ),
+            BcryptHasher(),
+        )
+    )
+
+
+def _params() -> Tuple[int, int, int]:
+    return (
+        settings.PASSWORD_ARGON2_TIME_COST,
+        settings.PASSWORD_ARGON2_MEMORY_COST,
+        settings.PASSWORD_ARGON2_PARALLELISM,
+    )
+
+
+# Module-level so that they can be pickled into a process pool
+def _hash(params: Tuple[int, int, int], password: str) -> str:
+    return _password_hash(*params).hash(password)
+
+
+def _verify_and_update(
+    params: Tuple[int, int, int], password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return _password_hash(*params).verify_and_update(password, hashed_password)
+
+
+class PooledPasswordHelper(PasswordHelper):
+    """
+    Password helper with async counterparts of `hash` and `verify_and_update`
+    that run in a bounded executor. The synchronous methods keep working and
+    use the same parameters.
+    """
+
+    def __init__(self, executor: str, workers: int, concurrency: int) -> None:
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        super().__init__(_password_hash(*_params()))
+        self._executor_kind = executor
+        self._workers = workers
+        self._executor: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _get_executor(self) -> Executor:
+        # Created on first use: a process pool must not be forked at import time
+        if self._executor is None:
+            if self._executor_kind == "process":
+                self._executor = ProcessPoolExecutor(self._workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    self._workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(_hash, _params(), password)
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self._run(_verify_and_update, _params(), plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_helper = PooledPasswordHelper(
+    settings.PASSWORD_HASH_EXECUTOR,
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_CONCURRENCY,
+)
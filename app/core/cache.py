@@ -0,0 +1,168 @@
+import hashlib
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+# How long a generation is kept; far longer than any in-flight load
+_GENERATION_TTL = 300.0
+
+
+class TTLCache(Generic[V]):
+    """
+    Bounded in-process LRU cache with a per-entry time to live.
+
+    Not thread-safe: meant to be used from the event loop thread only, where
+    every operation runs without interruption.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Optional[Callable[[Hashable, V], None]] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[V]:
+        """Like get(), but neither counted in the stats nor marked as recently used"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        while len(self._data) > self.maxsize:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+
+    def delete(self, key: Hashable) -> None:
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self) -> None:
+        for key in list(self._data):
+            self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        _, value = self._data.pop(key)
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+
+
+class ResponseCache:
+    """
+    Pre-serialized JSON bodies with strong ETags, keyed by resource id.
+
+    A body is only stored if the resource was not invalidated while it was being
+    loaded (per-key generation), nor during the last `quiet_period` seconds,
+    which keeps lagging read replicas from re-filling a stale body.
+
+    A generation is a stamp never handed out before, and invalidate() forgets
+    the key's stamp, so a generation that was evicted or expired cannot come
+    back equal to one taken before an invalidation: the body is just not
+    stored.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, quiet_period: float = 0.0) -> None:
+        self._entries: TTLCache[CachedResponse] = TTLCache(maxsize, ttl)
+        self._generations: TTLCache[int] = TTLCache(maxsize, _GENERATION_TTL)
+        self._stamps = itertools.count(1)
+        self._invalidated_at: TTLCache[float] = TTLCache(maxsize, quiet_period)
+        self.quiet_period = quiet_period
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self._entries.get(key)
+
+    def generation(self, key: Hashable) -> int:
+        """Stamp to pass to put() once the body is loaded"""
+        generation = self._generations.peek(key)
+        if generation is None:
+            generation = next(self._stamps)
+            self._generations.set(key, generation)
+        return generation
+
+    def put(self, key: Hashable, body: bytes, generation: int) -> CachedResponse:
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = CachedResponse(body, etag)
+        recently_invalidated = (
+            self.quiet_period > 0 and self._invalidated_at.peek(key) is not None
+        )
+        if self._generations.peek(key) == generation and not recently_invalidated:
+            self._entries.set(key, entry)
+        return entry
+
+    def invalidate(self, key: Hashable) -> None:
+        self._generations.delete(key)
+        self._entries.delete(key)
+        if self.quiet_period > 0:
+            self._invalidated_at.set(key, time.monotonic())
+
+    def respond(self, entry: CachedResponse, request: Request) -> Response:
+        """200 with the body, or 304 when If-None-Match already names this ETag."""
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or entry.etag in (tag.strip() for tag in if_none_match.split(","))
+        ):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        return dict(self._entries.stats(), not_modified=self.not_modified)
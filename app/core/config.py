@@ -1,6 +1,6 @@
 import os
 import secrets
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from pydantic import AnyHttpUrl, EmailStr, validator
 from pydantic_settings import BaseSettings
@@ -31,11 +31,182 @@ class Settings(BaseSettings):
     # Database configuration
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./test.db")
 
+    # Read replicas: comma-separated URLs; empty means all reads use the primary
+    DATABASE_REPLICA_URLS: str = ""
+    # "round_robin" or "least_connections"
+    REPLICA_SELECTION: str = "round_robin"
+    # Seconds a client's reads stay on the primary after it wrote
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Connection pool configuration
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Connections opened up front at startup (capped at the pool size)
+    DB_POOL_WARMUP: int = 5
+
+    # How repositories eagerly load relationships (User.profile, Ad.owner):
+    # "joined" (one query with LEFT OUTER JOINs) or "selectin" (one extra
+    # IN query per relationship). Lazy loading them raises instead.
+    EAGER_LOADING_STRATEGY: str = "joined"
+
+    # List endpoints (ads, ads by owner, profiles) select only the response
+    # columns and encode them in one pass instead of validating ORM objects
+    FAST_LIST_SERIALIZATION: bool = False
+
+    # Pagination
+    ADS_PAGE_SIZE: int = 20
+    ADS_MAX_PAGE_SIZE: int = 100
+
+    # Maximum number of items per request to the /ads/bulk endpoints
+    ADS_BULK_MAX_ITEMS: int = 1000
+
+    # Rows fetched per round trip by the NDJSON export endpoints
+    EXPORT_CHUNK_SIZE: int = 1000
+
+    # Matching
+    MATCHES_DEFAULT_LIMIT: int = 10
+    MATCHES_MAX_LIMIT: int = 100
+    # Distinct free-text values (habits, character...) that get their own code;
+    # further values count as unknown
+    MATCHING_VOCABULARY_SIZE: int = 10_000
+
+    # Full-text search
+    SEARCH_DEFAULT_LIMIT: int = 20
+    SEARCH_MAX_LIMIT: int = 100
+
+    # Nearby search (GET /ads/nearby)
+    NEARBY_DEFAULT_LIMIT: int = 20
+    NEARBY_MAX_LIMIT: int = 100
+    NEARBY_MAX_RADIUS_KM: float = 200.0
+
+    # Saved searches and their inbox of matching ads
+    SAVED_SEARCHES_PER_USER: int = 20
+    INBOX_PAGE_SIZE: int = 20
+    INBOX_MAX_PAGE_SIZE: int = 100
+
+    # Live ad feed (GET /ads/stream): open streams per worker, changes queued
+    # for a client that reads too slowly before it is disconnected, and the
+    # keep-alive interval of idle streams
+    STREAM_MAX_SUBSCRIBERS: int = 20_000
+    STREAM_QUEUE_SIZE: int = 100
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+
+    # Profile images: stored content-addressed under IMAGES_DIR
+    IMAGES_DIR: str = "./media/images"
+    IMAGES_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGES_PER_PROFILE: int = 10
+    # Thumbnails generated for every image: name -> longest side in pixels
+    IMAGES_THUMBNAIL_SIZES: Dict[str, int] = {"small": 160, "medium": 640}
+    # Thumbnail whose URL becomes UserProfile.image_url for the primary image
+    IMAGES_PROFILE_THUMBNAIL: str = "small"
+    # Process pool that validates images and renders thumbnails
+    IMAGES_PROCESS_WORKERS: int = 2
+    # Public URL prefix of the image files (a CDN in front of the app, say)
+    IMAGES_URL_PREFIX: str = "/api/v1/profiles/profiles/images"
+    # Behind nginx: hand file delivery over with X-Accel-Redirect to this
+    # internal location, which maps to IMAGES_DIR; served directly when unset
+    IMAGES_ACCEL_REDIRECT_PREFIX: Optional[str] = None
+
+    # Shared backend (pub/sub) for state that must agree across workers;
+    # when unset, every worker keeps in-process state only. Set it whenever
+    # more than one worker runs: the in-memory indexes (matching, search,
+    # nearby) learn of other workers' writes through it
+    REDIS_URL: Optional[str] = None
+
+    # Rate limiting per client (the user of a valid bearer token, else the
+    # client address; run uvicorn with --proxy-headers behind a proxy): token
+    # buckets of RATE_LIMIT_RATE requests per second and RATE_LIMIT_BURST at
+    # once, kept per worker ("local") or shared by all workers ("redis").
+    # Off by default: behind a proxy without --proxy-headers every anonymous
+    # client would share the proxy's address and bucket
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_BACKEND: str = "local"
+    RATE_LIMIT_RATE: float = 10.0
+    RATE_LIMIT_BURST: int = 50
+    # Stricter buckets of their own for expensive routes:
+    # "METHOD /path/template" -> (rate, burst)
+    RATE_LIMIT_ROUTES: Dict[str, Tuple[float, int]] = {
+        "GET /api/v1/ads/ads/": (2.0, 10),
+        "GET /api/v1/ads/ads/owner/{owner_id}": (2.0, 10),
+        "GET /api/v1/ads/ads/export": (0.1, 2),
+        "GET /api/v1/ads/ads/stream": (0.2, 5),
+        "GET /api/v1/profiles/profiles/": (1.0, 5),
+        "POST /api/v1/auth/jwt/login": (0.2, 5),
+        "POST /api/v1/auth/register": (0.1, 3),
+    }
+
+    # Load shedding: answer 503 while this many requests are in flight in the
+    # worker, or while database connections took longer than
+    # LOAD_SHED_DB_WAIT_SECONDS on average to check out of the pool over the
+    # last LOAD_SHED_WINDOW_SECONDS (or checkouts timed out)
+    LOAD_SHED_MAX_IN_FLIGHT: int = 500
+    LOAD_SHED_DB_WAIT_SECONDS: float = 0.5
+    LOAD_SHED_WINDOW_SECONDS: float = 1.0
+    # Never shed nor counted as in flight: monitoring and long-lived streams
+    LOAD_SHED_EXEMPT_PATHS: List[str] = [
+        "/metrics",
+        "/status/db-pool",
+        "/status/cache",
+        "/api/v1/ads/ads/stream",
+    ]
+
+    # Authenticated user cache: decoded token -> user snapshot
+    AUTH_CACHE_SIZE: int = 10_000
+    AUTH_CACHE_TTL: float = 60.0
+
+    # Password hashing pool: "thread" or "process" executor with this many
+    # workers, and at most PASSWORD_HASH_CONCURRENCY jobs submitted at once
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_CONCURRENCY: int = 4
+    # Argon2 parameters for new hashes; older hashes are upgraded on login
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+
+    # Background jobs (outbox table): run the worker inside the app process,
+    # or set to False and run `python -m app.worker` separately
+    JOBS_RUN_IN_APP: bool = True
+    JOBS_CONCURRENCY: int = 4
+    # How often an idle worker checks for due jobs
+    JOBS_POLL_INTERVAL: float = 2.0
+    # A running job is handed to another worker if not finished by then
+    JOBS_LEASE_SECONDS: float = 300.0
+    JOBS_MAX_ATTEMPTS: int = 8
+    # Retry delay: JOBS_BACKOFF_BASE * 2^(attempt - 1), capped at JOBS_BACKOFF_MAX
+    JOBS_BACKOFF_BASE: float = 2.0
+    JOBS_BACKOFF_MAX: float = 600.0
+    # Seconds running jobs get to finish on shutdown
+    JOBS_SHUTDOWN_GRACE: float = 10.0
+
+    # Pre-serialized responses for GET /ads/{id} and GET /profiles/{user_id}
+    RESPONSE_CACHE_SIZE: int = 10_000
+    RESPONSE_CACHE_TTL: float = 300.0
+
+    # Request timing: statements slower than this are logged as slow queries,
+    # and a request running one statement this many times is flagged as N+1
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    N_PLUS_ONE_THRESHOLD: int = 10
+    # Send per-request app/db timings to clients in a Server-Timing header
+    SERVER_TIMING_HEADER: bool = True
+
+    # Prometheus metrics: with several workers, a directory shared by them
+    # (cleared before startup) where each worker writes its snapshot
+    METRICS_MULTIPROC_DIR: Optional[str] = None
+    METRICS_SNAPSHOT_INTERVAL: float = 5.0
+
     # Debug mode
     DEBUG: bool = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
 
     # Logging configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # "console" (colored, for development) or "json" (one object per line)
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "console")
+    # Fraction of debug events kept when LOG_LEVEL is DEBUG
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0
 
     # Server configuration
     HOST: str = os.getenv("HOST", "0.0.0.0")
@@ -0,0 +1,153 @@
+import json
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.logger import get_logger
+from app.core.pubsub import pubsub
+
+logger = get_logger(__name__)
+
+Handler = Callable[[Dict[str, Any]], None]
+
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+_shared_handlers: Dict[str, List[Handler]] = defaultdict(list)
+_PENDING_KEY = "pending_events"
+
+# Tags this process's broadcasts, so that it skips them when they come back
+_ORIGIN = uuid.uuid4().bytes
+
+
+def subscribe(name: str, handler: Handler) -> None:
+    """
+    Register a synchronous handler for a domain event (e.g. "ad.created").
+    Handlers run on the event loop thread and must not perform I/O themselves.
+    """
+    _handlers[name].append(handler)
+
+
+def unsubscribe(name: str, handler: Handler) -> None:
+    """
+    Remove a handler registered with subscribe(); unknown handlers are ignored.
+    """
+    if handler in _handlers.get(name, ()):
+        _handlers[name].remove(handler)
+
+
+def subscribe_shared(name: str, handler: Handler) -> None:
+    """
+    Register a handler for an event committed by any worker: in this process
+    it runs like a subscribe() handler, and for events declared with share()
+    it also runs when another worker commits one.
+    """
+    _handlers[name].append(handler)
+    _shared_handlers[name].append(handler)
+
+
+def _dispatch(name: str, handlers: List[Handler], payload: Dict[str, Any]) -> None:
+    for handler in handlers:
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception("Event handler failed", event_name=name)
+
+
+def emit(name: str, payload: Dict[str, Any]) -> None:
+    """
+    Dispatch an event to its handlers immediately. A failing handler is logged
+    and never affects the other handlers or the caller.
+    """
+    _dispatch(name, _handlers.get(name, []), payload)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _converter(column_type: Any) -> Optional[Callable[[Any], Any]]:
+    """Rebuilds a column value from its JSON form; None if JSON keeps it as is"""
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        # GUID (fastapi-users) declares no Python type
+        return uuid.UUID
+    if python_type in (datetime, date):
+        return python_type.fromisoformat
+    if python_type in (uuid.UUID, Decimal) or issubclass(python_type, Enum):
+        return python_type
+    return None
+
+
+def share(name: str, model: type) -> None:
+    """
+    Broadcast an event on the pub/sub backend, so that its subscribe_shared()
+    handlers run in every worker. `model` is the mapped class whose snapshot()
+    (or a subset of its columns) is the payload, used to restore the column
+    types on arrival. Must be called before the backend starts, i.e. at import.
+    A no-op with the in-process backend, where this worker is the only one.
+    """
+    if not pubsub.shared:
+        return
+    channel = "events." + name
+    converters = {
+        column.key: converter
+        for column in inspect(model).columns
+        if (converter := _converter(column.type)) is not None
+    }
+
+    def publish(payload: Dict[str, Any]) -> None:
+        message = json.dumps(payload, default=_json_default).encode()
+        pubsub.publish_nowait(channel, _ORIGIN + message)
+
+    def receive(message: bytes) -> None:
+        if message[: len(_ORIGIN)] == _ORIGIN:
+            return
+        payload = json.loads(message[len(_ORIGIN) :])
+        for key, value in payload.items():
+            converter = converters.get(key)
+            if converter is not None and value is not None:
+                payload[key] = converter(value)
+        _dispatch(name, _shared_handlers.get(name, []), payload)
+
+    _handlers[name].append(publish)
+    pubsub.subscribe(channel, receive)
+
+
+def emit_after_commit(session: AsyncSession, name: str, payload: Dict[str, Any]) -> None:
+    """
+    Queue an event on the session; it is dispatched only once the surrounding
+    transaction commits and discarded if it rolls back.
+    """
+    session.info.setdefault(_PENDING_KEY, []).append((name, payload))
+
+
+def snapshot(obj: Any) -> Dict[str, Any]:
+    """
+    Copy the column attributes of an ORM instance into a plain dict, so that
+    handlers never touch (possibly expired) ORM state.
+    """
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending(session: Session) -> None:
+    for name, payload in session.info.pop(_PENDING_KEY, ()):
+        emit(name, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,113 @@
+"""
+Geohash encoding and great-circle distances, used to index ad locations
+without a spatial database.
+"""
+
+import math
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision of stored geohashes: cells of a few centimeters
+GEOHASH_PRECISION = 12
+
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of a point: each character adds 5 bits, alternating lon/lat halvings"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    value = bits = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            interval[0] = middle
+        else:
+            value *= 2
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            value = bits = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell of the given precision"""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _lon_ranges(lon: float, half_width: float) -> List[Tuple[float, float]]:
+    """Longitude interval around lon, split in two where it crosses the antimeridian"""
+    if half_width >= 180:
+        return [(-180.0, 180.0)]
+    west, east = lon - half_width, lon + half_width
+    if west < -180:
+        return [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return [(west, 180.0), (-180.0, east - 360)]
+    return [(west, east)]
+
+
+def covering_prefixes(
+    lat: float, lon: float, radius_km: float, max_cells: int = 16
+) -> List[str]:
+    """
+    Geohash prefixes whose cells together cover the bounding box of a circle,
+    at the finest precision that needs at most `max_cells` cells. Returns [""]
+    (every geohash) when the circle is too large or reaches a pole.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    half_height = math.degrees(angular)
+    south, north = lat - half_height, lat + half_height
+    if south <= -90 or north >= 90:
+        return [""]
+    # Longitude reach of the circle at its widest (Matuschek)
+    ratio = math.sin(angular) / math.cos(math.radians(lat))
+    half_width = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+    lon_ranges = _lon_ranges(lon, half_width)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        columns_total = round(360.0 / width)
+        rows = range(int((south + 90) // height), int((north + 90) // height) + 1)
+        columns = [
+            range(
+                int((west + 180) // width),
+                min(int((east + 180) // width), columns_total - 1) + 1,
+            )
+            for west, east in lon_ranges
+        ]
+        if len(rows) * sum(len(c) for c in columns) > max_cells:
+            continue
+        return sorted(
+            {
+                encode_geohash(
+                    -90 + (row + 0.5) * height, -180 + (column + 0.5) * width, precision
+                )
+                for row in rows
+                for column_range in columns
+                for column in column_range
+            }
+        )
+    return [""]
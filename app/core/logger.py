@@ -1,25 +1,77 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import uuid
+from typing import Any, Optional
 
 import structlog
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from app.core.config import settings
 
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that hands records over as they are. The stock handler
+    formats them before enqueueing, which would render every event on the
+    event loop; here rendering and the stdout write both happen on the
+    listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _sample_debug(logger: Any, method_name: str, event_dict: dict) -> dict:
+    """Keeps only LOG_DEBUG_SAMPLE_RATE of debug events"""
+    if method_name == "debug" and random.random() >= settings.LOG_DEBUG_SAMPLE_RATE:
+        raise structlog.DropEvent
+    return event_dict
+
+
+def _capture_exc_info(logger: Any, method_name: str, event_dict: dict) -> dict:
+    """
+    Resolves exc_info=True to the exception being handled; on the listener
+    thread, where events are rendered, sys.exc_info() is already empty
+    """
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
 
 def configure_logging() -> None:
     """
-    Configure logging with structlog for more structured and readable logs
+    Configure logging with structlog for more structured and readable logs.
+
+    Log calls only build the event dict and enqueue it; a background listener
+    thread renders it (colored console or JSON, see LOG_FORMAT) and writes it
+    to stdout, so the event loop never blocks on output.
     """
+    global _listener, _queue_handler
+
     shared_processors = [
         structlog.stdlib.add_log_level,
         structlog.stdlib.add_logger_name,
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
     ]
 
     structlog.configure(
         processors=[
             structlog.stdlib.filter_by_level,
+            _sample_debug,
+            # Context variables must be read on the calling thread
+            structlog.contextvars.merge_contextvars,
+            _capture_exc_info,
             *shared_processors,
             structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
@@ -27,8 +79,22 @@ def configure_logging() -> None:
         cache_logger_on_first_use=True,
     )
 
+    if settings.LOG_FORMAT == "json":
+        final_processors = [
+            structlog.processors.dict_tracebacks,
+            structlog.processors.JSONRenderer(),
+        ]
+    else:
+        final_processors = [
+            structlog.processors.format_exc_info,
+            structlog.dev.ConsoleRenderer(colors=True),
+        ]
+
     formatter = structlog.stdlib.ProcessorFormatter(
-        processor=structlog.dev.ConsoleRenderer(colors=True),
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            *final_processors,
+        ],
         foreign_pre_chain=shared_processors,
     )
 
@@ -36,7 +102,19 @@ def configure_logging() -> None:
     handler.setFormatter(formatter)
 
     root_logger = logging.getLogger()
-    root_logger.addHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        root_logger.removeHandler(_queue_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(
+        log_queue, handler, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root_logger.addHandler(_queue_handler)
     root_logger.setLevel(settings.LOG_LEVEL)
 
     # Disable some noisy loggers
@@ -48,3 +126,46 @@ def get_logger(name: str) -> structlog.stdlib.BoundLogger:
     Get a logger instance with the given name
     """
     return structlog.stdlib.get_logger(name)
+
+
+def bind_user(user_id: Any) -> None:
+    """
+    Adds the authenticated user's id to every log event of the current request
+    """
+    structlog.contextvars.bind_contextvars(user_id=str(user_id))
+
+
+class RequestContextMiddleware:
+    """
+    Binds a request id to every log event of the request. An incoming
+    X-Request-ID header is reused so ids can be followed across services;
+    otherwise one is generated. The id is echoed in the response headers.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = REQUEST_ID_HEADER.lower().encode()
+        request_id = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == header),
+            None,
+        )
+        if not request_id or len(request_id) > 128:
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        tokens = structlog.contextvars.bind_contextvars(request_id=request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            structlog.contextvars.unbind_contextvars("user_id")
+            structlog.contextvars.reset_contextvars(**tokens)
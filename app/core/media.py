@@ -0,0 +1,43 @@
+"""
+Layout of the content-addressed image store.
+
+Files are named by the SHA-256 digest of the uploaded bytes: `<digest>.<ext>`
+for the original and `<digest>-<thumbnail>.webp` for each of its thumbnails.
+They live in IMAGES_DIR under two directory levels taken from the digest
+(`ab/cd/abcd...`), which keeps every directory small. A name never changes
+content, so the files can be cached by clients for good.
+"""
+
+import re
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+THUMBNAIL_EXTENSION = "webp"
+
+_FILE_NAME = re.compile(r"[0-9a-f]{64}(\.(jpg|png|webp|gif)|-[a-z0-9_]+\.webp)")
+
+
+def file_name(digest: str, extension: str, thumbnail: Optional[str] = None) -> str:
+    """Name of a stored original, or of one of its thumbnails"""
+    if thumbnail is None:
+        return f"{digest}.{extension}"
+    return f"{digest}-{thumbnail}.{THUMBNAIL_EXTENSION}"
+
+
+def is_file_name(name: str) -> bool:
+    """Whether `name` could have been produced by file_name (rejects paths)"""
+    return _FILE_NAME.fullmatch(name) is not None
+
+
+def relative_path(name: str) -> str:
+    return f"{name[:2]}/{name[2:4]}/{name}"
+
+
+def file_path(name: str) -> Path:
+    return Path(settings.IMAGES_DIR) / relative_path(name)
+
+
+def file_url(name: str) -> str:
+    return f"{settings.IMAGES_URL_PREFIX}/{name}"
@@ -0,0 +1,370 @@
+"""
+Prometheus metrics.
+
+Each worker keeps its counters and histograms in plain dicts. They are only
+updated from the event loop thread, so no locks are needed and recording a
+request costs a couple of dict operations. Gauges and counters owned by other
+objects (connection pools, caches) are read through callbacks at collection
+time.
+
+With a single process `/metrics` renders this worker's registry. With several
+uvicorn workers, set METRICS_MULTIPROC_DIR to a directory shared by them and
+cleared before startup. Every worker then writes a snapshot of its registry
+there every METRICS_SNAPSHOT_INTERVAL seconds. On a scrape, the worker that
+serves it adds up all snapshots: counters and histograms from every worker,
+including exited ones, and gauges only from workers whose snapshot is recent.
+"""
+
+import asyncio
+import bisect
+import json
+import math
+import os
+import secrets
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.timing import route_template
+
+logger = get_logger(__name__)
+
+Labels = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Dict[Labels, Any]:
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames)}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Dict[Labels, Any]:
+        return dict(self._values)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> Dict[Labels, Any]:
+        return dict(self._values)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self) -> Dict[Labels, Any]:
+        return {
+            labels: {"counts": list(counts), "sum": total}
+            for labels, (counts, total) in self._values.items()
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(super().describe(), buckets=list(self.buckets))
+
+
+class CallbackMetric(Metric):
+    """Counter or gauge whose values are read from `collect()` on demand"""
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Labels, float]],
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self._collect = collect
+
+    def samples(self) -> Dict[Labels, Any]:
+        return self._collect()
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(
+        self,
+        kind: str,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Labels, float]],
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(kind, name, help, labelnames, collect))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state of every metric in this process"""
+        snapshot = {}
+        for name, metric in self._metrics.items():
+            try:
+                samples = metric.samples()
+            except Exception:
+                logger.exception("Metric collection failed", metric=name)
+                continue
+            snapshot[name] = dict(
+                metric.describe(),
+                samples=[[list(labels), value] for labels, value in samples.items()],
+            )
+        return snapshot
+
+
+def merge(snapshots: List[Tuple[Dict[str, Any], bool]]) -> Dict[str, Any]:
+    """
+    Adds up (snapshot, is_live) pairs from several workers. Gauges of workers
+    that are no longer live are skipped.
+    """
+    merged: Dict[str, Any] = {}
+    for snapshot, live in snapshots:
+        for name, metric in snapshot.items():
+            if metric["kind"] == "gauge" and not live:
+                continue
+            target = merged.setdefault(name, dict(metric, samples={}))
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = samples.get(key)
+                if metric["kind"] == "histogram":
+                    if current is None:
+                        samples[key] = {"counts": list(value["counts"]), "sum": value["sum"]}
+                    else:
+                        current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                        current["sum"] += value["sum"]
+                else:
+                    samples[key] = (current or 0.0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def render(merged: Dict[str, Any]) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        names = metric["labelnames"]
+        lines.append(f"# HELP {name} {_escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric["samples"].items()):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            bounds = [*metric["buckets"], math.inf]
+            for bound, count in zip(bounds, value["counts"]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# Told apart from an exited worker's snapshot when a new worker gets its pid
+_PROCESS_TOKEN = secrets.token_hex(4)
+
+
+def _snapshot_path(directory: str) -> str:
+    return os.path.join(directory, f"{os.getpid()}-{_PROCESS_TOKEN}.json")
+
+
+def write_snapshot(snapshot: Dict[str, Any], directory: str) -> None:
+    path = _snapshot_path(directory)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(snapshot, fh)
+    os.replace(tmp_path, path)
+
+
+def read_snapshots(directory: str, live_within: float) -> List[Tuple[Dict[str, Any], bool]]:
+    snapshots = []
+    now = time.time()
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as fh:
+                snapshot = json.load(fh)
+            live = now - entry.stat().st_mtime <= live_within
+        except (OSError, ValueError):
+            # Removed or half-written by another worker; pick it up next time
+            continue
+        snapshots.append((snapshot, live))
+    return snapshots
+
+
+def _merge_with_workers(snapshot: Dict[str, Any], directory: str) -> Dict[str, Any]:
+    write_snapshot(snapshot, directory)
+    return merge(read_snapshots(directory, 3 * settings.METRICS_SNAPSHOT_INTERVAL))
+
+
+async def collect(registry: Registry) -> Dict[str, Any]:
+    """This worker's metrics, or all workers' when METRICS_MULTIPROC_DIR is set"""
+    # Taken on the event loop, the only thread that updates the metrics
+    snapshot = registry.snapshot()
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return merge([(snapshot, True)])
+    # The snapshot files are read and written off the event loop
+    return await asyncio.to_thread(_merge_with_workers, snapshot, directory)
+
+
+async def run_snapshot_writer(registry: Registry, directory: str, interval: float) -> None:
+    """Writes this worker's snapshot periodically, and once more when cancelled"""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        while True:
+            await asyncio.to_thread(write_snapshot, registry.snapshot(), directory)
+            await asyncio.sleep(interval)
+    finally:
+        write_snapshot(registry.snapshot(), directory)
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total",
+    "HTTP requests handled, by method, route template and status code",
+    ("method", "route", "status"),
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, by method and route template",
+    ("method", "route"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled"
+)
+auth_attempts = registry.counter(
+    "auth_attempts_total",
+    "Authentication attempts, by method (password, token) and result",
+    ("method", "result"),
+)
+
+
+class MetricsMiddleware:
+    """Counts requests and records their latency per route template"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # Unmatched paths share one label so scanners can't blow up cardinality
+            route = route_template(scope) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, route, str(status_code))
+            http_request_duration.observe(time.perf_counter() - started, method, route)
@@ -0,0 +1,44 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import ColumnElement, Tuple as SQLTuple, literal, tuple_
+
+
+def encode_cursor(created_at: datetime, item_id: UUID) -> str:
+    """
+    Encode a keyset position (sort key + tie-breaking id) into an opaque cursor
+    """
+    raw = json.dumps([created_at.isoformat(), item_id.hex], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decode an opaque cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(item_id)
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def keyset_position(
+    columns: Sequence[ColumnElement], position: Tuple[datetime, UUID]
+) -> SQLTuple:
+    """
+    SQL tuple of a decoded cursor, typed like the sort columns to compare with.
+    Untyped, the id would be bound as a plain UUID (hex without dashes on
+    SQLite) and never equal the stored GUID string.
+    """
+    return tuple_(
+        *(literal(value, column.type) for column, value in zip(columns, position))
+    )
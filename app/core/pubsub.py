@@ -0,0 +1,108 @@
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+Callback = Callable[[bytes], None]
+
+
+class LocalPubSub:
+    """
+    In-process publish/subscribe. Messages reach subscribers of the current
+    process only; this is the default backend and the stand-in for tests.
+    """
+
+    # Whether messages reach other processes
+    shared = False
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        self._subscribers[channel].append(callback)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        self._deliver(channel, message)
+
+    def publish_nowait(self, channel: str, message: bytes) -> None:
+        """Publish from synchronous code running on the event loop."""
+        self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: bytes) -> None:
+        for callback in self._subscribers.get(channel, ()):
+            try:
+                callback(message)
+            except Exception:
+                logger.exception("Pub/sub subscriber failed", channel=channel)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class RedisPubSub(LocalPubSub):
+    """
+    Redis-backed publish/subscribe shared by all workers. Every message,
+    including the worker's own, is delivered through Redis so all processes
+    observe the same order. Subscriptions must be registered before start().
+    """
+
+    shared = True
+
+    def __init__(self, url: str) -> None:
+        super().__init__()
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError(
+                "REDIS_URL is set but the 'redis' package is not installed"
+            ) from exc
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self._redis.publish(channel, message)
+
+    def publish_nowait(self, channel: str, message: bytes) -> None:
+        task = asyncio.get_running_loop().create_task(self.publish(channel, message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def start(self) -> None:
+        if self._subscribers:
+            await self._pubsub.subscribe(*self._subscribers)
+            self._reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        self._deliver(message["channel"].decode(), message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis pub/sub connection lost, reconnecting")
+                await asyncio.sleep(1)
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+def create_pubsub(url: Optional[str]) -> LocalPubSub:
+    return RedisPubSub(url) if url else LocalPubSub()
+
+
+# Process-wide backend; shared across workers when REDIS_URL is configured
+pubsub = create_pubsub(settings.REDIS_URL)
@@ -0,0 +1,375 @@
+"""
+Rate limiting and load shedding.
+
+`RateLimitMiddleware` (enabled with RATE_LIMIT_ENABLED) runs before routing and
+rejects a request
+
+- with 429 when the client's token bucket for the route is empty. The client
+  is the user of a valid bearer token, else the client address. A bucket
+  refills at `rate` tokens per second up to `burst`. Routes listed in
+  RATE_LIMIT_ROUTES have buckets of their own; all other routes share one.
+- with 503 when the worker is overloaded: LOAD_SHED_MAX_IN_FLIGHT requests are
+  already in progress, or over the last sampling window database connections
+  took longer than LOAD_SHED_DB_WAIT_SECONDS on average to check out of the
+  pool, or checkouts timed out.
+
+Both carry Retry-After. The buckets live in the worker, so every worker
+allows the full rate, unless RATE_LIMIT_BACKEND is "redis": then all workers
+share them at the cost of one Redis round trip per request. When Redis
+fails, the worker falls back to its own buckets.
+"""
+
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute, Match, compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import registry
+
+logger = get_logger(__name__)
+
+requests_rejected = registry.counter(
+    "http_requests_rejected_total",
+    "HTTP requests rejected before routing, by reason (rate_limit, overload)",
+    ("reason",),
+)
+
+
+@dataclass(frozen=True)
+class Limit:
+    """Token bucket: `rate` requests per second on average, `burst` at once"""
+
+    rate: float
+    burst: int
+
+
+class LocalBucketStore:
+    """
+    Token buckets of this worker. Buckets that have refilled completely are
+    the same as absent ones and are dropped once `max_keys` is reached.
+    """
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        # key -> [tokens, updated at, full at]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def take_now(self, key: str, limit: Limit) -> float:
+        """Take a token: 0.0 if one was available, else seconds until there is"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                buckets = self._buckets.items()
+                self._buckets = {k: b for k, b in buckets if b[2] > now}
+            tokens = float(limit.burst)
+        else:
+            tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / limit.rate
+        self._buckets[key] = [tokens, now, now + (limit.burst - tokens) / limit.rate]
+        return wait
+
+    async def take(self, key: str, limit: Limit) -> float:
+        return self.take_now(key, limit)
+
+    async def close(self) -> None:
+        pass
+
+
+# Same algorithm as LocalBucketStore.take_now, atomic in Redis and timed by
+# the Redis clock, so that the workers' clocks need not agree
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = burst
+if bucket[1] then
+    local refill = (now - tonumber(bucket[2])) * rate
+    tokens = math.min(burst, tonumber(bucket[1]) + refill)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore(LocalBucketStore):
+    """Token buckets shared by all workers through Redis."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:") -> None:
+        super().__init__()
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError(
+                "RATE_LIMIT_BACKEND is 'redis' but the 'redis' package is "
+                "not installed"
+            ) from exc
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._prefix = prefix
+        self._failing = False
+
+    async def take(self, key: str, limit: Limit) -> float:
+        try:
+            reply = await self._take(
+                keys=[self._prefix + key], args=[limit.rate, limit.burst]
+            )
+            wait = float(reply)
+        except Exception:
+            if not self._failing:
+                logger.exception("Redis rate limiting failed, using local buckets")
+                self._failing = True
+            return self.take_now(key, limit)
+        if self._failing:
+            logger.info("Redis rate limiting recovered")
+            self._failing = False
+        return wait
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_bucket_store(backend: str, url: Optional[str]) -> LocalBucketStore:
+    if backend == "redis":
+        if not url:
+            raise RuntimeError(
+                "RATE_LIMIT_BACKEND is 'redis' but REDIS_URL is not set"
+            )
+        return RedisBucketStore(url)
+    if backend != "local":
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    return LocalBucketStore()
+
+
+_PATH_PARAM_RE = re.compile(r"{[^}]*}")
+
+
+def _normalize(path: str) -> str:
+    """Path without its trailing slash, so that "/ads" and "/ads/" are one route"""
+    return path.rstrip("/") or "/"
+
+
+class RouteLimits:
+    """
+    Limit of a request by method and path, resolved before routing.
+
+    Rules are keyed "METHOD /path/template", e.g.
+    "GET /api/v1/ads/ads/{ad_id}"; HEAD requests use the GET rules. A trailing
+    slash makes no difference, neither in a rule nor in a request. Requests
+    matching no rule share `default`.
+    """
+
+    DEFAULT = "*"
+
+    def __init__(self, default: Limit, rules: Dict[str, Tuple[float, int]]) -> None:
+        self.default = default
+        self._exact: Dict[Tuple[str, str], Tuple[str, Limit]] = {}
+        self._patterns: List[Tuple[str, Any, str, Limit]] = []
+        self._routes: Dict[str, Tuple[str, str]] = {}
+        for rule, (rate, burst) in rules.items():
+            method, template = rule.split(" ", 1)
+            template = _normalize(template)
+            self._routes[rule] = (method.upper(), template)
+            limit = Limit(rate, burst)
+            if "{" in template:
+                regex = compile_path(template)[0]
+                self._patterns.append((method.upper(), regex, rule, limit))
+            else:
+                self._exact[(method.upper(), template)] = (rule, limit)
+
+    def unmatched(self, routes: Sequence[BaseRoute]) -> List[str]:
+        """Rules that none of the app's `routes` serves, e.g. after a prefix change"""
+        unmatched = []
+        for rule, (method, template) in self._routes.items():
+            # Any value stands in for a path parameter: they are typed later
+            path = _PATH_PARAM_RE.sub("0", template)
+            scopes = [
+                {"type": "http", "method": method, "path": candidate, "root_path": ""}
+                for candidate in (path, path.rstrip("/") + "/")
+            ]
+            if not any(
+                route.matches(scope)[0] == Match.FULL
+                for scope in scopes
+                for route in routes
+            ):
+                unmatched.append(rule)
+        return unmatched
+
+    def resolve(self, method: str, path: str) -> Tuple[str, Limit]:
+        """(bucket name, limit) for a request"""
+        if method == "HEAD":
+            method = "GET"
+        path = _normalize(path)
+        found = self._exact.get((method, path))
+        if found is not None:
+            return found
+        for rule_method, regex, rule, limit in self._patterns:
+            if rule_method == method and regex.match(path):
+                return rule, limit
+        return self.DEFAULT, self.default
+
+
+class LoadShedder:
+    """
+    Tells when the worker is overloaded, from the requests in flight and the
+    checkout wait of the connection pools (their `stats`, see
+    app.database.pool.PoolStats), sampled once per `window` seconds.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_db_wait: float,
+        window: float,
+        pool_stats: Sequence[Any] = (),
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_db_wait = max_db_wait
+        self.window = window
+        self.retry_after = str(max(1, math.ceil(window)))
+        self.in_flight = 0
+        self._pool_stats = [stats for stats in pool_stats if stats is not None]
+        self._sampled_at = time.monotonic()
+        self._last = self._totals()
+        self._db_overloaded = False
+
+    def _totals(self) -> Tuple[int, float, int]:
+        return (
+            sum(stats.checkouts for stats in self._pool_stats),
+            sum(stats.wait_time_total for stats in self._pool_stats),
+            sum(stats.timeouts for stats in self._pool_stats),
+        )
+
+    def overloaded(self) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return True
+        if not self._pool_stats:
+            return False
+        now = time.monotonic()
+        if now - self._sampled_at >= self.window:
+            totals = self._totals()
+            checkouts, waited, timeouts = (
+                total - last for total, last in zip(totals, self._last)
+            )
+            self._db_overloaded = timeouts > 0 or (
+                checkouts > 0 and waited / checkouts > self.max_db_wait
+            )
+            if self._db_overloaded:
+                logger.warning(
+                    "Shedding load: database connections are scarce",
+                    avg_wait_ms=round(waited / max(checkouts, 1) * 1000, 2),
+                    timeouts=timeouts,
+                )
+            self._last = totals
+            self._sampled_at = now
+        return self._db_overloaded
+
+
+def _bearer_token(scope: Scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token if scheme.lower() == "bearer" and token else None
+    return None
+
+
+class RateLimitMiddleware:
+    """
+    Rejects requests over their client's rate limit with 429 and sheds load
+    with 503 while the worker is overloaded (see the module docstring)
+
+    Args:
+        limits: per-route limits
+        store: token buckets
+        shedder: overload detection; requests to `exempt_paths` (monitoring,
+            long-lived streams) are neither shed nor counted as in flight
+        identify: user id of a bearer token, None when the token is invalid
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: RouteLimits,
+        store: LocalBucketStore,
+        shedder: LoadShedder,
+        identify: Callable[[str], Optional[str]],
+        exempt_paths: Sequence[str] = (),
+    ) -> None:
+        self.app = app
+        self.limits = limits
+        self.store = store
+        self.shedder = shedder
+        self.identify = identify
+        self.exempt_paths = frozenset(_normalize(path) for path in exempt_paths)
+
+    def _client(self, scope: Scope) -> str:
+        token = _bearer_token(scope)
+        if token is not None:
+            user_id = self.identify(token)
+            if user_id is not None:
+                return "user:" + user_id
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        exempt = _normalize(path) in self.exempt_paths
+        shedder = self.shedder
+        if not exempt and shedder.overloaded():
+            requests_rejected.inc("overload")
+            response = JSONResponse(
+                {"detail": "Service overloaded"},
+                status_code=503,
+                headers={"Retry-After": shedder.retry_after},
+            )
+            await response(scope, receive, send)
+            return
+
+        bucket, limit = self.limits.resolve(scope["method"], path)
+        wait = await self.store.take(f"{bucket}|{self._client(scope)}", limit)
+        if wait > 0:
+            requests_rejected.inc("rate_limit")
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+
+        if exempt:
+            await self.app(scope, receive, send)
+            return
+        shedder.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            shedder.in_flight -= 1
+
+
+# Process-wide buckets; shared across workers when RATE_LIMIT_BACKEND is "redis"
+bucket_store = create_bucket_store(settings.RATE_LIMIT_BACKEND, settings.REDIS_URL)
@@ -0,0 +1,75 @@
+"""
+Fast JSON path for list endpoints (settings.FAST_LIST_SERIALIZATION).
+
+The regular path loads ORM objects, validates each of them into the response
+model (from_attributes) and encodes the result once more. Here the endpoint
+selects only the response columns as plain rows and encodes them to JSON bytes
+in a single pass with a TypeAdapter built once per response model: rows read
+from our own tables need no validation, only serialization. The output is the
+same JSON the response model produces.
+"""
+
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import ColumnElement, inspect, literal, null
+from typing_extensions import TypedDict
+
+
+def row_columns(model: type, schema: Type[BaseModel]) -> List[ColumnElement]:
+    """
+    Columns of `model` to select for `schema`, labeled with its field names.
+    Fields without a column are selected as their default value.
+    """
+    mapped = inspect(model).column_attrs
+    columns = []
+    for name, field in schema.model_fields.items():
+        if name in mapped:
+            column = getattr(model, name)
+        elif field.default is None:
+            column = null()
+        else:
+            column = literal(field.default)
+        columns.append(column.label(name))
+    return columns
+
+
+@lru_cache(maxsize=None)
+def _row_type(schema: Type[BaseModel]) -> type:
+    """TypedDict with the fields of a flat response model"""
+    return TypedDict(
+        f"{schema.__name__}Row",
+        {name: field.annotation for name, field in schema.model_fields.items()},
+    )
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[_row_type(schema)])
+
+
+@lru_cache(maxsize=None)
+def _page_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    page = TypedDict(
+        f"{schema.__name__}RowPage",
+        {"items": List[_row_type(schema)], "next_cursor": Optional[str]},
+    )
+    return TypeAdapter(page)
+
+
+def list_response(rows: Sequence[Any], schema: Type[BaseModel]) -> Response:
+    """JSON array of rows selected with row_columns(..., schema)"""
+    body = _list_adapter(schema).dump_json([row._asdict() for row in rows])
+    return Response(body, media_type="application/json")
+
+
+def page_response(
+    rows: Sequence[Any], schema: Type[BaseModel], next_cursor: Optional[str]
+) -> Response:
+    """`{"items": [...], "next_cursor": ...}` page of rows selected with row_columns"""
+    body = _page_adapter(schema).dump_json(
+        {"items": [row._asdict() for row in rows], "next_cursor": next_cursor}
+    )
+    return Response(body, media_type="application/json")
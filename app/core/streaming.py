@@ -0,0 +1,29 @@
+from typing import AsyncIterator, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_response(
+    rows: AsyncIterator[object], schema: Type[BaseModel], chunk_size: int
+) -> StreamingResponse:
+    """
+    Stream rows as newline-delimited JSON, serializing each row through `schema`.
+
+    Lines are flushed in chunks of `chunk_size` rows so that peak memory depends
+    on the chunk size only, never on the total number of exported rows.
+    """
+
+    async def body() -> AsyncIterator[bytes]:
+        chunk = []
+        async for row in rows:
+            chunk.append(schema.model_validate(row).model_dump_json().encode())
+            if len(chunk) >= chunk_size:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
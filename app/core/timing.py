@@ -0,0 +1,161 @@
+"""
+Per-request timing.
+
+`TimingMiddleware` opens a `RequestStats` for every HTTP request and exposes it
+through the `current_request_stats` context variable. The SQL hooks in
+`app.database.instrumentation` add each statement to it, so when the response
+starts we know the wall time, how many queries ran, how long the database took
+and which statement was slowest. The totals are sent back as a `Server-Timing`
+header and logged when the response completes, and requests that run the same
+statement many times are flagged as likely N+1 query patterns.
+"""
+
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Longest statement text kept in logs
+_STATEMENT_PREVIEW = 300
+
+
+@dataclass
+class RequestStats:
+    """Database work done while handling one request"""
+
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db_time: float = 0.0
+    slowest_time: float = 0.0
+    slowest_statement: Optional[str] = None
+    statements: Counter = field(default_factory=Counter)
+
+    def record_query(self, statement: str, duration: float) -> None:
+        self.queries += 1
+        self.db_time += duration
+        self.statements[statement] += 1
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def repeated_statement(self) -> Optional[tuple]:
+        """(statement, count) of the most repeated statement past the N+1 threshold"""
+        if not self.statements:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        if count < settings.N_PLUS_ONE_THRESHOLD:
+            return None
+        return statement, count
+
+    def server_timing(self, app_time: float) -> str:
+        return (
+            f"app;dur={app_time * 1000:.1f}, "
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"'
+        )
+
+
+# Stats of the request being handled; None outside of a request
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+def preview(statement: Optional[str]) -> Optional[str]:
+    if statement is None:
+        return None
+    statement = " ".join(statement.split())
+    if len(statement) > _STATEMENT_PREVIEW:
+        return statement[:_STATEMENT_PREVIEW] + "..."
+    return statement
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """
+    Matched route as a template, e.g. /api/v1/ads/ads/{ad_id}; None if no
+    route matched. Built from the path and its path parameters because routes
+    of included routers only know their own, unprefixed path.
+    """
+    if scope.get("route") is None:
+        return None
+    path_params = scope.get("path_params") or {}
+    if not path_params:
+        return scope["path"]
+    names = {str(value): name for name, value in path_params.items()}
+    return "/".join(
+        f"{{{names[segment]}}}" if segment in names else segment
+        for segment in scope["path"].split("/")
+    )
+
+
+class TimingMiddleware:
+    """
+    Records wall time and database work per request, adds a `Server-Timing`
+    header and logs a summary once the response has been sent
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", stats.server_timing(stats.elapsed))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            self._log(scope, stats, status_code)
+
+    @staticmethod
+    def _log(scope: Scope, stats: RequestStats, status_code: int) -> None:
+        fields = dict(
+            method=scope["method"],
+            path=scope["path"],
+            route=route_template(scope),
+            status=status_code,
+            duration_ms=round(stats.elapsed * 1000, 2),
+            queries=stats.queries,
+            db_ms=round(stats.db_time * 1000, 2),
+        )
+        if stats.slowest_statement is not None:
+            fields["slowest_query_ms"] = round(stats.slowest_time * 1000, 2)
+            fields["slowest_query"] = preview(stats.slowest_statement)
+
+        repeated = stats.repeated_statement()
+        if repeated is not None:
+            logger.warning(
+                "Possible N+1 query pattern",
+                statement=preview(repeated[0]),
+                repeats=repeated[1],
+                **fields,
+            )
+        else:
+            logger.info("Request completed", **fields)
@@ -1,6 +1,12 @@
 from app.database.config import engine, async_session_maker
-from app.database.deps import get_async_session, get_user_db
+from app.database.deps import get_async_session, get_read_session, get_user_db
 
 # Database package initialization
-__all__ = ["engine", "async_session_maker", "get_async_session", "get_user_db"]
+__all__ = [
+    "engine",
+    "async_session_maker",
+    "get_async_session",
+    "get_read_session",
+    "get_user_db",
+]
 # Database package initialization
@@ -1,28 +1,112 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import asyncio
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from app.core.config import settings
 from app.database.base import Base
+from app.database.instrumentation import instrument_engine
+from app.database.pool import InstrumentedAsyncQueuePool
+from app.database.replicas import RecentWriters, ReplicaRouter, prefer_primary
 from app.models import User  # noqa
 
 # Определяем URL базы данных, используя настройки проекта
 DATABASE_URL = settings.DATABASE_URL
 
-# Создаем асинхронный движок с правильными параметрами подключения
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=settings.DEBUG,
-    connect_args=(
-        {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-    ),
-)
+# In-memory SQLite живет внутри одного соединения, пул для него не настраивается
+_IN_MEMORY = DATABASE_URL.startswith("sqlite") and ":memory:" in DATABASE_URL
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    """
+    Создает асинхронный движок с правильными параметрами подключения и пула.
+    """
+    is_sqlite = url.startswith("sqlite")
+    pool_options = (
+        {}
+        if is_sqlite and ":memory:" in url
+        else dict(
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+    )
+    async_engine = create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        **pool_options,
+    )
+    instrument_engine(async_engine)
+    return async_engine
+
+
+# Основной движок (primary): все записи и чтения без реплик
+engine = _create_engine(DATABASE_URL)
 
 # Создаем фабрику асинхронных сессий
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Реплики только для чтения
+replica_engines: List[AsyncEngine] = [
+    _create_engine(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+]
+replica_session_makers = [
+    async_sessionmaker(replica, expire_on_commit=False) for replica in replica_engines
+]
+replica_router = ReplicaRouter(replica_engines, settings.REPLICA_SELECTION)
+recent_writers = RecentWriters(settings.READ_YOUR_WRITES_SECONDS)
+
+
+def read_session_maker() -> async_sessionmaker:
+    """
+    Фабрика сессий для чтения: реплика, если они настроены и клиент
+    не писал в primary в последние READ_YOUR_WRITES_SECONDS секунд.
+    """
+    if not replica_session_makers or prefer_primary.get():
+        return async_session_maker
+    return replica_session_makers[replica_router.choose()]
+
 
 async def create_db_and_tables():
     """
-    Создает таблицы базы данных при запуске.
-    Примечание: В production это будет заменено миграциями Alembic.
+    Создает недостающие таблицы базы данных при запуске.
+    Существующие таблицы не изменяются: новые столбцы и индексы в них
+    добавляют миграции Alembic (alembic upgrade head, см. README).
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def warm_up_pool(count: int = settings.DB_POOL_WARMUP) -> int:
+    """
+    Заранее открывает соединения к primary и репликам, чтобы первые запросы
+    не платили за подключение.
+
+    Returns:
+        Количество открытых соединений.
+    """
+    if _IN_MEMORY:
+        return 0
+    # Overflow-соединения закрываются при возврате, поэтому не больше размера пула
+    count = min(count, settings.DB_POOL_SIZE)
+    if count <= 0:
+        return 0
+    engines = [engine, *replica_engines]
+    connections = await asyncio.gather(
+        *(e.connect() for e in engines for _ in range(count))
+    )
+    # Соединения возвращаются в пул и остаются открытыми
+    await asyncio.gather(*(connection.close() for connection in connections))
+    return len(connections)
+
+
+async def dispose_engines() -> None:
+    """
+    Закрывает все соединения primary и реплик при остановке приложения.
+    """
+    await asyncio.gather(*(e.dispose() for e in [engine, *replica_engines]))
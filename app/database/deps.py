@@ -1,11 +1,24 @@
 from collections.abc import AsyncGenerator
+from typing import Any, Dict
 
 from fastapi import Depends
 from fastapi_users.db import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database.config import async_session_maker
+from app.database.config import async_session_maker, read_session_maker
 from app.models.users import User
+from app.repositories.user import UserRepository
+
+
+class UserDatabase(SQLAlchemyUserDatabase):
+    """
+    User table adapter that creates the user's empty profile in the same
+    transaction (one statement on Postgres) and skips the base adapter's
+    refresh: every user column has a client-side default.
+    """
+
+    async def create(self, create_dict: Dict[str, Any]) -> User:
+        return await UserRepository.create_user_with_profile(create_dict, self.session)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -16,8 +29,17 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency that yields a session for read-only work: a replica when replicas
+    are configured, the primary right after the same client wrote
+    """
+    async with read_session_maker()() as session:
+        yield session
+
+
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     """
     Dependency that yields an SQLAlchemy user database
     """
-    yield SQLAlchemyUserDatabase(session, User)
+    yield UserDatabase(session, User)
@@ -0,0 +1,56 @@
+import time
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.timing import current_request_stats, preview
+
+logger = get_logger(__name__)
+
+_START_KEY = "query_start_time"
+
+
+def _before_cursor_execute(
+    conn: Connection, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Connection, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    duration = time.perf_counter() - conn.info[_START_KEY].pop()
+
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.record_query(statement, duration)
+
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            "Slow query",
+            duration_ms=round(duration * 1000, 2),
+            statement=preview(statement),
+            executemany=executemany,
+        )
+
+
+def _handle_error(context: Any) -> None:
+    # The statement failed, so after_cursor_execute will not pop its start time
+    starts = context.connection.info.get(_START_KEY) if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Times every statement run through the engine: feeds the current request's
+    stats and logs statements slower than SLOW_QUERY_THRESHOLD_MS
+    """
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
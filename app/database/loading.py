@@ -0,0 +1,32 @@
+from typing import Optional
+
+from sqlalchemy.orm import QueryableAttribute, joinedload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
+
+from app.core.config import settings
+
+# Loader option constructors by strategy name; the same names are the methods
+# that chain a loader onto an existing option
+_LOADERS = {"selectin": selectinload, "joined": joinedload}
+
+
+def eager_load(
+    *path: QueryableAttribute, strategy: Optional[str] = None
+) -> LoaderOption:
+    """
+    Loader option that eagerly loads a relationship path, e.g.
+    `eager_load(Ad.owner, User.profile)`.
+
+    "joined" adds the related rows to the parent query with a LEFT OUTER JOIN;
+    "selectin" runs one extra `WHERE ... IN` query per relationship in the path.
+    Either way the number of queries does not depend on the number of parents.
+    Defaults to settings.EAGER_LOADING_STRATEGY.
+    """
+    strategy = strategy or settings.EAGER_LOADING_STRATEGY
+    if strategy not in _LOADERS:
+        raise ValueError(f"Unknown eager loading strategy: {strategy!r}")
+    method = _LOADERS[strategy].__name__
+    option = _LOADERS[strategy](path[0])
+    for attr in path[1:]:
+        option = getattr(option, method)(attr)
+    return option
@@ -0,0 +1,110 @@
+import hashlib
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Set for the duration of a request whose client wrote to the primary recently
+prefer_primary: ContextVar[bool] = ContextVar("prefer_primary", default=False)
+
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ReplicaRouter:
+    """
+    Picks the replica engine for the next read-only session.
+
+    Strategies:
+        round_robin: cycle through replicas in order
+        least_connections: replica with the fewest checked-out connections
+    """
+
+    def __init__(self, engines: List[AsyncEngine], strategy: str = "round_robin"):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica selection strategy: {strategy}")
+        self.engines = engines
+        self.strategy = strategy
+        self._cycle = itertools.cycle(range(len(engines)))
+
+    def choose(self) -> int:
+        """Index of the replica to use"""
+        if self.strategy == "least_connections":
+            return min(
+                range(len(self.engines)),
+                key=lambda i: self.engines[i].pool.checkedout(),
+            )
+        return next(self._cycle)
+
+
+class RecentWriters:
+    """
+    Clients that wrote within the last `window` seconds, keyed by a hash of
+    their bearer token (or their address when anonymous). State is per worker.
+    """
+
+    def __init__(self, window: float, max_entries: int = 100_000):
+        self.window = window
+        self.max_entries = max_entries
+        self._deadlines: Dict[str, float] = {}
+
+    def mark(self, key: str) -> None:
+        now = time.monotonic()
+        if len(self._deadlines) >= self.max_entries:
+            self._deadlines = {k: d for k, d in self._deadlines.items() if d > now}
+        self._deadlines[key] = now + self.window
+
+    def is_recent(self, key: str) -> bool:
+        deadline = self._deadlines.get(key)
+        if deadline is None:
+            return False
+        if deadline <= time.monotonic():
+            self._deadlines.pop(key, None)
+            return False
+        return True
+
+
+def client_key(scope: Scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            return hashlib.blake2b(value, digest_size=16).hexdigest()
+    client = scope.get("client")
+    return client[0] if client else None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Routes a client's reads to the primary for a short window after it wrote,
+    so it always sees its own changes despite replication lag
+    """
+
+    def __init__(self, app: ASGIApp, writers: RecentWriters) -> None:
+        self.app = app
+        self.writers = writers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = client_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in _SAFE_METHODS:
+            token = prefer_primary.set(self.writers.is_recent(key))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                prefer_primary.reset(token)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                self.writers.mark(key)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
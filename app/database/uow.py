@@ -0,0 +1,54 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_DEPTH_KEY = "unit_of_work_depth"
+
+
+def supports_returning(session: AsyncSession, statement: str) -> bool:
+    """
+    Whether the session's database can return rows from an "insert", "update"
+    or "delete" statement (SQLite supports it only from 3.35).
+    """
+    return getattr(session.bind.dialect, f"{statement}_returning", False)
+
+
+async def commit(session: AsyncSession) -> None:
+    """
+    Commit point for repository writes: commits right away, or only flushes when
+    the session is inside a unit_of_work so that the caller commits once.
+    """
+    if session.info.get(_DEPTH_KEY):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Group several repository operations into one transaction and one COMMIT.
+
+    Example:
+        async with unit_of_work(session):
+            await AdRepository.update_ad(ad_id, data, session)
+            await UserProfileRepository.update_user_profile(user_id, data, session)
+
+    Domain events queued by the repositories are dispatched after the single
+    commit, or dropped if anything inside the block raises. Nested blocks join
+    the outermost one.
+    """
+    depth = session.info.get(_DEPTH_KEY, 0)
+    session.info[_DEPTH_KEY] = depth + 1
+    try:
+        yield session
+    except BaseException:
+        if depth == 0:
+            await session.rollback()
+        raise
+    else:
+        if depth == 0:
+            await session.commit()
+    finally:
+        session.info[_DEPTH_KEY] = depth
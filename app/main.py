@@ -1,15 +1,44 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-from app.auth.users import auth_backend, fastapi_users
+from app.auth.password import password_helper
+from app.auth.users import auth_backend, fastapi_users, get_jwt_strategy
 from app.core.config import settings
-from app.core.logger import configure_logging, get_logger
-from app.database.config import create_db_and_tables
-from app.routers import profiles, ads
-from app.schemas.users import UserCreate, UserRead, UserUpdate
+from app.core.logger import RequestContextMiddleware, configure_logging, get_logger
+from app.core.metrics import MetricsMiddleware, registry, run_snapshot_writer
+from app.core.pubsub import pubsub
+from app.core.ratelimit import (
+    LoadShedder,
+    Limit,
+    RateLimitMiddleware,
+    RouteLimits,
+    bucket_store,
+)
+from app.core.timing import TimingMiddleware
+from app.database.config import (
+    async_session_maker,
+    create_db_and_tables,
+    dispose_engines,
+    engine,
+    recent_writers,
+    replica_engines,
+    warm_up_pool,
+)
+from app.database.replicas import ReadYourWritesMiddleware
+from app.routers import profiles, ads, users, status, metrics
+from app.schemas.users import UserCreate, UserRead
+from app.services import tasks  # noqa: F401  (registers the job handlers)
+from app.services.ad_stream import ad_stream
+from app.services.jobs import JobWorker
+from app.services.matching import matching_engine
+from app.services.geo import ad_geo
+from app.services.images import image_processor
+from app.services.saved_searches import saved_search_alerts
+from app.services.search import ad_search
 
 # Configure logging
 configure_logging()
@@ -27,8 +56,52 @@ async def lifespan(app: FastAPI):
         )
         await create_db_and_tables()
         logger.info("Database tables created successfully")
+    await pubsub.start()
+    if not pubsub.shared:
+        logger.warning(
+            "REDIS_URL is not set: the in-memory matching, search and nearby "
+            "indexes only see writes made through this worker, so run a "
+            "single worker"
+        )
+    warmed = await warm_up_pool()
+    logger.info("Database pool warmed up", connections=warmed)
+    await matching_engine.ensure_loaded()
+    await ad_search.ensure_loaded()
+    await ad_geo.ensure_loaded()
+    await saved_search_alerts.ensure_loaded()
+    ad_stream.start()
+    snapshot_writer = None
+    if settings.METRICS_MULTIPROC_DIR:
+        snapshot_writer = asyncio.create_task(
+            run_snapshot_writer(
+                registry,
+                settings.METRICS_MULTIPROC_DIR,
+                settings.METRICS_SNAPSHOT_INTERVAL,
+            )
+        )
+    job_worker = None
+    if settings.JOBS_RUN_IN_APP:
+        job_worker = JobWorker(
+            async_session_maker,
+            concurrency=settings.JOBS_CONCURRENCY,
+            poll_interval=settings.JOBS_POLL_INTERVAL,
+            lease_seconds=settings.JOBS_LEASE_SECONDS,
+        )
+        job_worker.start()
     yield  # Application runs here
-    # Cleanup actions, if necessary, can be added here (e.g., closing connections)
+    if job_worker is not None:
+        await job_worker.stop(settings.JOBS_SHUTDOWN_GRACE)
+    if snapshot_writer is not None:
+        snapshot_writer.cancel()
+        await asyncio.gather(snapshot_writer, return_exceptions=True)
+    await saved_search_alerts.drain()
+    await ad_stream.stop()
+    await pubsub.stop()
+    await bucket_store.close()
+    password_helper.shutdown()
+    image_processor.shutdown()
+    await dispose_engines()
+    logger.info("Database engines disposed")
 
 
 def create_application() -> FastAPI:
@@ -45,6 +118,30 @@ def create_application() -> FastAPI:
         redoc_url="/redoc",
     )
 
+    # Added before CORS so that rejected requests get the CORS headers too
+    route_limits = None
+    if settings.RATE_LIMIT_ENABLED:
+        route_limits = RouteLimits(
+            Limit(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST),
+            settings.RATE_LIMIT_ROUTES,
+        )
+        application.add_middleware(
+            RateLimitMiddleware,
+            limits=route_limits,
+            store=bucket_store,
+            shedder=LoadShedder(
+                settings.LOAD_SHED_MAX_IN_FLIGHT,
+                settings.LOAD_SHED_DB_WAIT_SECONDS,
+                settings.LOAD_SHED_WINDOW_SECONDS,
+                [
+                    getattr(pool_engine.pool, "stats", None)
+                    for pool_engine in [engine, *replica_engines]
+                ],
+            ),
+            identify=get_jwt_strategy().read_subject,
+            exempt_paths=settings.LOAD_SHED_EXEMPT_PATHS,
+        )
+
     # Set up CORS middleware
     if settings.BACKEND_CORS_ORIGINS:
         application.add_middleware(
@@ -55,6 +152,19 @@ def create_application() -> FastAPI:
             allow_headers=["*"],
         )
 
+    # Keep a client's reads on the primary right after it writes
+    if replica_engines:
+        application.add_middleware(ReadYourWritesMiddleware, writers=recent_writers)
+
+    application.add_middleware(MetricsMiddleware)
+
+    # Time the whole request, including the other middlewares
+    application.add_middleware(
+        TimingMiddleware, server_timing=settings.SERVER_TIMING_HEADER
+    )
+    # Wraps everything else so that all of the request's log events carry its id
+    application.add_middleware(RequestContextMiddleware)
+
     # Register FastAPI Users routes
     application.include_router(
         fastapi_users.get_auth_router(auth_backend),
@@ -77,7 +187,7 @@ def create_application() -> FastAPI:
         tags=["auth"],
     )
     application.include_router(
-        fastapi_users.get_users_router(UserRead, UserUpdate),
+        users.router,
         prefix=f"{settings.API_V1_STR}/users",
         tags=["users"],
     )
@@ -93,6 +203,8 @@ def create_application() -> FastAPI:
         prefix=f"{settings.API_V1_STR}/ads",
         tags=["ads"],
     )
+    application.include_router(status.router)
+    application.include_router(metrics.router)
 
     # Root endpoint
     @application.get("/", tags=["Status"])
@@ -102,6 +214,12 @@ def create_application() -> FastAPI:
             "message": f"Welcome to the {settings.PROJECT_NAME}. Visit /docs for API documentation.",
         }
 
+    # A rule left behind by a renamed route or prefix would silently do nothing
+    if route_limits is not None:
+        unmatched = route_limits.unmatched(application.router.routes)
+        if unmatched:
+            logger.warning("Rate limit rules match no route", rules=unmatched)
+
     return application
 
 
@@ -1,6 +1,16 @@
 # Import models here for Alembic to detect them
 from app.models.users import User
-from app.models.profiles import UserProfile
+from app.models.profiles import ProfileImage, UserProfile
 from app.models.ads import Ad
+from app.models.jobs import Job
+from app.models.searches import SavedSearch, SavedSearchHit
 
-__all__ = ["User", "UserProfile", "Ad"]
+__all__ = [
+    "User",
+    "UserProfile",
+    "ProfileImage",
+    "Ad",
+    "Job",
+    "SavedSearch",
+    "SavedSearchHit",
+]
@@ -1,9 +1,23 @@
 import enum
 import uuid
+from datetime import datetime, timezone
 
-from sqlalchemy.orm import mapped_column
-from sqlalchemy import String, Integer, Numeric, Text, Enum, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import mapped_column, relationship
+from sqlalchemy import (
+    String,
+    Integer,
+    Float,
+    Numeric,
+    Text,
+    Enum,
+    ForeignKey,
+    DateTime,
+    Index,
+    func,
+    literal_column,
+    text,
+)
+from fastapi_users_db_sqlalchemy.generics import GUID
 
 from app.database.base import Base
 
@@ -20,9 +34,29 @@ class Ad(Base):
     """
 
     __tablename__ = "ads"
+    __table_args__ = (
+        # Keyset pagination sorts by (created_at, ad_id). The equality filter
+        # indexes end with the same pair, so a page filtered on one of them is
+        # read in index order without a sort.
+        Index("ix_ads_created_at_ad_id", "created_at", "ad_id"),
+        Index("ix_ads_owner_created_at", "owner_id", "created_at", "ad_id"),
+        Index("ix_ads_gender_created_at", "gender", "created_at", "ad_id"),
+        Index(
+            "ix_ads_roommates_created_at",
+            "number_of_roommates",
+            "created_at",
+            "ad_id",
+        ),
+        Index("ix_ads_age_created_at", "age_requirements", "created_at", "ad_id"),
+        Index("ix_ads_nationality_created_at", "nationality", "created_at", "ad_id"),
+        # A budget range only narrows the scan: the matching rows come out
+        # ordered by budget, so the page is still sorted afterwards
+        Index("ix_ads_budget_created_at", "budget", "created_at", "ad_id"),
+    )
 
-    ad_id = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    owner_id = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    ad_id = mapped_column(GUID, primary_key=True, default=uuid.uuid4)
+    # Same column type as users.id, so that joins also match on SQLite
+    owner_id = mapped_column(GUID, ForeignKey("users.id"), nullable=False)
 
     # Ad details
     title = mapped_column(String(255), nullable=False)
@@ -38,3 +72,71 @@ class Ad(Base):
     cleanliness = mapped_column(String(255), nullable=True)
     character = mapped_column(String(255), nullable=True)
     lifestyle = mapped_column(String(255), nullable=True)
+
+    # Location (WGS 84); geohash is derived from it on every write
+    latitude = mapped_column(Float, nullable=True)
+    longitude = mapped_column(Float, nullable=True)
+    geohash = mapped_column(String(12), nullable=True)
+
+    created_at = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+    # Relationship with owner (eager load only, see User.profile)
+    owner = relationship("User", lazy="raise_on_sql")
+
+
+# Full-text search document: title ranks above description. Constants are inlined
+# (not bound) so that queries reproduce the indexed expression exactly.
+_SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+AD_SEARCH_VECTOR = func.setweight(
+    func.to_tsvector(_SEARCH_CONFIG, Ad.title), literal_column("'A'")
+).op("||")(
+    func.setweight(
+        func.to_tsvector(
+            _SEARCH_CONFIG, func.coalesce(Ad.description, literal_column("''"))
+        ),
+        literal_column("'B'"),
+    )
+)
+
+Ad.__table__.append_constraint(
+    Index("ix_ads_search_vector", AD_SEARCH_VECTOR, postgresql_using="gin").ddl_if(
+        dialect="postgresql"
+    )
+)
+
+
+def ad_search_query(query: str):
+    """Postgres tsquery for user input in web-search syntax ("a b", -c, "a or b")."""
+    return func.websearch_to_tsquery(_SEARCH_CONFIG, query)
+
+
+# Ad location as a PostGIS geography point. The GiST index exists only where the
+# postgis extension is installed; elsewhere nearby search uses an in-process index.
+_WGS84 = literal_column("4326")
+
+
+def location_point(lat, lon):
+    """PostGIS geography point from latitude/longitude values or columns."""
+    return func.geography(func.ST_SetSRID(func.ST_MakePoint(lon, lat), _WGS84))
+
+
+AD_LOCATION = location_point(Ad.latitude, Ad.longitude)
+
+
+def _postgis_installed(ddl, target, bind, **kw) -> bool:
+    if bind is None or bind.dialect.name != "postgresql":
+        return False
+    query = text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")
+    return bind.execute(query).scalar() is not None
+
+
+Ad.__table__.append_constraint(
+    Index("ix_ads_location", AD_LOCATION, postgresql_using="gist").ddl_if(
+        callable_=_postgis_installed
+    )
+)
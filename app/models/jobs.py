@@ -0,0 +1,49 @@
+import enum
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import mapped_column
+from sqlalchemy import JSON, String, Integer, Text, Enum, DateTime, Index
+from fastapi_users_db_sqlalchemy.generics import GUID
+
+from app.database.base import Base
+
+
+class JobStatus(enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+
+
+class Job(Base):
+    """
+    Outbox row for a background job. Written in the same transaction as the
+    change that needs it and deleted once the job has succeeded; jobs that
+    exhausted their attempts stay behind as FAILED for inspection.
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+    id = mapped_column(GUID, primary_key=True, default=uuid.uuid4)
+    kind = mapped_column(String(100), nullable=False)
+    payload = mapped_column(JSON, nullable=False, default=dict)
+
+    status = mapped_column(Enum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = mapped_column(Integer, nullable=False, default=0)
+    max_attempts = mapped_column(Integer, nullable=False)
+    # Not picked up before this time (set to the backoff delay after a failure)
+    run_at = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    # A RUNNING job whose lease expired belongs to a crashed worker and is retried
+    locked_until = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error = mapped_column(Text, nullable=True)
+
+    created_at = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
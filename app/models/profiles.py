@@ -1,9 +1,22 @@
 import uuid
 import enum
+from datetime import datetime, timezone
 
 from sqlalchemy.orm import mapped_column, relationship
-from sqlalchemy import String, Boolean, ForeignKey, Date, Integer, Float, Enum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    String,
+    Boolean,
+    ForeignKey,
+    Date,
+    DateTime,
+    Index,
+    Integer,
+    Float,
+    Enum,
+    UniqueConstraint,
+    text,
+)
+from fastapi_users_db_sqlalchemy.generics import GUID
 
 from app.database.base import Base
 
@@ -21,9 +34,10 @@ class UserProfile(Base):
 
     __tablename__ = "profiles"
 
-    id = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = mapped_column(GUID, primary_key=True, default=uuid.uuid4)
+    # Same column type as users.id, so that joins also match on SQLite
     user_id = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), unique=True, nullable=False
+        GUID, ForeignKey("users.id"), unique=True, nullable=False
     )
 
     # Personal information
@@ -33,8 +47,56 @@ class UserProfile(Base):
     gender = mapped_column(Enum(Gender))
     birth_date = mapped_column(Date)
 
-    # Image information
+    # Image information: URL of the primary image's thumbnail once images are
+    # uploaded (see ProfileImage), or an external URL set by the client
     image_url = mapped_column(String, nullable=True)
 
     # Relationship with user
-    user = relationship("User", back_populates="profile")
+    user = relationship("User", back_populates="profile", lazy="raise_on_sql")
+    images = relationship(
+        "ProfileImage",
+        order_by="ProfileImage.created_at",
+        lazy="raise_on_sql",
+        passive_deletes=True,
+    )
+
+
+class ProfileImage(Base):
+    """
+    Image uploaded to a profile. The file itself is stored once per content
+    (named by its SHA-256 digest), so the same picture uploaded twice, or to
+    several profiles, shares the original and its thumbnails.
+    """
+
+    __tablename__ = "profile_images"
+    __table_args__ = (
+        UniqueConstraint("profile_id", "digest", name="uq_profile_images_digest"),
+        # At most one primary image per profile
+        Index(
+            "uq_profile_images_primary",
+            "profile_id",
+            unique=True,
+            postgresql_where=text("is_primary"),
+            sqlite_where=text("is_primary"),
+        ),
+    )
+
+    id = mapped_column(GUID, primary_key=True, default=uuid.uuid4)
+    profile_id = mapped_column(
+        GUID, ForeignKey("profiles.id", ondelete="CASCADE"), nullable=False
+    )
+
+    # SHA-256 of the uploaded bytes and the file extension of its format
+    digest = mapped_column(String(64), nullable=False, index=True)
+    extension = mapped_column(String(10), nullable=False)
+    content_type = mapped_column(String(50), nullable=False)
+    size = mapped_column(Integer, nullable=False)
+    width = mapped_column(Integer, nullable=False)
+    height = mapped_column(Integer, nullable=False)
+
+    is_primary = mapped_column(Boolean, nullable=False, default=False)
+    created_at = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
@@ -0,0 +1,79 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import mapped_column
+from sqlalchemy import (
+    String,
+    Integer,
+    Numeric,
+    Enum,
+    ForeignKey,
+    DateTime,
+    Index,
+    UniqueConstraint,
+)
+from fastapi_users_db_sqlalchemy.generics import GUID
+
+from app.database.base import Base
+from app.models.ads import Gender
+
+
+class SavedSearch(Base):
+    """
+    Ad filters saved by a user. New and updated ads matching them are
+    recorded in the user's inbox (SavedSearchHit).
+    """
+
+    __tablename__ = "saved_searches"
+
+    id = mapped_column(GUID, primary_key=True, default=uuid.uuid4)
+    user_id = mapped_column(
+        GUID, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    name = mapped_column(String(100), nullable=True)
+
+    # Same semantics as the GET /ads filters; None means "any"
+    budget_min = mapped_column(Numeric, nullable=True)
+    budget_max = mapped_column(Numeric, nullable=True)
+    gender = mapped_column(Enum(Gender), nullable=True)
+    number_of_roommates = mapped_column(Integer, nullable=True)
+    age_requirements = mapped_column(Integer, nullable=True)
+    nationality = mapped_column(String(100), nullable=True)
+    # Free text: every word must appear in the ad's title or description
+    query = mapped_column(String(200), nullable=True)
+
+    created_at = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+
+class SavedSearchHit(Base):
+    """
+    Inbox entry: an ad that matched one of the user's saved searches when it
+    was created or updated. An ad is recorded once per search.
+    """
+
+    __tablename__ = "saved_search_hits"
+    __table_args__ = (
+        UniqueConstraint("search_id", "ad_id", name="uq_saved_search_hits_ad"),
+        # The inbox is read newest first, a keyset page is one index range scan
+        Index("ix_saved_search_hits_inbox", "user_id", "created_at", "id"),
+    )
+
+    id = mapped_column(GUID, primary_key=True, default=uuid.uuid4)
+    user_id = mapped_column(
+        GUID, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    search_id = mapped_column(
+        GUID, ForeignKey("saved_searches.id", ondelete="CASCADE"), nullable=False
+    )
+    ad_id = mapped_column(
+        GUID, ForeignKey("ads.ad_id", ondelete="CASCADE"), nullable=False
+    )
+    created_at = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
@@ -14,5 +14,8 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
 
     # FastAPI Users already provides: id, email, hashed_password, is_active, is_verified, is_superuser
 
-    # Relationship with profile
-    profile = relationship("UserProfile", back_populates="user", uselist=False)
+    # Relationship with profile; load it with app.database.loading.eager_load,
+    # lazy loading raises instead of issuing a query per user
+    profile = relationship(
+        "UserProfile", back_populates="user", uselist=False, lazy="raise_on_sql"
+    )
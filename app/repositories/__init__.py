@@ -1,4 +1,15 @@
 from app.repositories.profile import UserProfileRepository
+from app.repositories.image import ProfileImageRepository
 from app.repositories.ad import AdRepository
+from app.repositories.job import JobRepository
+from app.repositories.saved_search import SavedSearchRepository
+from app.repositories.user import UserRepository
 
-__all__ = ["UserProfileRepository", "AdRepository"]
+__all__ = [
+    "UserProfileRepository",
+    "ProfileImageRepository",
+    "AdRepository",
+    "JobRepository",
+    "SavedSearchRepository",
+    "UserRepository",
+]
@@ -1,8 +1,75 @@
-from typing import List, Optional, Dict, Any
-from sqlalchemy import select, update, delete
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Dict, Any, Sequence, Set, Tuple
+from sqlalchemy import ColumnElement, Row, Select, select, insert, update, delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
+from app.core.events import emit_after_commit, share, snapshot
+from app.core.geo import encode_geohash
+from app.core.pagination import keyset_position
+from app.database.loading import eager_load
+from app.database.uow import commit, supports_returning
 from app.models.ads import Ad
+from app.models.profiles import UserProfile
+from app.models.users import User
+
+# Фильтры, которые сравниваются на точное совпадение
+_EQUALITY_FILTERS = ("gender", "number_of_roommates", "age_requirements", "nationality")
+
+# Колонки ленты: объявление без длинных полей и краткие данные владельца
+_FEED_COLUMNS = (
+    Ad.ad_id,
+    Ad.owner_id,
+    Ad.title,
+    Ad.budget,
+    Ad.number_of_roommates,
+    Ad.gender,
+    Ad.created_at,
+    UserProfile.first_name.label("owner_first_name"),
+    UserProfile.gender.label("owner_gender"),
+    UserProfile.birth_date.label("owner_birth_date"),
+    UserProfile.image_url.label("owner_image_url"),
+)
+
+
+def _with_geohash(values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Добавляет к данным объявления geohash, если в них есть координаты
+    (схемы гарантируют, что latitude и longitude передаются вместе).
+    """
+    if "latitude" not in values:
+        return values
+    latitude, longitude = values["latitude"], values.get("longitude")
+    geohash = None if latitude is None else encode_geohash(latitude, longitude)
+    return {**values, "geohash": geohash}
+
+
+def _page(
+    stmt: Select,
+    limit: int,
+    after: Optional[Tuple[datetime, UUID]],
+    filters: Optional[Dict[str, Any]],
+) -> Select:
+    """
+    Добавляет к запросу по объявлениям фильтры и keyset-пагинацию (от новых
+    к старым, на одну строку больше limit, чтобы узнать о следующей странице).
+    """
+    filters = filters or {}
+    for name in _EQUALITY_FILTERS:
+        if filters.get(name) is not None:
+            stmt = stmt.where(getattr(Ad, name) == filters[name])
+    if filters.get("budget_min") is not None:
+        stmt = stmt.where(Ad.budget >= filters["budget_min"])
+    if filters.get("budget_max") is not None:
+        stmt = stmt.where(Ad.budget <= filters["budget_max"])
+    if after is not None:
+        sort_key = (Ad.created_at, Ad.ad_id)
+        stmt = stmt.where(tuple_(*sort_key) < keyset_position(sort_key, after))
+    return stmt.order_by(Ad.created_at.desc(), Ad.ad_id.desc()).limit(limit + 1)
+
+
+# Индексы в памяти каждого воркера обновляются по этим событиям
+for _event in ("ad.created", "ad.updated", "ad.deleted"):
+    share(_event, Ad)
 
 
 class AdRepository:
@@ -18,12 +85,128 @@ class AdRepository:
         Returns:
             Созданное объявление.
         """
-        new_ad = Ad(**ad_data)
-        session.add(new_ad)
-        await session.commit()
-        await session.refresh(new_ad)
+        # Значения по умолчанию вычисляются в Python, а серверные (если появятся)
+        # приходят через RETURNING, поэтому refresh() после commit не нужен
+        ad_data = _with_geohash(ad_data)
+        if supports_returning(session, "insert"):
+            stmt = insert(Ad).values(**ad_data).returning(Ad)
+            new_ad = (await session.execute(stmt)).scalars().one()
+        else:
+            new_ad = Ad(**ad_data)
+            session.add(new_ad)
+            await session.flush()
+        emit_after_commit(session, "ad.created", snapshot(new_ad))
+        await commit(session)
         return new_ad
 
+    @staticmethod
+    async def bulk_create_ads(
+        ads_data: List[Dict[str, Any]], session: AsyncSession
+    ) -> List[Ad]:
+        """
+        Создает несколько объявлений одним многострочным INSERT ... RETURNING
+        в одной транзакции.
+
+        Args:
+            ads_data: Список словарей с данными объявлений.
+            session: Сессия для работы с базой данных.
+
+        Returns:
+            Созданные объявления в порядке ads_data.
+        """
+        if not ads_data:
+            return []
+        ads_data = [_with_geohash(data) for data in ads_data]
+        if supports_returning(session, "insert"):
+            result = await session.scalars(insert(Ad).returning(Ad), ads_data)
+            ads = list(result.all())
+        else:
+            ads = [Ad(**data) for data in ads_data]
+            session.add_all(ads)
+            await session.flush()
+        for ad in ads:
+            emit_after_commit(session, "ad.created", snapshot(ad))
+        await commit(session)
+        return ads
+
+    @staticmethod
+    async def bulk_update_ads(
+        updates: List[Dict[str, Any]], session: AsyncSession
+    ) -> List[Ad]:
+        """
+        Обновляет несколько объявлений пакетным UPDATE по первичному ключу
+        (executemany) в одной транзакции.
+
+        Args:
+            updates: Список словарей с ad_id и обновляемыми полями.
+                Все ad_id должны существовать.
+            session: Сессия для работы с базой данных.
+
+        Returns:
+            Обновленные объявления.
+        """
+        if not updates:
+            return []
+        updates = [_with_geohash(item) for item in updates]
+        await session.execute(update(Ad), updates)
+        stmt = select(Ad).where(Ad.ad_id.in_([item["ad_id"] for item in updates]))
+        result = await session.execute(
+            stmt.execution_options(populate_existing=True)
+        )
+        ads = list(result.scalars().all())
+        for ad in ads:
+            emit_after_commit(session, "ad.updated", snapshot(ad))
+        await commit(session)
+        return ads
+
+    @staticmethod
+    async def bulk_delete_ads(ad_ids: List[UUID], session: AsyncSession) -> List[UUID]:
+        """
+        Удаляет несколько объявлений одним DELETE ... RETURNING.
+
+        Args:
+            ad_ids: Идентификаторы объявлений.
+            session: Сессия для работы с базой данных.
+
+        Returns:
+            Идентификаторы фактически удаленных объявлений.
+        """
+        if not ad_ids:
+            return []
+        stmt = delete(Ad).where(Ad.ad_id.in_(ad_ids))
+        if supports_returning(session, "delete"):
+            result = await session.execute(stmt.returning(Ad.ad_id))
+            deleted = list(result.scalars().all())
+        else:
+            deleted = list(await AdRepository.get_existing_ad_ids(ad_ids, session))
+            await session.execute(stmt)
+        for ad_id in deleted:
+            emit_after_commit(session, "ad.deleted", {"ad_id": ad_id})
+        await commit(session)
+        return deleted
+
+    @staticmethod
+    async def get_existing_ad_ids(ad_ids: List[UUID], session: AsyncSession) -> Set[UUID]:
+        """
+        Возвращает те из переданных ID, для которых объявления существуют.
+        """
+        if not ad_ids:
+            return set()
+        result = await session.execute(select(Ad.ad_id).where(Ad.ad_id.in_(ad_ids)))
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def get_existing_owner_ids(
+        owner_ids: List[UUID], session: AsyncSession
+    ) -> Set[UUID]:
+        """
+        Возвращает те из переданных ID владельцев, для которых пользователи существуют.
+        """
+        if not owner_ids:
+            return set()
+        result = await session.execute(select(User.id).where(User.id.in_(owner_ids)))
+        return set(result.scalars().all())
+
     @staticmethod
     async def get_ad_by_id(ad_id: UUID, session: AsyncSession) -> Optional[Ad]:
         """
@@ -41,20 +224,45 @@ class AdRepository:
         return result.scalars().first()
 
     @staticmethod
-    async def get_ads_by_owner(owner_id: UUID, session: AsyncSession) -> List[Ad]:
+    async def get_ads_by_ids(ad_ids: List[UUID], session: AsyncSession) -> List[Ad]:
+        """
+        Получает объявления по списку ID, сохраняя порядок списка.
+
+        Args:
+            ad_ids: Идентификаторы объявлений.
+            session: Сессия для работы с базой данных.
+
+        Returns:
+            Найденные объявления в порядке ad_ids.
+        """
+        if not ad_ids:
+            return []
+        stmt = select(Ad).where(Ad.ad_id.in_(ad_ids))
+        result = await session.execute(stmt)
+        found = {ad.ad_id: ad for ad in result.scalars().all()}
+        return [found[ad_id] for ad_id in ad_ids if ad_id in found]
+
+    @staticmethod
+    async def get_ads_by_owner(
+        owner_id: UUID,
+        session: AsyncSession,
+        columns: Optional[Sequence[ColumnElement]] = None,
+    ) -> List[Ad] | List[Row]:
         """
         Получает все объявления для определенного владельца.
 
         Args:
             owner_id: Идентификатор владельца.
             session: Сессия для работы с базой данных.
+            columns: Если переданы, возвращаются строки только с этими
+                колонками вместо объектов Ad.
 
         Returns:
             Список объявлений владельца.
         """
-        stmt = select(Ad).where(Ad.owner_id == owner_id)
-        result = await session.execute(stmt)
-        return result.scalars().all()
+        stmt = select(*columns) if columns else select(Ad)
+        result = await session.execute(stmt.where(Ad.owner_id == owner_id))
+        return result.all() if columns else result.scalars().all()
 
     @staticmethod
     async def update_ad(
@@ -71,12 +279,21 @@ class AdRepository:
         Returns:
             Обновленное объявление или None, если не найдено.
         """
-        stmt = update(Ad).where(Ad.ad_id == ad_id).values(**updated_data).returning(Ad)
-        result = await session.execute(stmt)
-        ad = result.scalars().first()
+        updated_data = _with_geohash(updated_data)
+        stmt = update(Ad).where(Ad.ad_id == ad_id).values(**updated_data)
+        if supports_returning(session, "update"):
+            result = await session.execute(stmt.returning(Ad))
+            ad = result.scalars().first()
+        else:
+            result = await session.execute(stmt)
+            ad = (
+                await AdRepository.get_ad_by_id(ad_id, session)
+                if result.rowcount
+                else None
+            )
         if ad:
-            await session.commit()
-            await session.refresh(ad)
+            emit_after_commit(session, "ad.updated", snapshot(ad))
+            await commit(session)
         return ad
 
     @staticmethod
@@ -94,21 +311,116 @@ class AdRepository:
         stmt = delete(Ad).where(Ad.ad_id == ad_id)
         result = await session.execute(stmt)
         if result.rowcount > 0:
-            await session.commit()
+            emit_after_commit(session, "ad.deleted", {"ad_id": ad_id})
+            await commit(session)
             return True
         return False
 
     @staticmethod
-    async def get_all_ads(session: AsyncSession) -> List[Ad]:
+    async def get_all_ads(
+        session: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        with_owner_profile: bool = False,
+        columns: Optional[Sequence[ColumnElement]] = None,
+    ) -> Tuple[List[Ad] | List[Row], bool]:
+        """
+        Получает страницу объявлений (keyset-пагинация), от новых к старым.
+
+        Args:
+            session: Сессия для работы с базой данных.
+            limit: Максимальное количество объявлений на странице.
+            after: Позиция (created_at, ad_id) последнего объявления предыдущей страницы.
+            filters: Фильтры: budget_min, budget_max, gender, number_of_roommates,
+                age_requirements, nationality. Значения None игнорируются.
+            with_owner_profile: Сразу загрузить ad.owner.profile; число запросов
+                не зависит от размера страницы.
+            columns: Если переданы, возвращаются строки только с этими
+                колонками вместо объектов Ad (среди них должны быть
+                created_at и ad_id для курсора).
+
+        Returns:
+            Кортеж (объявления страницы, есть ли следующая страница).
+        """
+        if columns:
+            stmt = select(*columns)
+        else:
+            stmt = select(Ad)
+            if with_owner_profile:
+                stmt = stmt.options(eager_load(Ad.owner, User.profile))
+        stmt = _page(stmt, limit, after, filters)
+        result = await session.execute(stmt)
+        ads = list(result.all() if columns else result.scalars().all())
+        return ads[:limit], len(ads) > limit
+
+    @staticmethod
+    async def get_feed(
+        session: AsyncSession,
+        limit: int,
+        after: Optional[Tuple[datetime, UUID]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Row], bool]:
         """
-        Получает все объявления.
+        Получает страницу ленты: краткие данные объявлений вместе с данными
+        профиля владельца, одним запросом с JOIN и только нужными колонками.
 
         Args:
             session: Сессия для работы с базой данных.
+            limit: Максимальное количество объявлений на странице.
+            after: Позиция (created_at, ad_id) последнего объявления предыдущей страницы.
+            filters: Те же фильтры, что и в get_all_ads.
 
         Returns:
-            Список всех объявлений.
+            Кортеж (строки страницы с колонками _FEED_COLUMNS, есть ли следующая
+            страница). Колонки профиля равны None, если у владельца нет профиля.
         """
-        stmt = select(Ad)
+        stmt = select(*_FEED_COLUMNS).outerjoin(
+            UserProfile, UserProfile.user_id == Ad.owner_id
+        )
+        stmt = _page(stmt, limit, after, filters)
         result = await session.execute(stmt)
-        return result.scalars().all()
+        rows = list(result.all())
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    async def stream_all_ads(
+        session: AsyncSession, chunk_size: int
+    ) -> AsyncIterator[Ad]:
+        """
+        Потоково выдает все объявления через серверный курсор.
+
+        Args:
+            session: Сессия для работы с базой данных.
+            chunk_size: Количество строк, получаемых из базы за один раз.
+
+        Yields:
+            Объявления по одному, без загрузки всей таблицы в память.
+        """
+        stmt = select(Ad).execution_options(yield_per=chunk_size)
+        result = await session.stream_scalars(stmt)
+        async for ad in result:
+            yield ad
+
+    @staticmethod
+    async def stream_ad_locations(
+        session: AsyncSession, chunk_size: int
+    ) -> AsyncIterator[Row]:
+        """
+        Потоково выдает координаты объявлений, у которых они заданы.
+
+        Args:
+            session: Сессия для работы с базой данных.
+            chunk_size: Количество строк, получаемых из базы за один раз.
+
+        Yields:
+            Строки (ad_id, latitude, longitude, geohash).
+        """
+        stmt = (
+            select(Ad.ad_id, Ad.latitude, Ad.longitude, Ad.geohash)
+            .where(Ad.geohash.is_not(None))
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await session.stream(stmt)
+        async for row in result:
+            yield row
@@ -0,0 +1,252 @@
+from sqlalchemy import Row, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+import uuid
+from app.core.config import settings
+from app.core.events import emit_after_commit, snapshot
+from app.core.media import file_name, file_url
+from app.database.uow import commit, supports_returning
+from app.models.profiles import ProfileImage, UserProfile
+
+
+def _profile_image_url(image: ProfileImage) -> str:
+    return file_url(
+        file_name(image.digest, image.extension, settings.IMAGES_PROFILE_THUMBNAIL)
+    )
+
+
+class ProfileImageRepository:
+
+    @staticmethod
+    async def get_images(
+        profile_id: uuid.UUID, session: AsyncSession
+    ) -> List[ProfileImage]:
+        """
+        Получает изображения профиля в порядке загрузки
+
+        Args:
+            profile_id: идентификатор профиля
+            session: сессия базы данных
+
+        Returns:
+            Список изображений профиля
+        """
+        stmt = (
+            select(ProfileImage)
+            .where(ProfileImage.profile_id == profile_id)
+            .order_by(ProfileImage.created_at, ProfileImage.id)
+        )
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def count_images(profile_id: uuid.UUID, session: AsyncSession) -> int:
+        """
+        Считает изображения профиля
+
+        Args:
+            profile_id: идентификатор профиля
+            session: сессия базы данных
+
+        Returns:
+            Количество изображений
+        """
+        stmt = select(func.count()).where(ProfileImage.profile_id == profile_id)
+        return await session.scalar(stmt)
+
+    @staticmethod
+    async def is_digest_used(digest: str, session: AsyncSession) -> bool:
+        """
+        Проверяет, ссылается ли хоть одно изображение на файл с этим хешем
+
+        Args:
+            digest: SHA-256 содержимого файла
+            session: сессия базы данных
+
+        Returns:
+            True, если файл еще используется
+        """
+        stmt = select(ProfileImage.id).where(ProfileImage.digest == digest).limit(1)
+        return await session.scalar(stmt) is not None
+
+    @staticmethod
+    async def add_image(
+        profile_id: uuid.UUID,
+        values: Dict[str, Any],
+        primary: bool,
+        session: AsyncSession,
+    ) -> ProfileImage | None:
+        """
+        Добавляет изображение к профилю. Повторная загрузка того же файла в
+        профиль возвращает уже существующее изображение. Первое изображение
+        профиля становится основным.
+
+        Args:
+            profile_id: идентификатор профиля
+            values: digest, extension, content_type, size, width и height
+            primary: сделать изображение основным
+            session: сессия базы данных
+
+        Returns:
+            Изображение профиля или None, если у профиля уже
+            IMAGES_PER_PROFILE изображений
+        """
+        # Загрузки в один профиль идут по очереди: иначе параллельные первые
+        # загрузки обе делают изображение основным и нарушают уникальный индекс
+        await session.execute(
+            select(UserProfile.id).where(UserProfile.id == profile_id).with_for_update()
+        )
+        stmt = select(ProfileImage).where(
+            ProfileImage.profile_id == profile_id,
+            ProfileImage.digest == values["digest"],
+        )
+        image = (await session.execute(stmt)).scalars().first()
+        if image is None:
+            image = ProfileImage(id=uuid.uuid4(), profile_id=profile_id, **values)
+            session.add(image)
+            await session.flush()
+            # Лимит проверяем после вставки: SQLite не блокирует строку профиля,
+            # но вставка захватывает запись в базу, и подсчет видит все
+            # завершенные загрузки
+            count = await ProfileImageRepository.count_images(profile_id, session)
+            if count > settings.IMAGES_PER_PROFILE:
+                await session.delete(image)
+                await commit(session)
+                return None
+
+        if not image.is_primary:
+            has_primary = await session.scalar(
+                select(ProfileImage.id)
+                .where(ProfileImage.profile_id == profile_id, ProfileImage.is_primary)
+                .limit(1)
+            )
+            if primary or has_primary is None:
+                await ProfileImageRepository._make_primary(profile_id, image, session)
+        await commit(session)
+        return image
+
+    @staticmethod
+    async def set_primary_image(
+        profile_id: uuid.UUID, image_id: uuid.UUID, session: AsyncSession
+    ) -> ProfileImage | None:
+        """
+        Делает изображение основным для профиля
+
+        Args:
+            profile_id: идентификатор профиля
+            image_id: идентификатор изображения
+            session: сессия базы данных
+
+        Returns:
+            Изображение или None, если у профиля нет такого изображения
+        """
+        stmt = select(ProfileImage).where(
+            ProfileImage.id == image_id, ProfileImage.profile_id == profile_id
+        )
+        image = (await session.execute(stmt)).scalars().first()
+        if image is None:
+            return None
+        if not image.is_primary:
+            await ProfileImageRepository._make_primary(profile_id, image, session)
+            await commit(session)
+        return image
+
+    @staticmethod
+    async def delete_image(
+        profile_id: uuid.UUID, image_id: uuid.UUID, session: AsyncSession
+    ) -> ProfileImage | None:
+        """
+        Удаляет изображение профиля. Если оно было основным, основным
+        становится последнее загруженное из оставшихся. Файлы не удаляются:
+        они могут использоваться другими профилями.
+
+        Args:
+            profile_id: идентификатор профиля
+            image_id: идентификатор изображения
+            session: сессия базы данных
+
+        Returns:
+            Удаленное изображение или None, если у профиля нет такого изображения
+        """
+        stmt = select(ProfileImage).where(
+            ProfileImage.id == image_id, ProfileImage.profile_id == profile_id
+        )
+        image = (await session.execute(stmt)).scalars().first()
+        if image is None:
+            return None
+        await session.delete(image)
+        await session.flush()
+
+        if image.is_primary:
+            stmt = (
+                select(ProfileImage)
+                .where(ProfileImage.profile_id == profile_id)
+                .order_by(ProfileImage.created_at.desc(), ProfileImage.id.desc())
+                .limit(1)
+            )
+            successor = (await session.execute(stmt)).scalars().first()
+            await ProfileImageRepository._make_primary(profile_id, successor, session)
+        await commit(session)
+        return image
+
+    @staticmethod
+    async def delete_profile_images(
+        user_id: uuid.UUID, session: AsyncSession
+    ) -> List[Row]:
+        """
+        Удаляет все изображения профиля пользователя (без фиксации транзакции)
+
+        Args:
+            user_id: идентификатор пользователя
+            session: сессия базы данных
+
+        Returns:
+            Строки (digest, extension) удаленных изображений
+        """
+        profile_ids = select(UserProfile.id).where(UserProfile.user_id == user_id)
+        where = ProfileImage.profile_id.in_(profile_ids)
+        files = (ProfileImage.digest, ProfileImage.extension)
+        if supports_returning(session, "delete"):
+            stmt = delete(ProfileImage).where(where).returning(*files)
+            return (await session.execute(stmt)).all()
+        rows = (await session.execute(select(*files).where(where))).all()
+        if rows:
+            await session.execute(delete(ProfileImage).where(where))
+        return rows
+
+    @staticmethod
+    async def _make_primary(
+        profile_id: uuid.UUID, image: Optional[ProfileImage], session: AsyncSession
+    ) -> None:
+        """
+        Переключает основное изображение профиля и обновляет image_url профиля
+        (None — у профиля не осталось изображений)
+        """
+        # Сначала снимаем флаг: уникальный индекс допускает одно основное изображение
+        clear = update(ProfileImage).where(
+            ProfileImage.profile_id == profile_id, ProfileImage.is_primary
+        )
+        if image is not None:
+            clear = clear.where(ProfileImage.id != image.id)
+        await session.execute(clear.values(is_primary=False))
+        if image is not None:
+            image.is_primary = True
+            await session.flush()
+
+        image_url = _profile_image_url(image) if image is not None else None
+        stmt = (
+            update(UserProfile)
+            .where(UserProfile.id == profile_id)
+            .values(image_url=image_url)
+        )
+        if supports_returning(session, "update"):
+            result = await session.execute(stmt.returning(UserProfile))
+            profile = result.scalars().first()
+        else:
+            await session.execute(stmt)
+            result = await session.execute(
+                select(UserProfile).where(UserProfile.id == profile_id)
+            )
+            profile = result.scalars().first()
+        if profile is not None:
+            emit_after_commit(session, "profile.updated", snapshot(profile))
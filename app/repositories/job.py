@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Any, Dict, List
+import uuid
+from app.core.events import emit_after_commit
+from app.database.uow import commit
+from app.models.jobs import Job, JobStatus
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobRepository:
+
+    @staticmethod
+    async def enqueue(
+        kind: str,
+        payload: Dict[str, Any],
+        max_attempts: int,
+        session: AsyncSession,
+        delay: float = 0.0,
+    ) -> Job:
+        """
+        Добавляет задачу в outbox. Внутри unit_of_work задача фиксируется
+        вместе с остальными изменениями транзакции.
+
+        Args:
+            kind: тип задачи (имя обработчика)
+            payload: JSON-совместимые параметры задачи
+            max_attempts: максимальное число попыток
+            session: сессия базы данных
+            delay: через сколько секунд задачу можно выполнять
+
+        Returns:
+            Созданная задача
+        """
+        job = Job(
+            id=uuid.uuid4(),
+            kind=kind,
+            payload=payload,
+            status=JobStatus.PENDING,
+            attempts=0,
+            max_attempts=max_attempts,
+            run_at=_now() + timedelta(seconds=delay),
+        )
+        session.add(job)
+        emit_after_commit(session, "job.enqueued", {"id": job.id, "kind": kind})
+        await commit(session)
+        return job
+
+    @staticmethod
+    async def claim_due_jobs(
+        limit: int, lease_seconds: float, session: AsyncSession
+    ) -> List[Job]:
+        """
+        Забирает готовые к выполнению задачи: ожидающие, у которых наступил
+        run_at, и выполняющиеся, у которых истекла аренда (воркер упал).
+
+        Каждая задача захватывается условным UPDATE по числу попыток, поэтому
+        несколько воркеров не выполнят одну задачу дважды даже без
+        SKIP LOCKED (SQLite).
+
+        Args:
+            limit: максимальное число задач
+            lease_seconds: на сколько секунд задача закрепляется за воркером
+            session: сессия базы данных
+
+        Returns:
+            Захваченные задачи (attempts уже увеличен)
+        """
+        now = _now()
+        stmt = (
+            select(Job.id, Job.attempts)
+            .where(
+                or_(
+                    and_(Job.status == JobStatus.PENDING, Job.run_at <= now),
+                    and_(Job.status == JobStatus.RUNNING, Job.locked_until <= now),
+                )
+            )
+            .order_by(Job.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        candidates = (await session.execute(stmt)).all()
+
+        claimed_ids = []
+        for job_id, attempts in candidates:
+            result = await session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.attempts == attempts)
+                .values(
+                    status=JobStatus.RUNNING,
+                    attempts=attempts + 1,
+                    locked_until=now + timedelta(seconds=lease_seconds),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed_ids.append(job_id)
+        await commit(session)
+
+        if not claimed_ids:
+            return []
+        result = await session.execute(
+            select(Job)
+            .where(Job.id.in_(claimed_ids))
+            .order_by(Job.run_at)
+            .execution_options(populate_existing=True)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def complete(job: Job, session: AsyncSession) -> None:
+        """
+        Удаляет успешно выполненную задачу
+
+        Args:
+            job: захваченная задача
+            session: сессия базы данных
+        """
+        await session.execute(
+            delete(Job).where(Job.id == job.id, Job.attempts == job.attempts)
+        )
+        await commit(session)
+
+    @staticmethod
+    async def record_failure(
+        job: Job, error: str, retry_in: float | None, session: AsyncSession
+    ) -> None:
+        """
+        Отмечает неудачную попытку: задача снова ждет retry_in секунд или,
+        если retry_in равен None, окончательно переходит в FAILED
+
+        Args:
+            job: захваченная задача
+            error: текст ошибки
+            retry_in: задержка до следующей попытки в секундах или None
+            session: сессия базы данных
+        """
+        values: Dict[str, Any] = {"last_error": error, "locked_until": None}
+        if retry_in is None:
+            values["status"] = JobStatus.FAILED
+        else:
+            values["status"] = JobStatus.PENDING
+            values["run_at"] = _now() + timedelta(seconds=retry_in)
+        await session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.attempts == job.attempts)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await commit(session)
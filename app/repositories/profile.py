@@ -1,15 +1,28 @@
+from sqlalchemy import ColumnElement, Row, delete, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence
 import uuid
+from app.core.events import emit_after_commit, share, snapshot
+from app.database.uow import commit, supports_returning
 from app.models.profiles import UserProfile
 
+# Колонки профиля, которые можно задать через create/update
+_PROFILE_COLUMNS = frozenset(
+    column.key for column in UserProfile.__table__.columns
+) - {"id", "user_id"}
+
+
+# Индексы в памяти каждого воркера обновляются по этим событиям
+for _event in ("profile.created", "profile.updated", "profile.deleted"):
+    share(_event, UserProfile)
+
 
 class UserProfileRepository:
 
     @staticmethod
     async def create_user_profile(
-        user_id: str, profile_data: Dict[str, Any], session: AsyncSession
+        user_id: uuid.UUID, profile_data: Dict[str, Any], session: AsyncSession
     ) -> UserProfile:
         """
         Создает новый профиль пользователя
@@ -22,15 +35,22 @@ class UserProfileRepository:
         Returns:
             Созданный профиль пользователя
         """
-        new_profile = UserProfile(user_id=user_id, **profile_data)
-        session.add(new_profile)
-        await session.commit()
-        await session.refresh(new_profile)
+        values = {k: v for k, v in profile_data.items() if k in _PROFILE_COLUMNS}
+        if supports_returning(session, "insert"):
+            stmt = insert(UserProfile).values(user_id=user_id, **values)
+            result = await session.execute(stmt.returning(UserProfile))
+            new_profile = result.scalars().one()
+        else:
+            new_profile = UserProfile(user_id=user_id, **values)
+            session.add(new_profile)
+            await session.flush()
+        emit_after_commit(session, "profile.created", snapshot(new_profile))
+        await commit(session)
         return new_profile
 
     @staticmethod
     async def get_user_profile(
-        user_id: str, session: AsyncSession
+        user_id: uuid.UUID, session: AsyncSession
     ) -> UserProfile | None:
         """
         Получает профиль пользователя по его ID
@@ -65,23 +85,67 @@ class UserProfileRepository:
         return result.scalars().first()
 
     @staticmethod
-    async def get_all_user_profiles(session: AsyncSession) -> List[UserProfile]:
+    async def get_profiles_by_user_ids(
+        user_ids: List[uuid.UUID], session: AsyncSession
+    ) -> List[UserProfile]:
+        """
+        Получает профили по списку user_id, сохраняя порядок списка
+
+        Args:
+            user_ids: идентификаторы пользователей
+            session: сессия базы данных
+
+        Returns:
+            Найденные профили в порядке user_ids
+        """
+        if not user_ids:
+            return []
+        stmt = select(UserProfile).where(UserProfile.user_id.in_(user_ids))
+        result = await session.execute(stmt)
+        found = {profile.user_id: profile for profile in result.scalars().all()}
+        return [found[user_id] for user_id in user_ids if user_id in found]
+
+    @staticmethod
+    async def get_all_user_profiles(
+        session: AsyncSession, columns: Optional[Sequence[ColumnElement]] = None
+    ) -> List[UserProfile] | List[Row]:
         """
         Получает все профили пользователей
 
         Args:
             session: сессия базы данных
+            columns: если переданы, возвращаются строки только с этими
+                колонками вместо объектов UserProfile
 
         Returns:
             Список всех профилей пользователей
         """
-        stmt = select(UserProfile)
+        stmt = select(*columns) if columns else select(UserProfile)
         result = await session.execute(stmt)
-        return result.scalars().all()
+        return result.all() if columns else result.scalars().all()
+
+    @staticmethod
+    async def stream_all_user_profiles(
+        session: AsyncSession, chunk_size: int
+    ) -> AsyncIterator[UserProfile]:
+        """
+        Потоково выдает все профили пользователей через серверный курсор
+
+        Args:
+            session: сессия базы данных
+            chunk_size: количество строк, получаемых из базы за один раз
+
+        Yields:
+            Профили по одному, без загрузки всей таблицы в память
+        """
+        stmt = select(UserProfile).execution_options(yield_per=chunk_size)
+        result = await session.stream_scalars(stmt)
+        async for profile in result:
+            yield profile
 
     @staticmethod
     async def update_user_profile(
-        user_id: str, updated_data: Dict[str, Any], session: AsyncSession
+        user_id: uuid.UUID, updated_data: Dict[str, Any], session: AsyncSession
     ) -> UserProfile | None:
         """
         Обновляет информацию профиля пользователя
@@ -94,20 +158,33 @@ class UserProfileRepository:
         Returns:
             Обновлённый профиль пользователя или None, если профиль не найден
         """
-        profile = await UserProfileRepository.get_user_profile(user_id, session)
+        values = {k: v for k, v in updated_data.items() if k in _PROFILE_COLUMNS}
+        if not values:
+            return await UserProfileRepository.get_user_profile(user_id, session)
+
+        # Один UPDATE ... RETURNING вместо SELECT + UPDATE + SELECT
+        stmt = (
+            update(UserProfile).where(UserProfile.user_id == user_id).values(**values)
+        )
+        if supports_returning(session, "update"):
+            result = await session.execute(stmt.returning(UserProfile))
+            profile = result.scalars().first()
+        else:
+            result = await session.execute(stmt)
+            profile = (
+                await UserProfileRepository.get_user_profile(user_id, session)
+                if result.rowcount
+                else None
+            )
         if not profile:
             return None
 
-        for key, value in updated_data.items():
-            if hasattr(profile, key):
-                setattr(profile, key, value)
-
-        await session.commit()
-        await session.refresh(profile)
+        emit_after_commit(session, "profile.updated", snapshot(profile))
+        await commit(session)
         return profile
 
     @staticmethod
-    async def delete_user_profile(user_id: str, session: AsyncSession) -> bool:
+    async def delete_user_profile(user_id: uuid.UUID, session: AsyncSession) -> bool:
         """
         Удаляет профиль пользователя по его ID
 
@@ -118,10 +195,11 @@ class UserProfileRepository:
         Returns:
             True, если профиль был успешно удалён, иначе False
         """
-        profile = await UserProfileRepository.get_user_profile(user_id, session)
-        if not profile:
+        stmt = delete(UserProfile).where(UserProfile.user_id == user_id)
+        result = await session.execute(stmt)
+        if result.rowcount == 0:
             return False
 
-        await session.delete(profile)
-        await session.commit()
+        emit_after_commit(session, "profile.deleted", {"user_id": user_id})
+        await commit(session)
         return True
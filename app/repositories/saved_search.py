@@ -0,0 +1,218 @@
+from datetime import datetime
+from sqlalchemy import Row, delete, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import uuid
+from app.core.events import emit_after_commit, snapshot
+from app.core.pagination import keyset_position
+from app.database.uow import commit
+from app.models.ads import Ad
+from app.models.searches import SavedSearch, SavedSearchHit
+
+
+class SavedSearchRepository:
+
+    @staticmethod
+    async def create_search(
+        user_id: uuid.UUID, search_data: Dict[str, Any], session: AsyncSession
+    ) -> SavedSearch:
+        """
+        Сохраняет поиск пользователя
+
+        Args:
+            user_id: идентификатор пользователя
+            search_data: название и фильтры поиска
+            session: сессия базы данных
+
+        Returns:
+            Сохраненный поиск
+        """
+        search = SavedSearch(id=uuid.uuid4(), user_id=user_id, **search_data)
+        session.add(search)
+        await session.flush()
+        emit_after_commit(session, "saved_search.created", snapshot(search))
+        await commit(session)
+        return search
+
+    @staticmethod
+    async def get_user_searches(
+        user_id: uuid.UUID, session: AsyncSession
+    ) -> List[SavedSearch]:
+        """
+        Получает сохраненные поиски пользователя в порядке создания
+
+        Args:
+            user_id: идентификатор пользователя
+            session: сессия базы данных
+
+        Returns:
+            Список сохраненных поисков
+        """
+        stmt = (
+            select(SavedSearch)
+            .where(SavedSearch.user_id == user_id)
+            .order_by(SavedSearch.created_at, SavedSearch.id)
+        )
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def count_user_searches(user_id: uuid.UUID, session: AsyncSession) -> int:
+        """
+        Считает сохраненные поиски пользователя
+
+        Args:
+            user_id: идентификатор пользователя
+            session: сессия базы данных
+
+        Returns:
+            Количество сохраненных поисков
+        """
+        stmt = select(func.count()).where(SavedSearch.user_id == user_id)
+        return await session.scalar(stmt)
+
+    @staticmethod
+    async def stream_all_searches(
+        session: AsyncSession, chunk_size: int
+    ) -> AsyncIterator[SavedSearch]:
+        """
+        Потоково выдает все сохраненные поиски через серверный курсор
+
+        Args:
+            session: сессия базы данных
+            chunk_size: количество строк, получаемых из базы за один раз
+
+        Yields:
+            Сохраненные поиски по одному
+        """
+        stmt = select(SavedSearch).execution_options(yield_per=chunk_size)
+        result = await session.stream_scalars(stmt)
+        async for search in result:
+            yield search
+
+    @staticmethod
+    async def update_search(
+        user_id: uuid.UUID,
+        search_id: uuid.UUID,
+        search_data: Dict[str, Any],
+        session: AsyncSession,
+    ) -> SavedSearch | None:
+        """
+        Заменяет название и фильтры сохраненного поиска
+
+        Args:
+            user_id: идентификатор пользователя
+            search_id: идентификатор поиска
+            search_data: новые название и фильтры
+            session: сессия базы данных
+
+        Returns:
+            Обновленный поиск или None, если у пользователя нет такого поиска
+        """
+        stmt = select(SavedSearch).where(
+            SavedSearch.id == search_id, SavedSearch.user_id == user_id
+        )
+        search = (await session.execute(stmt)).scalars().first()
+        if search is None:
+            return None
+        for key, value in search_data.items():
+            setattr(search, key, value)
+        await session.flush()
+        emit_after_commit(session, "saved_search.updated", snapshot(search))
+        await commit(session)
+        return search
+
+    @staticmethod
+    async def delete_search(
+        user_id: uuid.UUID, search_id: uuid.UUID, session: AsyncSession
+    ) -> bool:
+        """
+        Удаляет сохраненный поиск вместе с его записями во входящих
+
+        Args:
+            user_id: идентификатор пользователя
+            search_id: идентификатор поиска
+            session: сессия базы данных
+
+        Returns:
+            True, если поиск был удален, иначе False
+        """
+        stmt = delete(SavedSearch).where(
+            SavedSearch.id == search_id, SavedSearch.user_id == user_id
+        )
+        result = await session.execute(stmt)
+        if result.rowcount == 0:
+            return False
+        # ON DELETE CASCADE не срабатывает на SQLite без PRAGMA foreign_keys
+        await session.execute(
+            delete(SavedSearchHit).where(SavedSearchHit.search_id == search_id)
+        )
+        emit_after_commit(session, "saved_search.deleted", {"id": search_id})
+        await commit(session)
+        return True
+
+    @staticmethod
+    async def add_hits(hits: List[Dict[str, Any]], session: AsyncSession) -> None:
+        """
+        Добавляет совпадения во входящие. Совпадения, которые уже записаны
+        (то же объявление для того же поиска), пропускаются.
+
+        Args:
+            hits: словари с user_id, search_id и ad_id
+            session: сессия базы данных
+        """
+        if not hits:
+            return
+        rows = [{"id": uuid.uuid4(), **hit} for hit in hits]
+        dialect = session.bind.dialect.name
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(SavedSearchHit).on_conflict_do_nothing(
+            index_elements=["search_id", "ad_id"]
+        )
+        await session.execute(stmt, rows)
+        await commit(session)
+
+    @staticmethod
+    async def get_inbox(
+        user_id: uuid.UUID,
+        limit: int,
+        after: Optional[Tuple[datetime, uuid.UUID]],
+        since: Optional[Tuple[datetime, uuid.UUID]],
+        session: AsyncSession,
+    ) -> Tuple[List[Row], bool]:
+        """
+        Получает страницу входящих пользователя, от новых к старым
+
+        Args:
+            user_id: идентификатор пользователя
+            limit: размер страницы
+            after: позиция (created_at, id), после которой начинается страница
+            since: только записи новее этой позиции
+            session: сессия базы данных
+
+        Returns:
+            Строки (id, search_id, created_at, Ad) и признак наличия следующей
+            страницы
+        """
+        sort_key = (SavedSearchHit.created_at, SavedSearchHit.id)
+        position = tuple_(*sort_key)
+        stmt = (
+            select(
+                SavedSearchHit.id,
+                SavedSearchHit.search_id,
+                SavedSearchHit.created_at,
+                Ad,
+            )
+            .join(Ad, Ad.ad_id == SavedSearchHit.ad_id)
+            .where(SavedSearchHit.user_id == user_id)
+        )
+        if after is not None:
+            stmt = stmt.where(position < keyset_position(sort_key, after))
+        if since is not None:
+            stmt = stmt.where(position > keyset_position(sort_key, since))
+        stmt = stmt.order_by(
+            SavedSearchHit.created_at.desc(), SavedSearchHit.id.desc()
+        ).limit(limit + 1)
+        rows = (await session.execute(stmt)).all()
+        return rows[:limit], len(rows) > limit
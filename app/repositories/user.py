@@ -0,0 +1,86 @@
+from sqlalchemy import insert, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import make_transient_to_detached
+from typing import Any, Dict, Optional
+import uuid
+from app.core.events import emit_after_commit, snapshot
+from app.database.loading import eager_load
+from app.database.uow import commit
+from app.models.profiles import UserProfile
+from app.models.users import User
+
+
+def _with_defaults(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Значения всех колонок пользователя с примененными клиентскими default"""
+    row = dict(values)
+    row.setdefault("id", uuid.uuid4())
+    for column in User.__table__.columns:
+        if column.key not in row and column.default is not None and column.default.is_scalar:
+            row[column.key] = column.default.arg
+    return row
+
+
+class UserRepository:
+
+    @staticmethod
+    async def create_user_with_profile(
+        user_data: Dict[str, Any], session: AsyncSession
+    ) -> User:
+        """
+        Создает пользователя вместе с пустым профилем в одной транзакции.
+
+        На PostgreSQL обе строки вставляются одним запросом (INSERT профиля
+        читает id из data-modifying CTE с INSERT пользователя), на остальных
+        базах — одним flush из двух INSERT. Все значения пользователя известны
+        заранее, поэтому перечитывать строку не нужно.
+
+        Args:
+            user_data: данные пользователя (email, hashed_password, ...)
+            session: сессия базы данных
+
+        Returns:
+            Созданный пользователь
+        """
+        values = _with_defaults(user_data)
+        profile = UserProfile(id=uuid.uuid4(), user_id=values["id"])
+
+        if session.bind.dialect.name == "postgresql":
+            new_user = insert(User).values(**values).returning(User.id).cte("new_user")
+            await session.execute(
+                insert(UserProfile).from_select(
+                    [UserProfile.id, UserProfile.user_id],
+                    select(literal(profile.id, UserProfile.id.type), new_user.c.id),
+                )
+            )
+            user = User(**values)
+            # Строка уже вставлена: добавляем объект в сессию как persistent
+            make_transient_to_detached(user)
+            session.add(user)
+        else:
+            user = User(**values)
+            session.add_all([user, profile])
+            await session.flush()
+
+        emit_after_commit(session, "profile.created", snapshot(profile))
+        await commit(session)
+        return user
+
+    @staticmethod
+    async def get_user_with_profile(
+        user_id: uuid.UUID, session: AsyncSession
+    ) -> Optional[User]:
+        """
+        Получает пользователя вместе с профилем (профиль загружается сразу,
+        стратегией из settings.EAGER_LOADING_STRATEGY)
+
+        Args:
+            user_id: идентификатор пользователя
+            session: сессия базы данных
+
+        Returns:
+            Пользователь с загруженным profile или None, если не найден
+        """
+        stmt = select(User).where(User.id == user_id).options(eager_load(User.profile))
+        result = await session.execute(stmt)
+        return result.scalars().first()
@@ -1,6 +1,6 @@
 # This file makes the directory a Python package
-from app.routers import profiles, ads, auth, users
+from app.routers import profiles, ads, auth, users, status, metrics
 
 # The auth and users routers are handled directly by FastAPI Users
 # in the main.py file, so we don't need to include them here
-__all__ = ["profiles", "auth", "users", "ads"]
+__all__ = ["profiles", "auth", "users", "ads", "status", "metrics"]
@@ -1,15 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 from uuid import UUID
 
-from app.database.deps import get_async_session
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.serialization import list_response, page_response, row_columns
+from app.core.streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from app.database.config import read_session_maker
+from app.database.deps import get_async_session, get_read_session
+from app.models.ads import Ad, Gender
+from app.core.events import snapshot
 from app.repositories.ad import AdRepository
-from app.schemas.ads import AdCreate, AdUpdate, AdResponse
+from app.repositories.profile import UserProfileRepository
+from app.schemas.ads import (
+    AdBulkDeleteResult,
+    AdBulkResult,
+    AdBulkUpdateItem,
+    AdCreate,
+    AdFeedItem,
+    AdFeedOwner,
+    AdFeedPage,
+    AdNearbyHit,
+    AdPage,
+    AdResponse,
+    AdSearchHit,
+    AdUpdate,
+    AdWithOwnerPage,
+    BulkItemError,
+)
+from app.schemas.matching import ProfileMatch
+from app.services.ad_stream import MEDIA_TYPE as EVENT_STREAM_MEDIA_TYPE, ad_stream
+from app.services.geo import ad_geo
+from app.services.matching import matching_engine
+from app.services.response_cache import ad_key, response_cache
+from app.services.search import ad_search
 
 
 router = APIRouter(prefix="/ads", tags=["Ads"])
 
+# Связанные данные, которые можно запросить параметром include
+_INCLUDES = {"owner_profile"}
+
+# Колонки ответа AdResponse для быстрой сериализации списков
+_AD_COLUMNS = row_columns(Ad, AdResponse)
+
 
 @router.post("/", response_model=AdResponse)
 async def create_ad(
@@ -22,32 +61,367 @@ async def create_ad(
     return new_ad
 
 
-@router.get("/{ad_id}", response_model=AdResponse)
-async def get_ad(ad_id: UUID, session: AsyncSession = Depends(get_async_session)):
+def _validate_bulk_items(
+    items: List[Dict[str, Any]], schema: Type[BaseModel]
+) -> Tuple[List[Tuple[int, Any]], List[BulkItemError]]:
+    """
+    Валидирует элементы пакета по отдельности, чтобы ошибка в одном элементе
+    не отклоняла весь пакет.
+    """
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            detail = exc.errors(include_url=False, include_context=False)
+            errors.append(BulkItemError(index=index, detail=detail))
+    return valid, errors
+
+
+@router.post("/bulk", response_model=AdBulkResult)
+async def bulk_create_ads(
+    items: List[Dict[str, Any]] = Body(..., max_length=settings.ADS_BULK_MAX_ITEMS),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Создать несколько объявлений за один запрос (элементы в формате AdCreate).
+
+    Все корректные элементы создаются в одной транзакции, ошибки возвращаются
+    по индексу элемента.
+    """
+    valid, errors = _validate_bulk_items(items, AdCreate)
+    owners = await AdRepository.get_existing_owner_ids(
+        list({ad.owner_id for _, ad in valid}), session
+    )
+    rows = []
+    for index, ad in valid:
+        if ad.owner_id not in owners:
+            errors.append(BulkItemError(index=index, detail="Owner not found"))
+        else:
+            rows.append(ad.model_dump())
+
+    created = await AdRepository.bulk_create_ads(rows, session)
+    return AdBulkResult(items=created, errors=sorted(errors, key=lambda e: e.index))
+
+
+@router.patch("/bulk", response_model=AdBulkResult)
+async def bulk_update_ads(
+    items: List[Dict[str, Any]] = Body(..., max_length=settings.ADS_BULK_MAX_ITEMS),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Обновить несколько объявлений за один запрос (элементы в формате AdUpdate
+    с обязательным ad_id).
+    """
+    valid, errors = _validate_bulk_items(items, AdBulkUpdateItem)
+    existing = await AdRepository.get_existing_ad_ids(
+        [item.ad_id for _, item in valid], session
+    )
+    updates, seen = [], set()
+    for index, item in valid:
+        values = item.model_dump(exclude_unset=True)
+        if item.ad_id not in existing:
+            errors.append(BulkItemError(index=index, detail="Ad not found"))
+        elif len(values) == 1:
+            errors.append(BulkItemError(index=index, detail="No fields to update"))
+        elif item.ad_id in seen:
+            errors.append(BulkItemError(index=index, detail="Duplicate ad_id"))
+        else:
+            seen.add(item.ad_id)
+            updates.append(values)
+
+    updated = await AdRepository.bulk_update_ads(updates, session)
+    return AdBulkResult(items=updated, errors=sorted(errors, key=lambda e: e.index))
+
+
+@router.delete("/bulk", response_model=AdBulkDeleteResult)
+async def bulk_delete_ads(
+    ad_ids: List[UUID] = Body(
+        ..., embed=True, max_length=settings.ADS_BULK_MAX_ITEMS
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Удалить несколько объявлений за один запрос.
+    """
+    deleted = await AdRepository.bulk_delete_ads(ad_ids, session)
+    removed = set(deleted)
+    errors = [
+        BulkItemError(index=index, detail="Ad not found")
+        for index, ad_id in enumerate(ad_ids)
+        if ad_id not in removed
+    ]
+    return AdBulkDeleteResult(deleted=deleted, errors=errors)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def export_ads():
+    """
+    Выгрузить все объявления в формате NDJSON (по одному объекту на строку).
+    """
+
+    async def rows():
+        # Сессия живет столько же, сколько и поток ответа
+        async with read_session_maker()() as session:
+            async for ad in AdRepository.stream_all_ads(
+                session, settings.EXPORT_CHUNK_SIZE
+            ):
+                yield ad
+
+    return ndjson_response(rows(), AdResponse, settings.EXPORT_CHUNK_SIZE)
+
+
+@router.get("/search", response_model=List[AdSearchHit])
+async def search_ads(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(
+        settings.SEARCH_DEFAULT_LIMIT, ge=1, le=settings.SEARCH_MAX_LIMIT
+    ),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Полнотекстовый поиск по заголовкам и описаниям объявлений.
+    """
+    hits = await ad_search.search(q, limit, session)
+    return [AdSearchHit(score=score, ad=ad) for ad, score in hits]
+
+
+@router.get("/nearby", response_model=List[AdNearbyHit])
+async def get_nearby_ads(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0, le=settings.NEARBY_MAX_RADIUS_KM),
+    limit: int = Query(
+        settings.NEARBY_DEFAULT_LIMIT, ge=1, le=settings.NEARBY_MAX_LIMIT
+    ),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Объявления в радиусе radius_km от точки (lat, lon), от ближних к дальним.
+    """
+    hits = await ad_geo.nearby(lat, lon, radius_km, limit, session)
+    return [AdNearbyHit(distance_km=distance, ad=ad) for ad, distance in hits]
+
+
+def _ad_filters(
+    budget_min: Optional[Decimal] = None,
+    budget_max: Optional[Decimal] = None,
+    gender: Optional[Gender] = None,
+    number_of_roommates: Optional[int] = None,
+    age_requirements: Optional[int] = None,
+    nationality: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Фильтры списка объявлений из параметров запроса.
+    """
+    return {
+        "budget_min": budget_min,
+        "budget_max": budget_max,
+        "gender": gender,
+        "number_of_roommates": number_of_roommates,
+        "age_requirements": age_requirements,
+        "nationality": nationality,
+    }
+
+
+def _page_position(cursor: Optional[str] = None) -> Optional[Tuple[datetime, UUID]]:
+    """
+    Позиция, после которой начинается страница, из параметра cursor.
+    """
+    try:
+        return decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _age(birth_date: Optional[date], today: date) -> Optional[int]:
+    """
+    Полных лет на дату today.
+    """
+    if birth_date is None:
+        return None
+    return today.year - birth_date.year - (
+        (today.month, today.day) < (birth_date.month, birth_date.day)
+    )
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {EVENT_STREAM_MEDIA_TYPE: {}}},
+        503: {"description": "Too many open streams"},
+    },
+)
+async def stream_ads(filters: Dict[str, Any] = Depends(_ad_filters)):
+    """
+    Поток изменений объявлений (Server-Sent Events): события ad.created и
+    ad.updated с объявлением и ad.deleted с ad_id.
+
+    Фильтры такие же, как у списка объявлений; удаления приходят всем
+    подписчикам. Клиент, который не успевает читать события, получает
+    событие overflow и отключается. После переподключения список нужно
+    загрузить заново: пропущенные события не повторяются.
+    """
+    if ad_stream.full:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many open streams",
+            headers={"Retry-After": "30"},
+        )
+    return StreamingResponse(
+        ad_stream.events(filters),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        # Прокси не должны буферизовать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/feed", response_model=AdFeedPage)
+async def get_feed(
+    limit: int = Query(settings.ADS_PAGE_SIZE, ge=1, le=settings.ADS_MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, UUID]] = Depends(_page_position),
+    filters: Dict[str, Any] = Depends(_ad_filters),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Получить страницу ленты: краткие данные объявлений вместе с именем, полом,
+    возрастом и фото владельца, одним запросом к базе.
+
+    Фильтры и пагинация такие же, как у списка объявлений.
+    """
+    rows, has_more = await AdRepository.get_feed(session, limit, after, filters)
+    today = date.today()
+    items = [
+        AdFeedItem(
+            ad_id=row.ad_id,
+            title=row.title,
+            budget=row.budget,
+            number_of_roommates=row.number_of_roommates,
+            gender=row.gender,
+            created_at=row.created_at,
+            owner=AdFeedOwner(
+                user_id=row.owner_id,
+                first_name=row.owner_first_name,
+                gender=row.owner_gender,
+                age=_age(row.owner_birth_date, today),
+                image_url=row.owner_image_url,
+            ),
+        )
+        for row in rows
+    ]
+    next_cursor = (
+        encode_cursor(rows[-1].created_at, rows[-1].ad_id) if has_more else None
+    )
+    return AdFeedPage(items=items, next_cursor=next_cursor)
+
+
+@router.get(
+    "/{ad_id}",
+    response_model=AdResponse,
+    responses={304: {"description": "Not modified (If-None-Match)"}},
+)
+async def get_ad(
+    ad_id: UUID, request: Request, session: AsyncSession = Depends(get_read_session)
+):
     """
     Получить объявление по ID.
+
+    Ответ кэшируется и содержит ETag; при совпадении If-None-Match возвращается 304.
+    """
+    key = ad_key(ad_id)
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation(key)
+        ad = await AdRepository.get_ad_by_id(ad_id, session)
+        if not ad:
+            raise HTTPException(status_code=404, detail="Ad not found")
+        body = AdResponse.model_validate(ad).model_dump_json().encode()
+        cached = response_cache.put(key, body, generation)
+    return response_cache.respond(cached, request)
+
+
+@router.get("/{ad_id}/matches", response_model=List[ProfileMatch])
+async def get_ad_matches(
+    ad_id: UUID,
+    limit: int = Query(
+        settings.MATCHES_DEFAULT_LIMIT, ge=1, le=settings.MATCHES_MAX_LIMIT
+    ),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Получить профили, наиболее совместимые с объявлением.
     """
     ad = await AdRepository.get_ad_by_id(ad_id, session)
     if not ad:
         raise HTTPException(status_code=404, detail="Ad not found")
-    return ad
+
+    await matching_engine.ensure_loaded()
+    scored = matching_engine.match_profiles(snapshot(ad), limit)
+    profiles = await UserProfileRepository.get_profiles_by_user_ids(
+        [user_id for user_id, _ in scored], session
+    )
+    by_user = {profile.user_id: profile for profile in profiles}
+    return [
+        ProfileMatch(score=score, profile=by_user[user_id])
+        for user_id, score in scored
+        if user_id in by_user
+    ]
 
 
-@router.get("/", response_model=List[AdResponse])
-async def get_all_ads(session: AsyncSession = Depends(get_async_session)):
+@router.get("/", response_model=Union[AdWithOwnerPage, AdPage])
+async def get_all_ads(
+    limit: int = Query(settings.ADS_PAGE_SIZE, ge=1, le=settings.ADS_MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, UUID]] = Depends(_page_position),
+    filters: Dict[str, Any] = Depends(_ad_filters),
+    include: Optional[str] = Query(
+        None, description="Связанные данные через запятую: owner_profile"
+    ),
+    session: AsyncSession = Depends(get_read_session),
+):
     """
-    Получить все объявления.
+    Получить страницу объявлений с фильтрами.
+
+    Для получения следующей страницы передайте `next_cursor` из ответа в `cursor`.
+    С `include=owner_profile` каждое объявление содержит профиль владельца.
     """
-    return await AdRepository.get_all_ads(session)
+    includes = {name.strip() for name in include.split(",")} if include else set()
+    if includes - _INCLUDES:
+        raise HTTPException(status_code=400, detail="Invalid include")
+
+    with_owner_profile = "owner_profile" in includes
+    fast = settings.FAST_LIST_SERIALIZATION and not with_owner_profile
+    ads, has_more = await AdRepository.get_all_ads(
+        session,
+        limit,
+        after,
+        filters,
+        with_owner_profile=with_owner_profile,
+        columns=_AD_COLUMNS if fast else None,
+    )
+    next_cursor = (
+        encode_cursor(ads[-1].created_at, ads[-1].ad_id) if has_more else None
+    )
+    if fast:
+        return page_response(ads, AdResponse, next_cursor)
+    page = AdWithOwnerPage if with_owner_profile else AdPage
+    return page(items=ads, next_cursor=next_cursor)
 
 
 @router.get("/owner/{owner_id}", response_model=List[AdResponse])
 async def get_ads_by_owner(
-    owner_id: UUID, session: AsyncSession = Depends(get_async_session)
+    owner_id: UUID, session: AsyncSession = Depends(get_read_session)
 ):
     """
     Получить все объявления, принадлежащие определенному владельцу.
     """
+    if settings.FAST_LIST_SERIALIZATION:
+        rows = await AdRepository.get_ads_by_owner(owner_id, session, _AD_COLUMNS)
+        return list_response(rows, AdResponse)
     return await AdRepository.get_ads_by_owner(owner_id, session)
 
 
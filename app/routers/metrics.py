@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.auth.cache import token_cache
+from app.core.metrics import CONTENT_TYPE, Labels, collect, registry, render
+from app.database.config import engine, replica_engines
+from app.database.pool import pool_status
+from app.services.response_cache import response_cache
+
+router = APIRouter(tags=["Status"])
+
+
+def _engines() -> List[Tuple[str, AsyncEngine]]:
+    return [("primary", engine)] + [
+        (f"replica_{index}", replica) for index, replica in enumerate(replica_engines)
+    ]
+
+
+def _pool_metric(*keys: str) -> Any:
+    """Collector reading pool_status() fields, labelled by engine (and field)"""
+
+    def collect_pool() -> Dict[Labels, float]:
+        values = {}
+        for name, pool_engine in _engines():
+            status = pool_status(pool_engine.pool)
+            for key in keys:
+                if key in status:
+                    labels = (name, key) if len(keys) > 1 else (name,)
+                    values[labels] = status[key]
+        return values
+
+    return collect_pool
+
+
+def _cache_metric(key: str) -> Any:
+    def collect_caches() -> Dict[Labels, float]:
+        return {
+            ("auth_tokens",): token_cache.stats()[key],
+            ("responses",): response_cache.stats()[key],
+        }
+
+    return collect_caches
+
+
+registry.callback(
+    "gauge",
+    "db_pool_connections",
+    "Connections of the pool, by engine and state",
+    ("engine", "state"),
+    _pool_metric("checked_out", "checked_in", "overflow"),
+)
+registry.callback(
+    "gauge", "db_pool_size", "Configured pool size", ("engine",), _pool_metric("size")
+)
+registry.callback(
+    "counter",
+    "db_pool_checkouts_total",
+    "Connections checked out of the pool",
+    ("engine",),
+    _pool_metric("checkouts"),
+)
+registry.callback(
+    "counter",
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ("engine",),
+    _pool_metric("timeouts"),
+)
+registry.callback(
+    "counter",
+    "db_pool_checkout_wait_seconds_total",
+    "Time spent waiting for a pooled connection",
+    ("engine",),
+    _pool_metric("wait_time_total_seconds"),
+)
+registry.callback(
+    "counter", "cache_hits_total", "Cache hits", ("cache",), _cache_metric("hits")
+)
+registry.callback(
+    "counter", "cache_misses_total", "Cache misses", ("cache",), _cache_metric("misses")
+)
+registry.callback(
+    "gauge", "cache_entries", "Entries currently cached", ("cache",), _cache_metric("size")
+)
+
+
+def _add_cache_hit_ratio(merged: Dict[str, Any]) -> None:
+    # Derived after merging so that the ratio covers all workers
+    hits = merged.get("cache_hits_total", {}).get("samples", {})
+    misses = merged.get("cache_misses_total", {}).get("samples", {})
+    samples = {}
+    for labels in hits.keys() | misses.keys():
+        total = hits.get(labels, 0.0) + misses.get(labels, 0.0)
+        samples[labels] = hits.get(labels, 0.0) / total if total else 0.0
+    merged["cache_hit_ratio"] = {
+        "kind": "gauge",
+        "help": "Share of cache lookups that were hits",
+        "labelnames": ["cache"],
+        "samples": samples,
+    }
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Counters, histograms and gauges in the Prometheus text format
+    """
+    merged = await collect(registry)
+    _add_cache_hit_ratio(merged)
+    return Response(render(merged), media_type=CONTENT_TYPE)
@@ -1,16 +1,84 @@
-from fastapi import APIRouter, HTTPException, Depends
+import uuid
+from dataclasses import asdict
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database.deps import get_async_session
+from app.core.config import settings
+from app.core.serialization import list_response, row_columns
+from app.core.streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from app.database.config import read_session_maker
+from app.core.events import snapshot
+from app.database.deps import get_async_session, get_read_session
+from app.database.uow import unit_of_work
+from app.models.profiles import UserProfile
+from app.repositories.ad import AdRepository
+from app.repositories.image import ProfileImageRepository
 from app.repositories.profile import UserProfileRepository
+from app.schemas.matching import AdMatch
 from app.schemas.profile import (
+    ProfileImageResponse,
     UserProfileCreate,
     UserProfileResponse,
     UserProfileUpdate,
 )
+from app.services.images import (
+    ImageTooLarge,
+    InvalidImage,
+    image_file_response,
+    image_processor,
+    receive_upload,
+)
+from app.services.jobs import enqueue
+from app.services.matching import matching_engine
+from app.services.response_cache import profile_key, response_cache
+from app.services.tasks import COLLECT_IMAGE_FILES, IMAGE_COLLECTION_DELAY
 
 router = APIRouter(prefix="/profiles", tags=["Profiles"])
 
+# Колонки ответа UserProfileResponse для быстрой сериализации списков
+_PROFILE_COLUMNS = row_columns(UserProfile, UserProfileResponse)
+
+# Поле multipart-формы с файлом изображения
+_IMAGE_FIELD = "file"
+
+_IMAGE_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": [_IMAGE_FIELD],
+                    "properties": {
+                        _IMAGE_FIELD: {"type": "string", "format": "binary"}
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+async def _get_profile_or_404(user_id: uuid.UUID, session: AsyncSession) -> UserProfile:
+    profile = await UserProfileRepository.get_user_profile(
+        user_id=user_id, session=session
+    )
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+async def _collect_image_files(session: AsyncSession, images) -> None:
+    """Ставит в очередь удаление файлов, на которые больше никто не ссылается"""
+    if images:
+        await enqueue(
+            session,
+            COLLECT_IMAGE_FILES,
+            {"files": sorted({(image.digest, image.extension) for image in images})},
+            delay=IMAGE_COLLECTION_DELAY,
+        )
+
 
 @router.post("/", response_model=UserProfileResponse)
 async def create_profile(
@@ -20,38 +88,220 @@ async def create_profile(
     Эндпоинт для создания профиля пользователя.
     """
     created_profile = await UserProfileRepository.create_user_profile(
-        user_id=profile_data.id,
+        user_id=profile_data.user_id,
         profile_data=profile_data.model_dump(exclude_unset=True),
         session=session,
     )
     return created_profile
 
 
-@router.get("/{user_id}", response_model=UserProfileResponse)
-async def get_profile(user_id: str, session: AsyncSession = Depends(get_async_session)):
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def export_profiles():
+    """
+    Эндпоинт для выгрузки всех профилей в формате NDJSON.
+    """
+
+    async def rows():
+        # Сессия живет столько же, сколько и поток ответа
+        async with read_session_maker()() as session:
+            async for profile in UserProfileRepository.stream_all_user_profiles(
+                session, settings.EXPORT_CHUNK_SIZE
+            ):
+                yield profile
+
+    return ndjson_response(rows(), UserProfileResponse, settings.EXPORT_CHUNK_SIZE)
+
+
+@router.api_route(
+    "/images/{name}",
+    methods=["GET", "HEAD"],
+    response_class=FileResponse,
+    responses={
+        200: {"content": {"image/*": {}}},
+        206: {"description": "Partial content (Range)"},
+        304: {"description": "Not modified (If-None-Match)"},
+    },
+)
+async def get_image_file(name: str, request: Request):
+    """
+    Эндпоинт для отдачи файла изображения: оригинала или миниатюры.
+
+    Имя файла содержит хеш содержимого, поэтому ответ кэшируется навсегда
+    (Cache-Control: immutable). Поддерживаются Range-запросы.
+    """
+    return await image_file_response(name, request)
+
+
+@router.get(
+    "/{user_id}",
+    response_model=UserProfileResponse,
+    responses={304: {"description": "Not modified (If-None-Match)"}},
+)
+async def get_profile(
+    user_id: uuid.UUID,
+    request: Request,
+    session: AsyncSession = Depends(get_read_session),
+):
     """
     Эндпоинт для получения профиля пользователя по user_id.
+
+    Ответ кэшируется и содержит ETag; при совпадении If-None-Match возвращается 304.
+    """
+    key = profile_key(user_id)
+    cached = response_cache.get(key)
+    if cached is None:
+        generation = response_cache.generation(key)
+        profile = await UserProfileRepository.get_user_profile(
+            user_id=user_id, session=session
+        )
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        body = UserProfileResponse.model_validate(profile).model_dump_json().encode()
+        cached = response_cache.put(key, body, generation)
+    return response_cache.respond(cached, request)
+
+
+@router.post(
+    "/{user_id}/images",
+    response_model=ProfileImageResponse,
+    openapi_extra=_IMAGE_UPLOAD_BODY,
+    responses={413: {"description": "Image too large"}},
+)
+async def upload_profile_image(
+    user_id: uuid.UUID,
+    request: Request,
+    primary: bool = Query(False, description="Сделать изображение основным"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Эндпоинт для загрузки изображения профиля (multipart/form-data, поле file).
+
+    Файл пишется на диск по мере получения, миниатюры создаются в пуле
+    процессов. Первое изображение профиля становится основным.
+    """
+    profile = await _get_profile_or_404(user_id, session)
+    profile_id = profile.id
+    count = await ProfileImageRepository.count_images(profile_id, session)
+    if count >= settings.IMAGES_PER_PROFILE:
+        raise HTTPException(status_code=409, detail="Too many images")
+    # Не держим соединение с базой, пока принимается файл
+    await session.commit()
+
+    try:
+        upload = await receive_upload(request, _IMAGE_FIELD, settings.IMAGES_MAX_BYTES)
+        stored = await image_processor.store(upload)
+    except ImageTooLarge:
+        raise HTTPException(status_code=413, detail="Image too large")
+    except InvalidImage as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    image = await ProfileImageRepository.add_image(
+        profile_id, asdict(stored), primary, session
+    )
+    if image is None:
+        # Лимит заполнили параллельные загрузки, пока принимался файл
+        async with unit_of_work(session):
+            await _collect_image_files(session, [stored])
+        raise HTTPException(status_code=409, detail="Too many images")
+    return image
+
+
+@router.get("/{user_id}/images", response_model=List[ProfileImageResponse])
+async def get_profile_images(
+    user_id: uuid.UUID, session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Эндпоинт для получения изображений профиля.
+    """
+    profile = await _get_profile_or_404(user_id, session)
+    return await ProfileImageRepository.get_images(profile.id, session)
+
+
+@router.put(
+    "/{user_id}/images/{image_id}/primary", response_model=ProfileImageResponse
+)
+async def set_primary_profile_image(
+    user_id: uuid.UUID,
+    image_id: uuid.UUID,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Эндпоинт для выбора основного изображения профиля.
+    """
+    profile = await _get_profile_or_404(user_id, session)
+    image = await ProfileImageRepository.set_primary_image(
+        profile.id, image_id, session
+    )
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return image
+
+
+@router.delete("/{user_id}/images/{image_id}")
+async def delete_profile_image(
+    user_id: uuid.UUID,
+    image_id: uuid.UUID,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Эндпоинт для удаления изображения профиля.
+    """
+    async with unit_of_work(session):
+        profile = await _get_profile_or_404(user_id, session)
+        image = await ProfileImageRepository.delete_image(profile.id, image_id, session)
+        if not image:
+            raise HTTPException(status_code=404, detail="Image not found")
+        await _collect_image_files(session, [image])
+    return {"detail": "Image deleted successfully"}
+
+
+@router.get("/{user_id}/recommended-ads", response_model=List[AdMatch])
+async def get_recommended_ads(
+    user_id: uuid.UUID,
+    limit: int = Query(
+        settings.MATCHES_DEFAULT_LIMIT, ge=1, le=settings.MATCHES_MAX_LIMIT
+    ),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Эндпоинт для получения объявлений, наиболее подходящих пользователю.
     """
     profile = await UserProfileRepository.get_user_profile(
         user_id=user_id, session=session
     )
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
-    return profile
+
+    await matching_engine.ensure_loaded()
+    scored = matching_engine.recommend_ads(snapshot(profile), limit)
+    ads = await AdRepository.get_ads_by_ids([ad_id for ad_id, _ in scored], session)
+    by_id = {ad.ad_id: ad for ad in ads}
+    return [
+        AdMatch(score=score, ad=by_id[ad_id]) for ad_id, score in scored if ad_id in by_id
+    ]
 
 
 @router.get("/", response_model=List[UserProfileResponse])
-async def get_all_profiles(session: AsyncSession = Depends(get_async_session)):
+async def get_all_profiles(session: AsyncSession = Depends(get_read_session)):
     """
     Эндпоинт для получения всех профилей пользователей.
     """
+    if settings.FAST_LIST_SERIALIZATION:
+        rows = await UserProfileRepository.get_all_user_profiles(
+            session=session, columns=_PROFILE_COLUMNS
+        )
+        return list_response(rows, UserProfileResponse)
     profiles = await UserProfileRepository.get_all_user_profiles(session=session)
     return profiles
 
 
 @router.put("/{user_id}", response_model=UserProfileResponse)
 async def update_profile(
-    user_id: str,
+    user_id: uuid.UUID,
     updated_data: UserProfileUpdate,
     session: AsyncSession = Depends(get_async_session),
 ):
@@ -70,14 +320,17 @@ async def update_profile(
 
 @router.delete("/{user_id}")
 async def delete_profile(
-    user_id: str, session: AsyncSession = Depends(get_async_session)
+    user_id: uuid.UUID, session: AsyncSession = Depends(get_async_session)
 ):
     """
     Эндпоинт для удаления профиля пользователя.
     """
-    success = await UserProfileRepository.delete_user_profile(
-        user_id=user_id, session=session
-    )
-    if not success:
-        raise HTTPException(status_code=404, detail="Profile not found")
+    async with unit_of_work(session):
+        images = await ProfileImageRepository.delete_profile_images(user_id, session)
+        success = await UserProfileRepository.delete_user_profile(
+            user_id=user_id, session=session
+        )
+        if not success:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        await _collect_image_files(session, images)
     return {"detail": "Profile deleted successfully"}
@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+
+from app.auth.cache import token_cache
+from app.database.config import engine, replica_engines
+from app.database.pool import pool_status
+from app.services.response_cache import response_cache
+
+router = APIRouter(prefix="/status", tags=["Status"])
+
+
+@router.get("/db-pool")
+async def get_db_pool_status():
+    """
+    Connection pool gauges (checked out, overflow) and checkout wait counters
+    """
+    return {
+        "primary": pool_status(engine.pool),
+        "replicas": [pool_status(replica.pool) for replica in replica_engines],
+    }
+
+
+@router.get("/cache")
+async def get_cache_status():
+    """
+    Size and hit/miss counters of the in-process caches
+    """
+    return {
+        "auth_tokens": token_cache.stats(),
+        "responses": response_cache.stats(),
+    }
@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import fastapi_users, current_active_user
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.database.deps import get_async_session, get_read_session
 from app.models.users import User
-from app.schemas import UserRead, UserUpdate
+from app.repositories.saved_search import SavedSearchRepository
+from app.repositories.user import UserRepository
+from app.schemas import UserRead, UserUpdate, UserWithProfile
+from app.schemas.searches import (
+    InboxItem,
+    InboxPage,
+    SavedSearchCreate,
+    SavedSearchResponse,
+)
 
 router = APIRouter()
 
@@ -11,9 +27,120 @@ router.include_router(
 )
 
 
-@router.get("/me/profile", response_model=UserRead)
-async def get_user_profile(user: User = Depends(current_active_user)):
+def _inbox_position(name: str):
+    """Dependency decoding the inbox cursor passed in the `name` query parameter"""
+
+    def position(
+        value: Optional[str] = Query(None, alias=name),
+    ) -> Optional[Tuple[datetime, UUID]]:
+        try:
+            return decode_cursor(value) if value else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {name}")
+
+    return position
+
+
+@router.get("/me/profile", response_model=UserWithProfile)
+async def get_user_profile(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Get current user information together with the user's profile
+    """
+    user_with_profile = await UserRepository.get_user_with_profile(user.id, session)
+    if user_with_profile is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user_with_profile
+
+
+@router.post("/me/searches", response_model=SavedSearchResponse)
+async def create_saved_search(
+    search_data: SavedSearchCreate,
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Save ad filters; new and updated ads matching them are added to the inbox
+    """
+    count = await SavedSearchRepository.count_user_searches(user.id, session)
+    if count >= settings.SAVED_SEARCHES_PER_USER:
+        raise HTTPException(status_code=409, detail="Too many saved searches")
+    return await SavedSearchRepository.create_search(
+        user.id, search_data.model_dump(), session
+    )
+
+
+@router.get("/me/searches", response_model=List[SavedSearchResponse])
+async def get_saved_searches(
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_read_session),
+):
     """
-    Get current user profile information
+    Get the current user's saved searches
+    """
+    return await SavedSearchRepository.get_user_searches(user.id, session)
+
+
+@router.put("/me/searches/{search_id}", response_model=SavedSearchResponse)
+async def update_saved_search(
+    search_id: UUID,
+    search_data: SavedSearchCreate,
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Replace the name and filters of a saved search
+    """
+    search = await SavedSearchRepository.update_search(
+        user.id, search_id, search_data.model_dump(), session
+    )
+    if search is None:
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return search
+
+
+@router.delete("/me/searches/{search_id}")
+async def delete_saved_search(
+    search_id: UUID,
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Delete a saved search together with its inbox entries
+    """
+    if not await SavedSearchRepository.delete_search(user.id, search_id, session):
+        raise HTTPException(status_code=404, detail="Saved search not found")
+    return {"detail": "Saved search deleted successfully"}
+
+
+@router.get("/me/inbox", response_model=InboxPage)
+async def get_inbox(
+    limit: int = Query(settings.INBOX_PAGE_SIZE, ge=1, le=settings.INBOX_MAX_PAGE_SIZE),
+    after: Optional[Tuple[datetime, UUID]] = Depends(_inbox_position("cursor")),
+    since: Optional[Tuple[datetime, UUID]] = Depends(_inbox_position("since")),
+    user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """
+    Ads that matched the current user's saved searches, newest first.
+
+    Pass `cursor` (a previous page's next_cursor) for older entries. To poll,
+    pass the last newest_cursor as `since`: only newer entries are returned,
+    usually none.
     """
-    return user
+    rows, has_more = await SavedSearchRepository.get_inbox(
+        user.id, limit, after, since, session
+    )
+    items = [
+        InboxItem(
+            id=row.id, search_id=row.search_id, created_at=row.created_at, ad=row.Ad
+        )
+        for row in rows
+    ]
+    next_cursor = (
+        encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    )
+    newest_cursor = encode_cursor(rows[0].created_at, rows[0].id) if rows else None
+    return InboxPage(items=items, next_cursor=next_cursor, newest_cursor=newest_cursor)
@@ -1,4 +1,4 @@
-from app.schemas.users import UserRead, UserCreate, UserUpdate
+from app.schemas.users import UserRead, UserCreate, UserUpdate, UserWithProfile
 
 # Schemas package initialization
-__all__ = ["UserRead", "UserCreate", "UserUpdate"]
+__all__ = ["UserRead", "UserCreate", "UserUpdate", "UserWithProfile"]
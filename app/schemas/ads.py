@@ -1,8 +1,18 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import AliasChoices, AliasPath, BaseModel, Field, model_validator
+from typing import Any, List, Optional
 from uuid import UUID
+from datetime import datetime
 from decimal import Decimal
 from app.models.ads import Gender
+from app.models.profiles import Gender as ProfileGender
+from app.schemas.profile import UserProfileResponse
+
+
+def _both_coordinates(model):
+    given = {"latitude", "longitude"} & model.model_fields_set
+    if len(given) == 1 or (model.latitude is None) != (model.longitude is None):
+        raise ValueError("latitude and longitude must be set together")
+    return model
 
 
 class AdCreate(BaseModel):
@@ -18,6 +28,10 @@ class AdCreate(BaseModel):
     cleanliness: Optional[str] = None
     character: Optional[str] = None
     lifestyle: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    _location = model_validator(mode="after")(_both_coordinates)
 
 
 class AdUpdate(BaseModel):
@@ -32,10 +46,83 @@ class AdUpdate(BaseModel):
     cleanliness: Optional[str] = None
     character: Optional[str] = None
     lifestyle: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    _location = model_validator(mode="after")(_both_coordinates)
 
 
 class AdResponse(AdCreate):
     ad_id: UUID
+    created_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class AdPage(BaseModel):
+    items: List[AdResponse]
+    next_cursor: Optional[str] = None
+
+
+class AdWithOwnerResponse(AdResponse):
+    # Read from ad.owner.profile, which must be eagerly loaded
+    owner_profile: Optional[UserProfileResponse] = Field(
+        None, validation_alias=AliasChoices("owner_profile", AliasPath("owner", "profile"))
+    )
+
+
+class AdWithOwnerPage(AdPage):
+    items: List[AdWithOwnerResponse]
+
+
+class AdFeedOwner(BaseModel):
+    user_id: UUID
+    first_name: Optional[str] = None
+    gender: Optional[ProfileGender] = None
+    age: Optional[int] = None
+    image_url: Optional[str] = None
+
+
+class AdFeedItem(BaseModel):
+    ad_id: UUID
+    title: str
+    budget: Optional[Decimal] = None
+    number_of_roommates: Optional[int] = None
+    gender: Optional[Gender] = None
+    created_at: datetime
+    owner: AdFeedOwner
+
+
+class AdFeedPage(BaseModel):
+    items: List[AdFeedItem]
+    next_cursor: Optional[str] = None
+
+
+class AdSearchHit(BaseModel):
+    score: float
+    ad: AdResponse
+
+
+class AdNearbyHit(BaseModel):
+    distance_km: float
+    ad: AdResponse
+
+
+class AdBulkUpdateItem(AdUpdate):
+    ad_id: UUID
+
+
+class BulkItemError(BaseModel):
+    index: int
+    detail: Any
+
+
+class AdBulkResult(BaseModel):
+    items: List[AdResponse]
+    errors: List[BulkItemError]
+
+
+class AdBulkDeleteResult(BaseModel):
+    deleted: List[UUID]
+    errors: List[BulkItemError]
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+from app.schemas.ads import AdResponse
+from app.schemas.profile import UserProfileResponse
+
+
+class ProfileMatch(BaseModel):
+    score: float
+    profile: UserProfileResponse
+
+
+class AdMatch(BaseModel):
+    score: float
+    ad: AdResponse
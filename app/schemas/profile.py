@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, computed_field
+from typing import Dict, Optional
 import uuid
-from datetime import date
-from app.schemas.users import GenderEnum
+from datetime import date, datetime
+from app.core.config import settings
+from app.core.media import file_name, file_url
+from app.models.profiles import Gender
 
 
 class UserProfileCreate(BaseModel):
@@ -10,20 +12,18 @@ class UserProfileCreate(BaseModel):
     first_name: Optional[str] = Field(None, max_length=50)
     last_name: Optional[str] = Field(None, max_length=50)
     bio: Optional[str] = Field(None, max_length=500)
-    gender: Optional[GenderEnum]
+    gender: Optional[Gender]
     birth_date: Optional[date]
     image_url: Optional[str]
-    is_primary_image: Optional[bool] = False
 
 
 class UserProfileUpdate(BaseModel):
     first_name: Optional[str] = Field(None, max_length=50)
     last_name: Optional[str] = Field(None, max_length=50)
     bio: Optional[str] = Field(None, max_length=500)
-    gender: Optional[GenderEnum]
+    gender: Optional[Gender]
     birth_date: Optional[date]
     image_url: Optional[str]
-    is_primary_image: Optional[bool]
 
 
 class UserProfileResponse(UserProfileCreate):
@@ -31,3 +31,31 @@ class UserProfileResponse(UserProfileCreate):
 
     class Config:
         from_attributes = True
+
+
+class ProfileImageResponse(BaseModel):
+    id: uuid.UUID
+    is_primary: bool
+    digest: str
+    extension: str = Field(exclude=True)
+    content_type: str
+    size: int
+    width: int
+    height: int
+    created_at: datetime
+
+    @computed_field
+    @property
+    def url(self) -> str:
+        return file_url(file_name(self.digest, self.extension))
+
+    @computed_field
+    @property
+    def thumbnails(self) -> Dict[str, str]:
+        return {
+            name: file_url(file_name(self.digest, self.extension, name))
+            for name in settings.IMAGES_THUMBNAIL_SIZES
+        }
+
+    class Config:
+        from_attributes = True
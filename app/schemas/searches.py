@@ -0,0 +1,70 @@
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.models.ads import Gender
+from app.schemas.ads import AdResponse
+
+# Fields of a saved search that filter ads
+CRITERIA = (
+    "budget_min",
+    "budget_max",
+    "gender",
+    "number_of_roommates",
+    "age_requirements",
+    "nationality",
+    "query",
+)
+
+_WORD_RE = re.compile(r"\w", re.UNICODE)
+
+
+class SavedSearchCreate(BaseModel):
+    name: Optional[str] = Field(None, max_length=100)
+    budget_min: Optional[Decimal] = Field(None, ge=0)
+    budget_max: Optional[Decimal] = Field(None, ge=0)
+    gender: Optional[Gender] = None
+    number_of_roommates: Optional[int] = Field(None, ge=0)
+    age_requirements: Optional[int] = Field(None, ge=0)
+    nationality: Optional[str] = Field(None, max_length=100)
+    query: Optional[str] = Field(None, max_length=200)
+
+    @model_validator(mode="after")
+    def _check_criteria(self):
+        if self.query is not None and not _WORD_RE.search(self.query):
+            raise ValueError("query must contain at least one word")
+        if all(getattr(self, name) is None for name in CRITERIA):
+            raise ValueError("a saved search needs at least one filter")
+        if (
+            self.budget_min is not None
+            and self.budget_max is not None
+            and self.budget_min > self.budget_max
+        ):
+            raise ValueError("budget_min must not exceed budget_max")
+        return self
+
+
+class SavedSearchResponse(SavedSearchCreate):
+    id: UUID
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class InboxItem(BaseModel):
+    id: UUID
+    search_id: UUID
+    created_at: datetime
+    ad: AdResponse
+
+
+class InboxPage(BaseModel):
+    items: List[InboxItem]
+    next_cursor: Optional[str] = None
+    # Position of the newest item, to poll for newer ones with `since`
+    newest_cursor: Optional[str] = None
@@ -1,8 +1,11 @@
 import uuid
 from enum import Enum
+from typing import Optional
 
 from fastapi_users import schemas
 
+from app.schemas.profile import UserProfileResponse
+
 
 class UserRead(schemas.BaseUser[uuid.UUID]):
     """Schema for reading user data"""
@@ -10,6 +13,12 @@ class UserRead(schemas.BaseUser[uuid.UUID]):
     pass
 
 
+class UserWithProfile(UserRead):
+    """Schema for reading user data together with the user's profile"""
+
+    profile: Optional[UserProfileResponse] = None
+
+
 class UserCreate(schemas.BaseUserCreate):
     """Schema for creating users"""
 
@@ -0,0 +1 @@
+# Services package for in-process domain engines built on top of the repositories
@@ -0,0 +1,239 @@
+"""
+Live feed of ad changes, pushed to clients as Server-Sent Events (GET
+/ads/stream).
+
+The "ad.*" events of the process that commits a change are encoded once and
+published on the pub/sub backend. Every worker, that one included, receives
+them and fans them out to its own subscribers, so a client sees the changes
+made through any worker.
+
+Fan-out costs no task per message: the frame is built once, and subscribers
+with the same filters share a group whose filters are checked once. Each
+matching subscriber only gets the frame appended to its queue. The response
+of a subscriber drains the queue in one write whenever it is woken. A client
+that reads slower than changes arrive has its queue fill up; it is then sent
+an "overflow" event and disconnected, instead of the worker buffering for it
+without bound. One heartbeat task for the whole hub keeps idle connections
+open through proxies and finds the ones whose peer is gone.
+
+Delivery is best effort. There are no event ids to resume from, so a client
+that reconnects reloads the list. An update that moves an ad out of a
+subscriber's filters is not delivered to that subscriber, while deletions are
+delivered to everyone.
+
+Open streams hold up a graceful shutdown until uvicorn's
+--timeout-graceful-shutdown expires. Set it, and the clients reconnect to
+another worker.
+"""
+
+import asyncio
+import json
+from collections import deque
+from decimal import Decimal
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core import events
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.pubsub import pubsub
+from app.schemas.ads import AdResponse
+
+logger = get_logger(__name__)
+
+CHANNEL = "ads.changes"
+MEDIA_TYPE = "text/event-stream"
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MS = 3000
+
+_HEARTBEAT = b": ping\n\n"
+_OVERFLOW = b"event: overflow\ndata: {}\n\n"
+
+Criteria = Tuple[Tuple[str, Any], ...]
+
+
+def _value(raw: Any) -> Any:
+    return raw.value if hasattr(raw, "value") else raw
+
+
+def _criteria(filters: Dict[str, Any]) -> Criteria:
+    """Set filters in a canonical order, so equal filters share a group"""
+    set_filters = (
+        (name, _value(value)) for name, value in filters.items() if value is not None
+    )
+    return tuple(sorted(set_filters))
+
+
+def _matches(criteria: Criteria, ad: Dict[str, Any]) -> bool:
+    """Same semantics as the GET /ads filters"""
+    for name, wanted in criteria:
+        if name == "budget_min":
+            if ad["budget"] is None or ad["budget"] < wanted:
+                return False
+        elif name == "budget_max":
+            if ad["budget"] is None or ad["budget"] > wanted:
+                return False
+        elif ad.get(name) != wanted:
+            return False
+    return True
+
+
+def _encode_event(name: str, ad: Dict[str, Any]) -> bytes:
+    if name == "ad.deleted":
+        data = json.dumps({"ad_id": str(ad["ad_id"])}).encode()
+    else:
+        data = AdResponse.model_validate(ad).model_dump_json().encode()
+    return name.encode() + b"\n" + data
+
+
+class _Subscriber:
+    __slots__ = ("_frames", "_ready", "_max_queued", "closed")
+
+    def __init__(self, max_queued: int) -> None:
+        self._frames: Deque[bytes] = deque([b"retry: %d\n\n" % RETRY_MS])
+        self._ready = asyncio.Event()
+        self._max_queued = max_queued
+        self.closed = False
+
+    @property
+    def idle(self) -> bool:
+        return not self._frames
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue a frame; False if the queue is full and the subscriber evicted"""
+        if len(self._frames) >= self._max_queued:
+            self._frames.clear()
+            self.close(_OVERFLOW)
+            return False
+        self._frames.append(frame)
+        self._ready.set()
+        return True
+
+    def close(self, last_frame: Optional[bytes] = None) -> None:
+        if last_frame is not None:
+            self._frames.append(last_frame)
+        self.closed = True
+        self._ready.set()
+
+    async def frames(self) -> AsyncIterator[bytes]:
+        while True:
+            if not self._frames:
+                if self.closed:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            # Everything queued since the last write goes out at once
+            chunk = b"".join(self._frames)
+            self._frames.clear()
+            yield chunk
+
+
+class AdStreamHub:
+    """Subscribers of this worker, grouped by their filters."""
+
+    def __init__(
+        self, max_subscribers: int, queue_size: int, heartbeat_seconds: float
+    ) -> None:
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._groups: Dict[Criteria, Set[_Subscriber]] = {}
+        self._count = 0
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def _subscribe(self, criteria: Criteria) -> _Subscriber:
+        subscriber = _Subscriber(self.queue_size)
+        self._groups.setdefault(criteria, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def _unsubscribe(self, criteria: Criteria, subscriber: _Subscriber) -> None:
+        group = self._groups.get(criteria)
+        if group is None or subscriber not in group:
+            return
+        group.discard(subscriber)
+        self._count -= 1
+        if not group:
+            del self._groups[criteria]
+
+    async def events(self, filters: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Body of one stream response: SSE frames until the client goes away"""
+        criteria = _criteria(filters)
+        subscriber = self._subscribe(criteria)
+        try:
+            async for chunk in subscriber.frames():
+                yield chunk
+        finally:
+            self._unsubscribe(criteria, subscriber)
+
+    def dispatch(self, message: bytes) -> None:
+        """Fan a change received from the pub/sub backend out to the subscribers"""
+        if not self._groups:
+            return
+        name, data = message.split(b"\n", 1)
+        frame = b"event: " + name + b"\ndata: " + data + b"\n\n"
+        ad = None
+        evicted: List[Tuple[Criteria, _Subscriber]] = []
+        for criteria, group in self._groups.items():
+            if criteria and name != b"ad.deleted":
+                if ad is None:
+                    ad = json.loads(data)
+                    if ad.get("budget") is not None:
+                        ad["budget"] = Decimal(ad["budget"])
+                if not _matches(criteria, ad):
+                    continue
+            for subscriber in group:
+                if not subscriber.offer(frame):
+                    evicted.append((criteria, subscriber))
+        for criteria, subscriber in evicted:
+            self._unsubscribe(criteria, subscriber)
+        if evicted:
+            logger.warning("Slow stream subscribers evicted", count=len(evicted))
+
+    def start(self) -> None:
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._send_heartbeats())
+
+    async def stop(self) -> None:
+        """Stop the heartbeat and end the open streams"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        for group in self._groups.values():
+            for subscriber in group:
+                subscriber.close()
+
+    async def _send_heartbeats(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            for group in self._groups.values():
+                for subscriber in group:
+                    # Busy connections already carry traffic
+                    if subscriber.idle:
+                        subscriber.offer(_HEARTBEAT)
+
+
+ad_stream = AdStreamHub(
+    settings.STREAM_MAX_SUBSCRIBERS,
+    settings.STREAM_QUEUE_SIZE,
+    settings.STREAM_HEARTBEAT_SECONDS,
+)
+
+
+def _publish(name: str, ad: Dict[str, Any]) -> None:
+    pubsub.publish_nowait(CHANNEL, _encode_event(name, ad))
+
+
+pubsub.subscribe(CHANNEL, ad_stream.dispatch)
+
+for _name in ("ad.created", "ad.updated", "ad.deleted"):
+    events.subscribe(_name, lambda ad, name=_name: _publish(name, ad))
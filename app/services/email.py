@@ -0,0 +1,53 @@
+"""
+Outgoing e-mail over SMTP, configured by the SMTP_* and EMAILS_FROM_* settings.
+smtplib is blocking, so messages are sent from a worker thread.
+"""
+
+import asyncio
+import smtplib
+from email.message import EmailMessage
+from email.utils import formataddr
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def smtp_configured() -> bool:
+    return bool(settings.SMTP_HOST and settings.EMAILS_FROM_EMAIL)
+
+
+def _build_message(to: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr(
+        (settings.EMAILS_FROM_NAME or settings.PROJECT_NAME, str(settings.EMAILS_FROM_EMAIL))
+    )
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+def _send(message: EmailMessage) -> None:
+    port = settings.SMTP_PORT or (587 if settings.SMTP_TLS else 25)
+    with smtplib.SMTP(settings.SMTP_HOST, port, timeout=30) as smtp:
+        if settings.SMTP_TLS:
+            smtp.starttls()
+        if settings.SMTP_USER:
+            smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+        smtp.send_message(message)
+
+
+async def send_email(to: str, subject: str, body: str) -> None:
+    """
+    Send a plain-text e-mail. Without SMTP settings the message is only logged
+    (its body at debug level), which is what development setups want.
+    SMTP errors propagate so that the calling job is retried.
+    """
+    if not smtp_configured():
+        logger.warning("SMTP is not configured, e-mail not sent", to=to, subject=subject)
+        logger.debug("Unsent e-mail body", to=to, body=body)
+        return
+    await asyncio.to_thread(_send, _build_message(to, subject, body))
+    logger.info("E-mail sent", to=to, subject=subject)
@@ -0,0 +1,200 @@
+"""
+Nearby search: ads within a radius of a point, nearest first.
+
+With PostGIS the search runs in the database (ST_DWithin against the GiST index
+on the ad location, see app.models.ads). Without it (SQLite, or Postgres without
+the postgis extension) an in-process geohash index is used instead. It is
+loaded once and then maintained from the "ad.*" events emitted after each
+commit, those of other workers included when REDIS_URL is set (see
+app.core.events.share).
+"""
+
+import asyncio
+import heapq
+import math
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import events
+from app.core.config import settings
+from app.core.geo import EARTH_RADIUS_KM, covering_prefixes, encode_geohash
+from app.core.logger import get_logger
+from app.models.ads import AD_LOCATION, Ad, location_point
+
+logger = get_logger(__name__)
+
+# Sorts after every geohash character, closing a prefix range
+_PREFIX_END = "~"
+
+# Radius of the first circle searched by GeohashIndex.nearby
+_MIN_RING_KM = 0.5
+
+
+class GeohashIndex:
+    """
+    Ad locations kept as a sorted list of (geohash, ad_id): every geohash cell,
+    of any precision, is one contiguous range of it, found by bisection.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Tuple[str, UUID]] = []
+        self._points: Dict[UUID, Tuple[str, float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    @staticmethod
+    def _point(ad: Dict[str, Any]) -> Tuple[str, float, float] | None:
+        latitude, longitude = ad.get("latitude"), ad.get("longitude")
+        if latitude is None or longitude is None:
+            return None
+        geohash = ad.get("geohash") or encode_geohash(latitude, longitude)
+        return geohash, latitude, longitude
+
+    def bulk_load(self, ads: List[Dict[str, Any]]) -> None:
+        """Replace the contents with `ads`, sorting once instead of per insert"""
+        self._points = {}
+        for ad in ads:
+            point = self._point(ad)
+            if point is not None:
+                self._points[ad["ad_id"]] = point
+        self._keys = sorted((point[0], ad_id) for ad_id, point in self._points.items())
+
+    def upsert(self, ad: Dict[str, Any]) -> None:
+        self.remove(ad)
+        point = self._point(ad)
+        if point is None:
+            return
+        self._points[ad["ad_id"]] = point
+        insort(self._keys, (point[0], ad["ad_id"]))
+
+    def remove(self, payload: Dict[str, Any]) -> None:
+        point = self._points.pop(payload["ad_id"], None)
+        if point is None:
+            return
+        key = (point[0], payload["ad_id"])
+        del self._keys[bisect_left(self._keys, key)]
+
+    def _within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, UUID]]:
+        """(haversine term, ad_id) of the ads within radius_km; the term orders by distance"""
+        keys, points = self._keys, self._points
+        phi = math.radians(lat)
+        cos_phi = math.cos(phi)
+        lambda_ = math.radians(lon)
+        threshold = math.sin(min(radius_km / EARTH_RADIUS_KM, math.pi) / 2) ** 2
+        hits = []
+        for prefix in covering_prefixes(lat, lon, radius_km):
+            start = bisect_left(keys, (prefix,))
+            end = bisect_left(keys, (prefix + _PREFIX_END,), start)
+            for _, ad_id in keys[start:end]:
+                _, other_lat, other_lon = points[ad_id]
+                other_phi = math.radians(other_lat)
+                a = (
+                    math.sin((other_phi - phi) / 2) ** 2
+                    + cos_phi
+                    * math.cos(other_phi)
+                    * math.sin((math.radians(other_lon) - lambda_) / 2) ** 2
+                )
+                if a <= threshold:
+                    hits.append((a, ad_id))
+        return hits
+
+    def nearby(
+        self, lat: float, lon: float, radius_km: float, limit: int
+    ) -> List[Tuple[UUID, float]]:
+        """(ad_id, distance in km) within radius_km of the point, nearest first."""
+        # Widen the search 4x at a time: once a circle holds `limit` ads, nothing
+        # outside it can be nearer, so dense areas never scan the whole radius
+        radii = [radius_km]
+        while radii[-1] > _MIN_RING_KM:
+            radii.append(radii[-1] / 4)
+        for radius in reversed(radii):
+            hits = self._within(lat, lon, radius)
+            if len(hits) >= limit:
+                break
+        return [
+            (ad_id, 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+            for a, ad_id in heapq.nsmallest(limit, hits)
+        ]
+
+
+class AdGeoSearch:
+    """Chooses between PostGIS and the in-process geohash index."""
+
+    def __init__(self, in_process: bool) -> None:
+        self.in_process = in_process
+        self.index = GeohashIndex()
+        self._checked = in_process
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        if in_process:
+            self._subscribe()
+
+    def _subscribe(self) -> None:
+        events.subscribe_shared("ad.created", self.index.upsert)
+        events.subscribe_shared("ad.updated", self.index.upsert)
+        events.subscribe_shared("ad.deleted", self.index.remove)
+
+    async def load(self, session: AsyncSession, chunk_size: int = 1000) -> None:
+        from app.repositories.ad import AdRepository
+
+        rows = [
+            row._asdict()
+            async for row in AdRepository.stream_ad_locations(session, chunk_size)
+        ]
+        self.index.bulk_load(rows)
+        self._loaded = True
+        logger.info("Geo index loaded", ads=len(self.index))
+
+    async def ensure_loaded(self) -> None:
+        """On Postgres, fall back to the index if PostGIS is missing; load it once."""
+        if self._loaded or (self._checked and not self.in_process):
+            return
+        from app.database.config import async_session_maker
+
+        async with self._load_lock:
+            async with async_session_maker() as session:
+                if not self._checked:
+                    query = text(
+                        "SELECT 1 FROM pg_extension WHERE extname = 'postgis'"
+                    )
+                    if await session.scalar(query) is None:
+                        logger.warning(
+                            "PostGIS is not installed, using the in-process geo index"
+                        )
+                        self.in_process = True
+                        self._subscribe()
+                    self._checked = True
+                if self.in_process and not self._loaded:
+                    await self.load(session)
+
+    async def nearby(
+        self, lat: float, lon: float, radius_km: float, limit: int, session: AsyncSession
+    ) -> List[Tuple[Ad, float]]:
+        """(ad, distance in km) pairs within radius_km of the point, nearest first."""
+        await self.ensure_loaded()
+        if not self.in_process:
+            point = location_point(lat, lon)
+            distance = func.ST_Distance(AD_LOCATION, point).label("distance")
+            stmt = (
+                select(Ad, distance)
+                .where(func.ST_DWithin(AD_LOCATION, point, radius_km * 1000))
+                .order_by(distance)
+                .limit(limit)
+            )
+            result = await session.execute(stmt)
+            return [(ad, meters / 1000) for ad, meters in result.all()]
+
+        from app.repositories.ad import AdRepository
+
+        ranked = self.index.nearby(lat, lon, radius_km, limit)
+        ads = await AdRepository.get_ads_by_ids([ad_id for ad_id, _ in ranked], session)
+        by_id = {ad.ad_id: ad for ad in ads}
+        return [(by_id[ad_id], km) for ad_id, km in ranked if ad_id in by_id]
+
+
+ad_geo = AdGeoSearch(in_process=not settings.DATABASE_URL.startswith("postgresql"))
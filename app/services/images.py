@@ -0,0 +1,337 @@
+"""
+Profile image uploads, thumbnails and file delivery.
+
+`receive_upload` parses the multipart body as it arrives and writes the file
+part straight to a temporary file under IMAGES_DIR, hashing it on the way:
+the upload is never held in memory, and a body crossing IMAGES_MAX_BYTES is
+rejected right there.
+
+`ImageProcessor` then decodes the file and renders its thumbnails in a process
+pool: decoding and resizing are CPU-bound and would stall the event loop. The
+original and the thumbnails are stored under their content digest (see
+app.core.media), so an image that is already stored is not written again.
+
+`image_file_response` serves the stored files through Starlette's
+FileResponse (Range requests, and zero-copy `http.response.pathsend` on
+servers that implement it), or hands them to nginx with X-Accel-Redirect,
+where they are sent with sendfile. Either way with a year-long immutable
+Cache-Control, as a file name never changes content.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import warnings
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+from app.core.config import settings
+from app.core.media import (
+    THUMBNAIL_EXTENSION,
+    file_name,
+    file_path,
+    is_file_name,
+    relative_path,
+)
+
+# Accepted formats and the extension their originals are stored with
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+_MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "gif": "image/gif",
+}
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Temporary files are created private; stored ones are readable by a proxy
+_FILE_MODE = 0o644
+
+# Room for the multipart boundaries and part headers around the file
+_MULTIPART_OVERHEAD = 16 * 1024
+
+
+class InvalidImage(Exception):
+    """The upload is not a well-formed request or not an accepted image"""
+
+
+class ImageTooLarge(Exception):
+    """The upload is larger than IMAGES_MAX_BYTES"""
+
+
+@dataclass
+class Upload:
+    # Temporary file holding the uploaded bytes
+    path: Path
+    digest: str
+    size: int
+
+
+@dataclass
+class StoredImage:
+    digest: str
+    extension: str
+    content_type: str
+    size: int
+    width: int
+    height: int
+
+
+def _write(out: BinaryIO, hasher: "hashlib._Hash", data: bytes) -> None:
+    hasher.update(data)
+    out.write(data)
+
+
+async def receive_upload(request: Request, field: str, max_bytes: int) -> Upload:
+    """
+    Stream the `field` file part of a multipart/form-data request to a
+    temporary file. Other parts are skipped.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidImage("Expected a multipart/form-data body")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > max_bytes + _MULTIPART_OVERHEAD:
+            raise ImageTooLarge()
+
+    header_field = bytearray()
+    header_value = bytearray()
+    headers: Dict[bytes, bytes] = {}
+    state = {"capturing": False, "found": False}
+    pending: List[bytes] = []
+
+    def on_part_begin() -> None:
+        headers.clear()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        _, disposition = parse_options_header(headers.get(b"content-disposition"))
+        state["capturing"] = (
+            not state["found"] and disposition.get(b"name") == field.encode()
+        )
+        state["found"] = state["found"] or state["capturing"]
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if state["capturing"]:
+            pending.append(data[start:end])
+
+    def on_part_end() -> None:
+        state["capturing"] = False
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    upload_dir = Path(settings.IMAGES_DIR) / "tmp"
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(dir=upload_dir, suffix=".upload")
+    path = Path(name)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except MultipartParseError as exc:
+                    raise InvalidImage("Malformed multipart body") from exc
+                if not pending:
+                    continue
+                data = b"".join(pending)
+                pending.clear()
+                size += len(data)
+                if size > max_bytes:
+                    raise ImageTooLarge()
+                await asyncio.to_thread(_write, out, hasher, data)
+        parser.finalize()
+        if not state["found"]:
+            raise InvalidImage(f"Missing file field '{field}'")
+        if size == 0:
+            raise InvalidImage("Empty file")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return Upload(path=path, digest=hasher.hexdigest(), size=size)
+
+
+def _save_atomically(image: Image.Image, path: Path, **params) -> None:
+    # Written next to the target and renamed, so readers never see a partial file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, **params)
+        os.chmod(name, _FILE_MODE)
+        os.replace(name, path)
+    except BaseException:
+        os.unlink(name)
+        raise
+
+
+# Module-level so that it can be pickled into the process pool
+def _store(
+    upload_path: str, digest: str, size: int, thumbnails: Dict[str, int]
+) -> StoredImage:
+    """
+    Validate the uploaded file, move it into the store unless its content is
+    already there, and render the missing thumbnails.
+    """
+    try:
+        with warnings.catch_warnings():
+            # Refuse decompression bombs instead of only warning about them
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(upload_path) as image:
+                if image.format not in _EXTENSIONS:
+                    raise InvalidImage(f"Unsupported image format: {image.format}")
+                image.verify()
+            with Image.open(upload_path) as image:
+                image.load()
+                extension = _EXTENSIONS[image.format]
+                image = ImageOps.exif_transpose(image)
+    except (
+        OSError,
+        SyntaxError,
+        ValueError,
+        Image.DecompressionBombError,
+        Image.DecompressionBombWarning,
+    ) as exc:
+        raise InvalidImage("Not a valid image") from exc
+
+    original = file_path(file_name(digest, extension))
+    if original.exists():
+        os.unlink(upload_path)
+    else:
+        original.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(upload_path, _FILE_MODE)
+        os.replace(upload_path, original)
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+    for thumbnail, side in thumbnails.items():
+        path = file_path(file_name(digest, extension, thumbnail))
+        if path.exists():
+            continue
+        resized = image.copy()
+        resized.thumbnail((side, side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        _save_atomically(resized, path, format=THUMBNAIL_EXTENSION, quality=80)
+
+    return StoredImage(
+        digest=digest,
+        extension=extension,
+        content_type=_MEDIA_TYPES[extension],
+        size=size,
+        width=image.width,
+        height=image.height,
+    )
+
+
+class ImageProcessor:
+    """Stores uploads and renders their thumbnails in a process pool."""
+
+    def __init__(self, workers: int) -> None:
+        self._workers = workers
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        # Created on first use: a process pool must not be forked at import time
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self._workers)
+        return self._executor
+
+    async def store(self, upload: Upload) -> StoredImage:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(),
+                _store,
+                str(upload.path),
+                upload.digest,
+                upload.size,
+                dict(settings.IMAGES_THUMBNAIL_SIZES),
+            )
+        finally:
+            # Still there if the worker failed before moving it
+            upload.path.unlink(missing_ok=True)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def remove_files(digest: str, extension: str) -> None:
+    """Delete a stored original and its thumbnails"""
+    names = [file_name(digest, extension)] + [
+        file_name(digest, extension, thumbnail)
+        for thumbnail in settings.IMAGES_THUMBNAIL_SIZES
+    ]
+    for name in names:
+        file_path(name).unlink(missing_ok=True)
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    )
+
+
+async def image_file_response(name: str, request: Request) -> Response:
+    """Response delivering a stored file, 404 for unknown names"""
+    if not is_file_name(name):
+        raise HTTPException(status_code=404, detail="Image not found")
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": f'"{name}"'}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = file_path(name)
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    media_type = _MEDIA_TYPES[name.rsplit(".", 1)[1]]
+    if settings.IMAGES_ACCEL_REDIRECT_PREFIX:
+        headers["X-Accel-Redirect"] = (
+            f"{settings.IMAGES_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative_path(name)}"
+        )
+        return Response(headers=headers, media_type=media_type)
+    return FileResponse(
+        path, headers=headers, media_type=media_type, stat_result=stat_result
+    )
+
+
+image_processor = ImageProcessor(settings.IMAGES_PROCESS_WORKERS)
@@ -0,0 +1,183 @@
+"""
+Background jobs backed by the `jobs` outbox table.
+
+`enqueue()` writes a job through the caller's session. Inside a unit of work
+the job commits or rolls back together with the change that needs it, so a
+side effect is never lost after a commit and never runs for a rolled-back
+change.
+
+`JobWorker` claims due jobs, runs their handlers concurrently and deletes them
+once they succeed. A failed attempt is retried with exponential backoff and
+jitter until `max_attempts`; after that the row stays behind as FAILED. A
+claimed job holds a lease, so the jobs of a crashed worker are picked up again
+once their lease expires.
+
+The worker runs inside the app (JOBS_RUN_IN_APP) or on its own with
+`python -m app.worker`. The in-app worker is woken right after a job is
+committed; a standalone worker polls every JOBS_POLL_INTERVAL seconds.
+"""
+
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core import events
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.models.jobs import Job
+from app.repositories.job import JobRepository
+
+logger = get_logger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of the given kind"""
+
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+
+    return register
+
+
+async def enqueue(
+    session: AsyncSession,
+    kind: str,
+    payload: Dict[str, Any],
+    delay: float = 0.0,
+    max_attempts: Optional[int] = None,
+) -> Job:
+    """Add a job to the outbox; commits unless inside a unit of work"""
+    return await JobRepository.enqueue(
+        kind,
+        payload,
+        max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        session,
+        delay=delay,
+    )
+
+
+def backoff(attempts: int) -> float:
+    """Delay before the next attempt: exponential and capped, randomized by up to half"""
+    ceiling = min(
+        settings.JOBS_BACKOFF_MAX, settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1)
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class JobWorker:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        concurrency: int,
+        poll_interval: float,
+        lease_seconds: float,
+    ) -> None:
+        self.session_maker = session_maker
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._running: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def wake(self, payload: Any = None) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        events.subscribe("job.enqueued", self.wake)
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self, grace: float) -> None:
+        """Stop claiming jobs and give running ones `grace` seconds to finish"""
+        events.unsubscribe("job.enqueued", self.wake)
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        if self._running:
+            _, pending = await asyncio.wait(self._running, timeout=grace)
+            # Interrupted jobs are retried by whichever worker claims them next
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            free = self.concurrency - len(self._running)
+            claimed = []
+            if free > 0:
+                try:
+                    async with self.session_maker() as session:
+                        claimed = await JobRepository.claim_due_jobs(
+                            free, self.lease_seconds, session
+                        )
+                except Exception:
+                    logger.exception("Claiming jobs failed")
+            for job in claimed:
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._finished)
+            # A full batch means more jobs are probably due
+            if claimed and len(claimed) == free:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        self.wake()
+
+    async def _execute(self, job: Job) -> None:
+        handler = _handlers.get(job.kind)
+        error: Optional[str] = None
+        if handler is None:
+            error = f"No handler for job kind {job.kind!r}"
+        else:
+            try:
+                # Finish before the lease runs out, or another worker may claim it
+                await asyncio.wait_for(handler(job.payload), self.lease_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+
+        try:
+            async with self.session_maker() as session:
+                await self._record(job, handler, error, session)
+        except Exception:
+            # The lease runs out and the job is claimed again
+            logger.exception("Recording job result failed", job_id=str(job.id))
+
+    @staticmethod
+    async def _record(
+        job: Job, handler: Optional[JobHandler], error: Optional[str], session: AsyncSession
+    ) -> None:
+        if error is None:
+            await JobRepository.complete(job, session)
+            logger.info("Job done", job_id=str(job.id), kind=job.kind, attempt=job.attempts)
+            return
+
+        retry_in = (
+            None
+            if handler is None or job.attempts >= job.max_attempts
+            else backoff(job.attempts)
+        )
+        await JobRepository.record_failure(job, error, retry_in, session)
+        logger.warning(
+            "Job failed" if retry_in is None else "Job attempt failed, will retry",
+            job_id=str(job.id),
+            kind=job.kind,
+            attempt=job.attempts,
+            retry_in=retry_in,
+            error=error,
+        )
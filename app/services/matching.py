@@ -0,0 +1,369 @@
+"""
+Roommate compatibility matching.
+
+Ads and profiles are kept in two columnar, in-memory feature tables (NumPy
+arrays, one row per ad / per profile, NaN for unknown values). Scoring a
+candidate set is a handful of vectorized array operations followed by an
+argpartition for the top-k, so a query never touches the database except to
+hydrate the k winners.
+
+The tables are filled once from the database and then kept current through the
+"ad.*" and "profile.*" events emitted by the repositories after each commit.
+Every worker process keeps its own copy; the events are shared through the
+pub/sub backend, so with REDIS_URL set each copy also sees the other workers'
+commits.
+"""
+
+import asyncio
+import itertools
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import events
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Free-text preference attributes shared by ads and profiles (via the owner's ad)
+HABIT_FIELDS = ("bad_habits", "cleanliness", "character", "lifestyle")
+
+# (feature, weight, similarity kind)
+COMPONENTS: Tuple[Tuple[str, float, str], ...] = (
+    ("gender", 3.0, "equal"),
+    ("age", 2.0, "age"),
+    ("budget", 2.0, "ratio"),
+    ("roommates", 1.0, "ratio"),
+    *((field, 1.0, "equal") for field in HABIT_FIELDS),
+)
+FEATURES = tuple(name for name, _, _ in COMPONENTS)
+
+# Age difference (in years) at which the age similarity drops to zero
+AGE_WINDOW = 10.0
+
+_INITIAL_CAPACITY = 1024
+
+
+def _value(raw: Any) -> Any:
+    return raw.value if hasattr(raw, "value") else raw
+
+
+class _Vocabulary:
+    """
+    Maps normalized strings to stable float codes for equality matching. Once
+    `max_size` values have codes, new values are treated as unknown (NaN), so
+    free text can't grow the vocabulary without bound.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._codes: Dict[str, float] = {}
+
+    def code(self, raw: Any) -> float:
+        raw = _value(raw)
+        if raw is None:
+            return np.nan
+        key = str(raw).strip().lower()
+        if not key:
+            return np.nan
+        code = self._codes.get(key)
+        if code is None:
+            if len(self._codes) >= self.max_size:
+                return np.nan
+            code = self._codes[key] = float(len(self._codes))
+        return code
+
+
+class FeatureTable:
+    """
+    Growable columnar table of float features keyed by UUID. Deleted rows are
+    tombstoned through the `alive` mask and their slots reused.
+    """
+
+    def __init__(self, columns: Sequence[str]) -> None:
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.full(_INITIAL_CAPACITY, np.nan) for name in columns
+        }
+        self.alive = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self.keys: List[Optional[UUID]] = [None] * _INITIAL_CAPACITY
+        self.rows: Dict[UUID, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow(self) -> None:
+        capacity = len(self.alive) * 2
+        for name, column in self.columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[: len(column)] = column
+            self.columns[name] = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self.alive)] = self.alive
+        self.alive = alive
+        self.keys.extend([None] * (capacity - len(self.keys)))
+
+    def upsert(self, key: UUID, values: Dict[str, float]) -> int:
+        row = self.rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == len(self.alive):
+                    self._grow()
+                row = self._size
+                self._size += 1
+            self.rows[key] = row
+            self.keys[row] = key
+            self.alive[row] = True
+        for name, value in values.items():
+            self.columns[name][row] = value
+        return row
+
+    def remove(self, key: UUID) -> None:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        self.alive[row] = False
+        self.keys[row] = None
+        for column in self.columns.values():
+            column[row] = np.nan
+        self._free.append(row)
+
+    def get(self, key: UUID) -> Optional[Dict[str, float]]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        return {name: float(column[row]) for name, column in self.columns.items()}
+
+    def view(self) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """Columns and alive mask trimmed to the used part of the table."""
+        size = self._size
+        return (
+            {name: column[:size] for name, column in self.columns.items()},
+            self.alive[:size],
+        )
+
+
+def _similarity(kind: str, query: float, column: np.ndarray) -> np.ndarray:
+    if kind == "equal":
+        return (column == query).astype(float)
+    diff = np.abs(column - query)
+    if kind == "age":
+        return 1.0 - np.minimum(diff / AGE_WINDOW, 1.0)
+    scale = np.maximum(np.maximum(np.abs(column), abs(query)), 1.0)
+    return 1.0 - np.minimum(diff / scale, 1.0)
+
+
+def score(query: Dict[str, float], columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Weighted compatibility in [0, 1] of one query vector against every row.
+    Components unknown on either side are left out of both the numerator and
+    the denominator, so missing data neither helps nor hurts a candidate.
+    """
+    size = len(next(iter(columns.values())))
+    total = np.zeros(size)
+    weights = np.zeros(size)
+    for name, weight, kind in COMPONENTS:
+        value = query.get(name, np.nan)
+        if np.isnan(value):
+            continue
+        column = columns[name]
+        known = ~np.isnan(column)
+        with np.errstate(invalid="ignore"):
+            similarity = np.where(known, _similarity(kind, value, column), 0.0)
+        total += weight * similarity
+        weights += weight * known
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weights > 0, total / weights, 0.0)
+
+
+def _top_k(scores: np.ndarray, eligible: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    scores = np.where(eligible & (scores > 0), scores, -1.0)
+    candidates = int(np.count_nonzero(scores > 0))
+    k = min(k, candidates)
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(row), float(scores[row])) for row in top]
+
+
+class MatchingEngine:
+    """
+    Keeps the ad and profile feature tables and answers top-k queries.
+
+    The ad table stores each ad's requirements. The profile table stores each
+    person's own gender and birth date plus their preferences, which are
+    borrowed from the most recently written ad they own. Ads have no update
+    timestamp, so "recently written" is the order in which this process saw
+    the writes; ads read at load time rank below those and by created_at.
+    """
+
+    def __init__(self) -> None:
+        self._vocabulary = _Vocabulary(settings.MATCHING_VOCABULARY_SIZE)
+        self.ads = FeatureTable(FEATURES)
+        self.profiles = FeatureTable(FEATURES + ("birth_ordinal",))
+        self._ad_owner: Dict[UUID, UUID] = {}
+        # owner id -> {ad id: (write number, created_at)}, the latest ranks highest
+        self._owner_ads: Dict[UUID, Dict[UUID, Tuple[int, datetime]]] = {}
+        self._writes = itertools.count(1)
+        # owner id -> ad whose preferences the owner's profile row currently uses
+        self._preference_source: Dict[UUID, UUID] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    # Feature extraction
+
+    def _ad_features(self, ad: Dict[str, Any]) -> Dict[str, float]:
+        features = {
+            "gender": self._vocabulary.code(ad.get("gender")),
+            "age": _number(ad.get("age_requirements")),
+            "budget": _number(ad.get("budget")),
+            "roommates": _number(ad.get("number_of_roommates")),
+        }
+        for field in HABIT_FIELDS:
+            features[field] = self._vocabulary.code(ad.get(field))
+        return features
+
+    def _preferences(self, owner_id: UUID) -> Dict[str, float]:
+        """Preference features of an owner, taken from their source ad."""
+        source = self._preference_source.get(owner_id)
+        ad = self.ads.get(source) if source else None
+        keys = ("budget", "roommates") + HABIT_FIELDS
+        return {key: (ad[key] if ad else np.nan) for key in keys}
+
+    def profile_features(self, profile: Dict[str, Any]) -> Dict[str, float]:
+        """Query vector for a profile, with the age computed as of today."""
+        birth_date = profile.get("birth_date")
+        features = {
+            "gender": self._vocabulary.code(profile.get("gender")),
+            "age": _age(birth_date.toordinal()) if birth_date else np.nan,
+        }
+        features.update(self._preferences(profile["user_id"]))
+        return features
+
+    # Incremental maintenance (event handlers)
+
+    def upsert_ad(self, ad: Dict[str, Any]) -> None:
+        self._upsert_ad(ad, next(self._writes))
+
+    def _upsert_ad(self, ad: Dict[str, Any], written: int) -> None:
+        ad_id, owner_id = ad["ad_id"], ad["owner_id"]
+        self.ads.upsert(ad_id, self._ad_features(ad))
+        self._ad_owner[ad_id] = owner_id
+        owned = self._owner_ads.setdefault(owner_id, {})
+        owned[ad_id] = (written, ad["created_at"])
+        self._preference_source[owner_id] = max(owned, key=owned.__getitem__)
+        self._refresh_profile_preferences(owner_id)
+
+    def remove_ad(self, payload: Dict[str, Any]) -> None:
+        ad_id = payload["ad_id"]
+        self.ads.remove(ad_id)
+        owner_id = self._ad_owner.pop(ad_id, None)
+        if owner_id is None:
+            return
+        owned = self._owner_ads.get(owner_id, {})
+        owned.pop(ad_id, None)
+        if self._preference_source.get(owner_id) == ad_id:
+            if owned:
+                self._preference_source[owner_id] = max(owned, key=owned.__getitem__)
+            else:
+                self._preference_source.pop(owner_id, None)
+                self._owner_ads.pop(owner_id, None)
+            self._refresh_profile_preferences(owner_id)
+
+    def upsert_profile(self, profile: Dict[str, Any]) -> None:
+        birth_date: Optional[date] = profile.get("birth_date")
+        values = {
+            "gender": self._vocabulary.code(profile.get("gender")),
+            "birth_ordinal": float(birth_date.toordinal()) if birth_date else np.nan,
+        }
+        values.update(self._preferences(profile["user_id"]))
+        self.profiles.upsert(profile["user_id"], values)
+
+    def remove_profile(self, payload: Dict[str, Any]) -> None:
+        self.profiles.remove(payload["user_id"])
+
+    def _refresh_profile_preferences(self, owner_id: UUID) -> None:
+        if owner_id in self.profiles.rows:
+            self.profiles.upsert(owner_id, self._preferences(owner_id))
+
+    # Loading
+
+    async def load(self, session: AsyncSession, chunk_size: int = 1000) -> None:
+        """Fill both tables from the database."""
+        from app.repositories.ad import AdRepository
+        from app.repositories.profile import UserProfileRepository
+
+        async for ad in AdRepository.stream_all_ads(session, chunk_size):
+            self._upsert_ad(events.snapshot(ad), 0)
+        async for profile in UserProfileRepository.stream_all_user_profiles(
+            session, chunk_size
+        ):
+            self.upsert_profile(events.snapshot(profile))
+        self._loaded = True
+        logger.info(
+            "Matching index loaded", ads=len(self.ads), profiles=len(self.profiles)
+        )
+
+    async def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        from app.database.config import async_session_maker
+
+        async with self._load_lock:
+            if not self._loaded:
+                async with async_session_maker() as session:
+                    await self.load(session)
+
+    # Queries
+
+    def match_profiles(self, ad: Dict[str, Any], k: int) -> List[Tuple[UUID, float]]:
+        """Top-k profiles (user ids) compatible with an ad, excluding its owner."""
+        columns, alive = self.profiles.view()
+        if not alive.any():
+            return []
+        columns = dict(columns, age=_age(columns["birth_ordinal"]))
+        eligible = alive.copy()
+        owner_row = self.profiles.rows.get(ad["owner_id"])
+        if owner_row is not None:
+            eligible[owner_row] = False
+        scores = score(self._ad_features(ad), columns)
+        return [(self.profiles.keys[row], s) for row, s in _top_k(scores, eligible, k)]
+
+    def recommend_ads(
+        self, profile: Dict[str, Any], k: int
+    ) -> List[Tuple[UUID, float]]:
+        """Top-k ads compatible with a profile, excluding the person's own ads."""
+        columns, alive = self.ads.view()
+        if not alive.any():
+            return []
+        eligible = alive.copy()
+        for ad_id in self._owner_ads.get(profile["user_id"], ()):
+            eligible[self.ads.rows[ad_id]] = False
+        scores = score(self.profile_features(profile), columns)
+        return [(self.ads.keys[row], s) for row, s in _top_k(scores, eligible, k)]
+
+
+def _number(raw: Any) -> float:
+    return float(raw) if raw is not None else np.nan
+
+
+def _age(birth_ordinal):
+    return (date.today().toordinal() - birth_ordinal) / 365.25
+
+
+matching_engine = MatchingEngine()
+
+events.subscribe_shared("ad.created", matching_engine.upsert_ad)
+events.subscribe_shared("ad.updated", matching_engine.upsert_ad)
+events.subscribe_shared("ad.deleted", matching_engine.remove_ad)
+events.subscribe_shared("profile.created", matching_engine.upsert_profile)
+events.subscribe_shared("profile.updated", matching_engine.upsert_profile)
+events.subscribe_shared("profile.deleted", matching_engine.remove_profile)
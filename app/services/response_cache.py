@@ -0,0 +1,60 @@
+"""
+Response cache for single-resource GET endpoints.
+
+Entries are invalidated by the "ad.*" and "profile.*" events, i.e. exactly when
+the repository transaction that changed the resource commits. The invalidation
+is then broadcast so that other workers drop their copies too.
+"""
+
+import uuid
+from typing import Any, Dict
+
+from app.core import events
+from app.core.cache import ResponseCache
+from app.core.config import settings
+from app.core.pubsub import pubsub
+from app.database.config import replica_engines
+
+INVALIDATION_CHANNEL = "responses.invalidate"
+
+_KINDS = {b"a": "ad", b"p": "profile"}
+
+response_cache = ResponseCache(
+    settings.RESPONSE_CACHE_SIZE,
+    settings.RESPONSE_CACHE_TTL,
+    # Replicas may still serve the old row right after a write
+    quiet_period=settings.READ_YOUR_WRITES_SECONDS if replica_engines else 0.0,
+)
+
+
+def ad_key(ad_id: uuid.UUID) -> tuple:
+    return ("ad", ad_id)
+
+
+def profile_key(user_id: uuid.UUID) -> tuple:
+    return ("profile", user_id)
+
+
+def _on_invalidation(message: bytes) -> None:
+    response_cache.invalidate((_KINDS[message[:1]], uuid.UUID(bytes=message[1:])))
+
+
+def _invalidate(kind: bytes, resource_id: uuid.UUID) -> None:
+    _on_invalidation(kind + resource_id.bytes)
+    pubsub.publish_nowait(INVALIDATION_CHANNEL, kind + resource_id.bytes)
+
+
+def _invalidate_ad(ad: Dict[str, Any]) -> None:
+    _invalidate(b"a", ad["ad_id"])
+
+
+def _invalidate_profile(profile: Dict[str, Any]) -> None:
+    _invalidate(b"p", profile["user_id"])
+
+
+pubsub.subscribe(INVALIDATION_CHANNEL, _on_invalidation)
+
+events.subscribe("ad.updated", _invalidate_ad)
+events.subscribe("ad.deleted", _invalidate_ad)
+events.subscribe("profile.updated", _invalidate_profile)
+events.subscribe("profile.deleted", _invalidate_profile)
@@ -0,0 +1,272 @@
+"""
+Saved-search alerts: new and updated ads are matched against every user's
+saved filters and the hits land in the user's inbox.
+
+Matching runs the other way round from a query ("percolation"): the stored
+searches are indexed and each ad looks up the few that could match it, instead
+of every search being tested against every ad. `SavedSearchIndex` buckets a
+search by its exact-match filters (gender, roommates, age, nationality; unset
+ones as wildcards) and, within that, by the rarest-looking word of its free
+text or by the budget band its range covers. An ad probes the 2^k wildcard
+combinations of its own values against its words and its budget band, and only
+the searches found there are checked in full.
+
+The index lives in every worker. It is loaded once and kept current through
+the "saved_search.*" events, which are re-broadcast on the pub/sub backend so
+that all workers see every change. The "ad.created"/"ad.updated" events are
+matched in the process that committed the ad; hits are buffered and written
+in one statement per batch after the current event loop iteration.
+"""
+
+import asyncio
+import json
+import math
+from decimal import Decimal
+from itertools import product
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import events
+from app.core.logger import get_logger
+from app.core.pubsub import pubsub
+from app.services.search import tokenize
+
+logger = get_logger(__name__)
+
+CHANGES_CHANNEL = "saved_searches.changed"
+
+# Exact-match filters, in the order of a bucket signature
+EXACT_FIELDS = ("gender", "number_of_roommates", "age_requirements", "nationality")
+
+# Budget ranges that are open-ended or cover more power-of-two bands than this
+# are not indexed by budget: they are verified against every ad of their
+# signature instead
+_MAX_BUDGET_BANDS = 8
+
+_ANY = ("*",)
+
+
+def _value(raw: Any) -> Any:
+    return raw.value if hasattr(raw, "value") else raw
+
+
+def _band(budget: Decimal) -> int:
+    """Power-of-two band of a budget: [2^(n-1), 2^n) is band n, below 1 is band 0"""
+    return max(0, math.frexp(float(budget))[1]) if budget > 0 else 0
+
+
+class _Search:
+    __slots__ = (
+        "id",
+        "user_id",
+        "exact",
+        "budget_min",
+        "budget_max",
+        "terms",
+        "keys",
+    )
+
+    def __init__(self, search: Dict[str, Any]) -> None:
+        self.id: UUID = search["id"]
+        self.user_id: UUID = search["user_id"]
+        self.exact = tuple(_value(search.get(name)) for name in EXACT_FIELDS)
+        self.budget_min: Optional[Decimal] = search.get("budget_min")
+        self.budget_max: Optional[Decimal] = search.get("budget_max")
+        self.terms = frozenset(tokenize(search.get("query") or ""))
+        self.keys: List[tuple] = []
+
+    def matches(self, ad: Dict[str, Any], terms: Set[str]) -> bool:
+        budget = ad.get("budget")
+        if self.budget_min is not None and (budget is None or budget < self.budget_min):
+            return False
+        if self.budget_max is not None and (budget is None or budget > self.budget_max):
+            return False
+        for wanted, field in zip(self.exact, EXACT_FIELDS):
+            if wanted is not None and wanted != _value(ad.get(field)):
+                return False
+        return self.terms <= terms
+
+
+class SavedSearchIndex:
+    """Saved searches bucketed for percolation (see the module docstring)."""
+
+    def __init__(self) -> None:
+        self._searches: Dict[UUID, _Search] = {}
+        self._buckets: Dict[tuple, Dict[UUID, _Search]] = {}
+
+    def __len__(self) -> int:
+        return len(self._searches)
+
+    @staticmethod
+    def _keys(search: _Search) -> List[tuple]:
+        if search.terms:
+            # Longer words tend to be rarer, so their buckets stay small
+            anchor = max(search.terms, key=lambda term: (len(term), term))
+            return [(search.exact, ("t", anchor))]
+        if search.budget_min is not None or search.budget_max is not None:
+            low = _band(search.budget_min) if search.budget_min is not None else 0
+            if search.budget_max is not None:
+                high = _band(search.budget_max)
+                if high - low < _MAX_BUDGET_BANDS:
+                    bands = range(low, high + 1)
+                    return [(search.exact, ("b", band)) for band in bands]
+        return [(search.exact, _ANY)]
+
+    def upsert(self, search: Dict[str, Any]) -> None:
+        self.remove(search)
+        entry = _Search(search)
+        entry.keys = self._keys(entry)
+        self._searches[entry.id] = entry
+        for key in entry.keys:
+            self._buckets.setdefault(key, {})[entry.id] = entry
+
+    def remove(self, payload: Dict[str, Any]) -> None:
+        entry = self._searches.pop(payload["id"], None)
+        if entry is None:
+            return
+        for key in entry.keys:
+            bucket = self._buckets[key]
+            del bucket[entry.id]
+            if not bucket:
+                del self._buckets[key]
+
+    def match(self, ad: Dict[str, Any]) -> List[Tuple[UUID, UUID]]:
+        """(search_id, user_id) of the searches matching the ad, the owner's excluded"""
+        terms = set(tokenize(ad.get("title") or ""))
+        terms.update(tokenize(ad.get("description") or ""))
+        suffixes = [_ANY, *(("t", term) for term in terms)]
+        if ad.get("budget") is not None:
+            suffixes.append(("b", _band(ad["budget"])))
+
+        values = [_value(ad.get(field)) for field in EXACT_FIELDS]
+        signatures = product(
+            *(((None,) if value is None else (None, value)) for value in values)
+        )
+        buckets = self._buckets
+        owner_id = ad.get("owner_id")
+        hits = []
+        for signature in signatures:
+            for suffix in suffixes:
+                bucket = buckets.get((signature, suffix))
+                if not bucket:
+                    continue
+                for search in bucket.values():
+                    if search.user_id != owner_id and search.matches(ad, terms):
+                        hits.append((search.id, search.user_id))
+        return hits
+
+
+def _encode_change(name: str, search: Dict[str, Any]) -> bytes:
+    if name == "saved_search.deleted":
+        return json.dumps({"op": "delete", "id": str(search["id"])}).encode()
+    fields = {
+        "id": str(search["id"]),
+        "user_id": str(search["user_id"]),
+        "query": search.get("query"),
+        **{name: _value(search.get(name)) for name in EXACT_FIELDS},
+        **{
+            name: None if search.get(name) is None else str(search[name])
+            for name in ("budget_min", "budget_max")
+        },
+    }
+    return json.dumps({"op": "upsert", "search": fields}).encode()
+
+
+def _decode_change(message: bytes) -> Tuple[str, Dict[str, Any]]:
+    change = json.loads(message)
+    if change["op"] == "delete":
+        return "delete", {"id": UUID(change["id"])}
+    search = change["search"]
+    search["id"] = UUID(search["id"])
+    search["user_id"] = UUID(search["user_id"])
+    for name in ("budget_min", "budget_max"):
+        if search[name] is not None:
+            search[name] = Decimal(search[name])
+    return "upsert", search
+
+
+class SavedSearchAlerts:
+    """Keeps the index loaded and current, and writes the hits to the inbox."""
+
+    def __init__(self) -> None:
+        self.index = SavedSearchIndex()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def load(self, session: AsyncSession, chunk_size: int = 1000) -> None:
+        from app.repositories.saved_search import SavedSearchRepository
+
+        async for search in SavedSearchRepository.stream_all_searches(
+            session, chunk_size
+        ):
+            self.index.upsert(events.snapshot(search))
+        self._loaded = True
+        logger.info("Saved search index loaded", searches=len(self.index))
+
+    async def ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        from app.database.config import async_session_maker
+
+        async with self._load_lock:
+            if not self._loaded:
+                async with async_session_maker() as session:
+                    await self.load(session)
+
+    def publish_change(self, name: str, search: Dict[str, Any]) -> None:
+        pubsub.publish_nowait(CHANGES_CHANNEL, _encode_change(name, search))
+
+    def apply_change(self, message: bytes) -> None:
+        op, search = _decode_change(message)
+        if op == "delete":
+            self.index.remove(search)
+        else:
+            self.index.upsert(search)
+
+    def percolate(self, ad: Dict[str, Any]) -> None:
+        """Queue inbox hits for an ad that was just created or updated"""
+        for search_id, user_id in self.index.match(ad):
+            self._pending.append(
+                {"user_id": user_id, "search_id": search_id, "ad_id": ad["ad_id"]}
+            )
+        if self._pending and self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        from app.database.config import async_session_maker
+        from app.repositories.saved_search import SavedSearchRepository
+
+        try:
+            # Hits of a bulk write arrive in one burst of events: take them together
+            await asyncio.sleep(0)
+            while self._pending:
+                hits, self._pending = self._pending, []
+                try:
+                    async with async_session_maker() as session:
+                        await SavedSearchRepository.add_hits(hits, session)
+                except Exception:
+                    logger.exception("Saving inbox hits failed", hits=len(hits))
+        finally:
+            self._flush_task = None
+
+    async def drain(self) -> None:
+        """Wait for the queued hits to be written (on shutdown)"""
+        if self._flush_task is not None:
+            await self._flush_task
+
+
+saved_search_alerts = SavedSearchAlerts()
+
+pubsub.subscribe(CHANGES_CHANNEL, saved_search_alerts.apply_change)
+
+for _name in ("saved_search.created", "saved_search.updated", "saved_search.deleted"):
+    events.subscribe(
+        _name,
+        lambda search, name=_name: saved_search_alerts.publish_change(name, search),
+    )
+events.subscribe("ad.created", saved_search_alerts.percolate)
+events.subscribe("ad.updated", saved_search_alerts.percolate)
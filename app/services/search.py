@@ -0,0 +1,160 @@
+"""
+Full-text search over ad titles and descriptions.
+
+On Postgres the search runs in the database against the GIN-indexed tsvector
+expression defined next to the Ad model. On SQLite an in-process inverted index
+with BM25 ranking is used instead. It is loaded once and then maintained from
+the "ad.*" events emitted after each commit, those of other workers included
+when REDIS_URL is set (see app.core.events.share).
+"""
+
+import asyncio
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import events
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.models.ads import AD_SEARCH_VECTOR, Ad, ad_search_query
+
+logger = get_logger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Title terms count this many times, mirroring the 'A' vs 'B' weights on Postgres
+TITLE_WEIGHT = 2
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    Term -> {ad_id: term frequency} postings with BM25 ranking. Each document
+    remembers its own term counts so updates and deletes touch only its terms.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[UUID, int]] = {}
+        self._documents: Dict[UUID, Counter] = {}
+        self._lengths: Dict[UUID, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def upsert(self, ad: Dict[str, Any]) -> None:
+        ad_id = ad["ad_id"]
+        self.remove({"ad_id": ad_id})
+        terms = Counter(tokenize(ad.get("title") or "") * TITLE_WEIGHT)
+        terms.update(tokenize(ad.get("description") or ""))
+        if not terms:
+            return
+        self._documents[ad_id] = terms
+        self._lengths[ad_id] = sum(terms.values())
+        self._total_length += self._lengths[ad_id]
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[ad_id] = frequency
+
+    def remove(self, payload: Dict[str, Any]) -> None:
+        terms = self._documents.pop(payload["ad_id"], None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(payload["ad_id"])
+        for term in terms:
+            postings = self._postings[term]
+            del postings[payload["ad_id"]]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int) -> List[Tuple[UUID, float]]:
+        """Ads containing any query term, best BM25 score first."""
+        count = len(self._documents)
+        if not count:
+            return []
+        average_length = self._total_length / count
+        lengths = self._lengths
+        scores: Dict[UUID, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for ad_id, frequency in postings.items():
+                norm = K1 * (1 - B + B * lengths[ad_id] / average_length)
+                scores[ad_id] = scores.get(ad_id, 0.0) + idf * frequency * (K1 + 1) / (
+                    frequency + norm
+                )
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+class AdSearch:
+    """Chooses between database full-text search and the in-process index."""
+
+    def __init__(self, in_process: bool) -> None:
+        self.in_process = in_process
+        self.index = InvertedIndex()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def load(self, session: AsyncSession, chunk_size: int = 1000) -> None:
+        from app.repositories.ad import AdRepository
+
+        async for ad in AdRepository.stream_all_ads(session, chunk_size):
+            self.index.upsert(events.snapshot(ad))
+        self._loaded = True
+        logger.info("Search index loaded", ads=len(self.index))
+
+    async def ensure_loaded(self) -> None:
+        if self._loaded or not self.in_process:
+            return
+        from app.database.config import async_session_maker
+
+        async with self._load_lock:
+            if not self._loaded:
+                async with async_session_maker() as session:
+                    await self.load(session)
+
+    async def search(
+        self, query: str, limit: int, session: AsyncSession
+    ) -> List[Tuple[Ad, float]]:
+        """Ranked (ad, score) pairs for a free-text query."""
+        if not self.in_process:
+            tsquery = ad_search_query(query)
+            rank = func.ts_rank_cd(AD_SEARCH_VECTOR, tsquery).label("rank")
+            stmt = (
+                select(Ad, rank)
+                .where(AD_SEARCH_VECTOR.op("@@")(tsquery))
+                .order_by(rank.desc())
+                .limit(limit)
+            )
+            result = await session.execute(stmt)
+            return [(ad, float(score)) for ad, score in result.all()]
+
+        from app.repositories.ad import AdRepository
+
+        await self.ensure_loaded()
+        ranked = self.index.search(query, limit)
+        ads = await AdRepository.get_ads_by_ids([ad_id for ad_id, _ in ranked], session)
+        by_id = {ad.ad_id: ad for ad in ads}
+        return [(by_id[ad_id], score) for ad_id, score in ranked if ad_id in by_id]
+
+
+ad_search = AdSearch(in_process=settings.DATABASE_URL.startswith("sqlite"))
+
+if ad_search.in_process:
+    events.subscribe_shared("ad.created", ad_search.index.upsert)
+    events.subscribe_shared("ad.updated", ad_search.index.upsert)
+    events.subscribe_shared("ad.deleted", ad_search.index.remove)
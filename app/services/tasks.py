@@ -0,0 +1,50 @@
+"""
+Handlers of the background jobs enqueued by the application. Importing this
+module registers them with the job worker.
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict
+
+from app.database.config import async_session_maker
+from app.repositories.image import ProfileImageRepository
+from app.repositories.profile import UserProfileRepository
+from app.services.email import send_email
+from app.services.images import remove_files
+from app.services.jobs import job_handler
+
+PROVISION_PROFILE = "profile.provision"
+SEND_EMAIL = "email.send"
+COLLECT_IMAGE_FILES = "images.collect"
+
+# Files of deleted images are collected this long afterwards: an upload of the
+# same content that found them already stored has committed its row by then
+IMAGE_COLLECTION_DELAY = 3600.0
+
+
+@job_handler(PROVISION_PROFILE)
+async def provision_profile(payload: Dict[str, Any]) -> None:
+    """
+    Create the empty profile of a newly registered user (idempotent).
+    Registration now inserts the profile itself; this drains jobs enqueued
+    before that change.
+    """
+    user_id = uuid.UUID(payload["user_id"])
+    async with async_session_maker() as session:
+        if await UserProfileRepository.get_user_profile(user_id, session) is None:
+            await UserProfileRepository.create_user_profile(user_id, {}, session)
+
+
+@job_handler(SEND_EMAIL)
+async def deliver_email(payload: Dict[str, Any]) -> None:
+    await send_email(payload["to"], payload["subject"], payload["body"])
+
+
+@job_handler(COLLECT_IMAGE_FILES)
+async def collect_image_files(payload: Dict[str, Any]) -> None:
+    """Delete the stored files of deleted images that no image references anymore"""
+    async with async_session_maker() as session:
+        for digest, extension in payload["files"]:
+            if not await ProfileImageRepository.is_digest_used(digest, session):
+                await asyncio.to_thread(remove_files, digest, extension)
@@ -0,0 +1,46 @@
+"""
+Standalone background job worker.
+
+Usage:
+    python -m app.worker
+
+Runs the same job handlers as the in-app worker, e.g. when the API processes
+are started with JOBS_RUN_IN_APP=False. Stops on SIGINT/SIGTERM, giving
+running jobs JOBS_SHUTDOWN_GRACE seconds to finish.
+"""
+
+import asyncio
+import signal
+
+from app.core.config import settings
+from app.core.logger import configure_logging, get_logger
+from app.database.config import async_session_maker, dispose_engines
+from app.services import tasks  # noqa: F401  (registers the job handlers)
+from app.services.jobs import JobWorker
+
+logger = get_logger(__name__)
+
+
+async def main() -> None:
+    configure_logging()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    worker = JobWorker(
+        async_session_maker,
+        concurrency=settings.JOBS_CONCURRENCY,
+        poll_interval=settings.JOBS_POLL_INTERVAL,
+        lease_seconds=settings.JOBS_LEASE_SECONDS,
+    )
+    worker.start()
+    logger.info("Job worker started", concurrency=settings.JOBS_CONCURRENCY)
+    await stop.wait()
+    logger.info("Job worker stopping")
+    await worker.stop(settings.JOBS_SHUTDOWN_GRACE)
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1 @@
+# Benchmarks for the API hot paths; run modules with `python -m benchmarks.<name>`
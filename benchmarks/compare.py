@@ -0,0 +1,77 @@
+"""
+Diff two load test result files written by `benchmarks.load --json`.
+
+Usage:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+
+Prints the relative change of each latency percentile, throughput and
+allocation figure per endpoint. Exits with status 1 if any figure regressed by
+more than `--threshold` percent, so it can gate a CI job.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# metric -> True if a higher value is better
+METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "peak_alloc_bytes": False,
+}
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(
+    baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float
+) -> Tuple[List[Tuple[str, str, float, float, float]], List[str]]:
+    """Rows of (endpoint, metric, old, new, change %) and the regressed ones."""
+    rows = []
+    regressions = []
+    for endpoint, old in baseline["endpoints"].items():
+        new = candidate["endpoints"].get(endpoint)
+        if new is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in old or metric not in new or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] * 100
+            rows.append((endpoint, metric, old[metric], new[metric], change))
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(f"{endpoint} {metric} {change:+.1f}%")
+    return rows, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two load test results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    if baseline.get("meta", {}).get("params") != candidate.get("meta", {}).get("params"):
+        print("warning: the runs used different parameters", file=sys.stderr)
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"{'endpoint':<16}{'metric':<18}{'baseline':>12}{'candidate':>12}{'change':>9}")
+    for endpoint, metric, old, new, change in rows:
+        print(f"{endpoint:<16}{metric:<18}{old:>12.2f}{new:>12.2f}{change:>+8.1f}%")
+
+    if regressions:
+        print(f"\nregressions over {args.threshold:g}%:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
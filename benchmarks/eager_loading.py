@@ -0,0 +1,155 @@
+"""
+Checks that eagerly loaded relationships cost a constant number of queries.
+
+Usage:
+    python -m benchmarks.eager_loading [--sizes 1,10,100] [--json results.json]
+
+For every page size it reseeds a throwaway SQLite database (or $BENCH_POSTGRES_URL,
+whose tables are dropped and recreated) with that many ads, each owned by a
+different user with a profile, and counts the SQL statements issued by
+
+    GET /ads?include=owner_profile&limit=<size>
+    GET /users/me/profile
+
+under each EAGER_LOADING_STRATEGY. Exits with status 1 if the count for an
+endpoint and strategy changes with the page size (an N+1 query).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from tests.database import use_throwaway_database
+
+# The database URL is read when the app is imported, so it is set up first.
+# Never $DATABASE_URL: the tables are dropped, so Postgres only when asked for
+if __name__ == "__main__":
+    use_throwaway_database(os.environ.get("BENCH_POSTGRES_URL"))
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.database.base import Base  # noqa: E402
+from app.database.config import async_session_maker, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Ad, User, UserProfile  # noqa: E402
+
+from benchmarks.round_trips import RoundTripCounter  # noqa: E402
+
+API = settings.API_V1_STR
+STRATEGIES = ("joined", "selectin")
+PASSWORD = "benchmark-password"
+
+
+async def seed(size: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    user_ids = [uuid.uuid4() for _ in range(size)]
+    now = datetime.now(timezone.utc)
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(User),
+            [
+                {"id": user_id, "email": f"owner{i}@bench.example.com",
+                 "hashed_password": "not-a-real-hash"}
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        await session.execute(
+            insert(UserProfile),
+            [
+                {"id": uuid.uuid4(), "user_id": user_id, "first_name": f"Owner{i}"}
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        await session.execute(
+            insert(Ad),
+            [
+                {"ad_id": uuid.uuid4(), "owner_id": user_id, "title": f"Room {i}",
+                 "created_at": now - timedelta(seconds=i)}
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        await session.commit()
+
+
+async def run(sizes: List[int]) -> Dict[str, Dict[str, List[int]]]:
+    counter = RoundTripCounter()
+    results: Dict[str, Dict[str, List[int]]] = {
+        endpoint: {strategy: [] for strategy in STRATEGIES}
+        for endpoint in ("ads_with_owner_profile", "me_profile")
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size in sizes:
+            await seed(size)
+            response = await client.post(
+                f"{API}/auth/register",
+                json={"email": f"me{size}@bench.example.com", "password": PASSWORD},
+            )
+            response.raise_for_status()
+            response = await client.post(
+                f"{API}/auth/jwt/login",
+                data={"username": f"me{size}@bench.example.com", "password": PASSWORD},
+            )
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            for strategy in STRATEGIES:
+                settings.EAGER_LOADING_STRATEGY = strategy
+
+                counter.reset()
+                response = await client.get(
+                    f"{API}/ads/ads/",
+                    params={"limit": size, "include": "owner_profile"},
+                )
+                response.raise_for_status()
+                items = response.json()["items"]
+                assert len(items) == size
+                assert all(item["owner_profile"] for item in items)
+                results["ads_with_owner_profile"][strategy].append(counter.statements)
+
+                counter.reset()
+                response = await client.get(f"{API}/users/me/profile", headers=headers)
+                response.raise_for_status()
+                assert response.json()["profile"] is not None
+                results["me_profile"][strategy].append(counter.statements)
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes",
+        default="1,10,100",
+        help=f"comma-separated page sizes (at most {settings.ADS_MAX_PAGE_SIZE})",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = asyncio.run(run(sizes))
+    print(f"{'endpoint':<24}{'strategy':<10}" + "".join(f"{size:>8}" for size in sizes))
+    failed = False
+    for endpoint, by_strategy in results.items():
+        for strategy, counts in by_strategy.items():
+            print(f"{endpoint:<24}{strategy:<10}" + "".join(f"{n:>8}" for n in counts))
+            failed = failed or len(set(counts)) > 1
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"sizes": sizes, "statements": results}, fh, indent=2)
+    if failed:
+        print("Statement count grows with the page size", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+In-process load test for the API hot paths.
+
+Usage:
+    python -m benchmarks.load [--target sqlite|postgres] [--users 200] [--ads 2000]
+                              [--concurrency 20] [--requests 2000] [--seed 1]
+                              [--json results.json]
+
+Seeds users, profiles and ads straight into the database, then drives a
+weighted mix of register / login / list ads / get ad / update profile requests
+through the ASGI app with `--concurrency` concurrent clients. Reports p50/p95/p99
+latency and throughput per endpoint, followed by a sequential pass that measures
+peak Python memory allocated per request (tracemalloc).
+
+`--target sqlite` uses a throwaway SQLite file. `--target postgres` uses the
+database at $BENCH_POSTGRES_URL (e.g. a local container); its tables are
+dropped and recreated. Results written with `--json` can be compared with
+`python -m benchmarks.compare`.
+"""
+
+import argparse
+import os
+import sys
+
+from tests.database import use_throwaway_database
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="In-process API load test")
+    parser.add_argument("--target", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--ads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--alloc-samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    return parser.parse_args()
+
+
+ARGS = _parse_args() if __name__ == "__main__" else None
+
+# The database URL is read when the app is imported, so it is set up first
+if ARGS is not None:
+    if ARGS.target == "postgres":
+        if not os.environ.get("BENCH_POSTGRES_URL"):
+            sys.exit("--target postgres requires BENCH_POSTGRES_URL")
+        use_throwaway_database(os.environ["BENCH_POSTGRES_URL"])
+    else:
+        use_throwaway_database()
+
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import subprocess  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+import uuid  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from datetime import date, datetime, timedelta, timezone  # noqa: E402
+from typing import Any, Awaitable, Callable, Dict, List  # noqa: E402
+
+import httpx  # noqa: E402
+from fastapi_users.password import PasswordHelper  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.database.base import Base  # noqa: E402
+from app.database.config import async_session_maker, engine  # noqa: E402
+from app.main import app, lifespan  # noqa: E402
+from app.models import Ad, User, UserProfile  # noqa: E402
+from app.models.ads import Gender as AdGender  # noqa: E402
+from app.models.profiles import Gender as ProfileGender  # noqa: E402
+
+API = settings.API_V1_STR
+PASSWORD = "benchmark-password"
+
+# Relative frequency of each operation in the mixed workload
+WEIGHTS = {
+    "register": 1,
+    "login": 2,
+    "list_ads": 10,
+    "get_ad": 10,
+    "update_profile": 3,
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def seed(users: int, ads: int, rng: random.Random) -> Dict[str, List[Any]]:
+    """Insert users, empty-ish profiles and ads in bulk, bypassing the API."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    hashed_password = PasswordHelper().hash(PASSWORD)
+    user_rows = [
+        {
+            "id": uuid.uuid4(),
+            "email": f"seed{i}@bench.example.com",
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }
+        for i in range(users)
+    ]
+    profile_rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": row["id"],
+            "first_name": f"User{i}",
+            "gender": rng.choice(list(ProfileGender)),
+            "birth_date": date(1980, 1, 1) + timedelta(days=rng.randrange(9000)),
+        }
+        for i, row in enumerate(user_rows)
+    ]
+    now = datetime.now(timezone.utc)
+    ad_rows = [
+        {
+            "ad_id": uuid.uuid4(),
+            "owner_id": rng.choice(user_rows)["id"],
+            "title": f"Room {i}",
+            "description": "Bright room close to the university",
+            "budget": rng.randrange(200, 2000),
+            "number_of_roommates": rng.randrange(1, 5),
+            "age_requirements": rng.randrange(18, 40),
+            "gender": rng.choice(list(AdGender)),
+            "created_at": now - timedelta(seconds=i),
+        }
+        for i in range(ads)
+    ]
+    async with async_session_maker() as session:
+        for model, rows in ((User, user_rows), (UserProfile, profile_rows), (Ad, ad_rows)):
+            for start in range(0, len(rows), 1000):
+                await session.execute(insert(model), rows[start : start + 1000])
+        await session.commit()
+    return {
+        "emails": [row["email"] for row in user_rows],
+        "user_ids": [str(row["id"]) for row in user_rows],
+        "ad_ids": [str(row["ad_id"]) for row in ad_rows],
+    }
+
+
+def build_operations(
+    client: httpx.AsyncClient, data: Dict[str, List[Any]], rng: random.Random
+) -> Dict[str, Callable[[], Awaitable[httpx.Response]]]:
+    registered = iter(range(10**9))
+
+    async def register() -> httpx.Response:
+        email = f"load{next(registered)}-{uuid.uuid4().hex[:8]}@bench.example.com"
+        return await client.post(
+            f"{API}/auth/register", json={"email": email, "password": PASSWORD}
+        )
+
+    async def login() -> httpx.Response:
+        return await client.post(
+            f"{API}/auth/jwt/login",
+            data={"username": rng.choice(data["emails"]), "password": PASSWORD},
+        )
+
+    async def list_ads() -> httpx.Response:
+        return await client.get(f"{API}/ads/ads/", params={"limit": 20})
+
+    async def get_ad() -> httpx.Response:
+        return await client.get(f"{API}/ads/ads/{rng.choice(data['ad_ids'])}")
+
+    async def update_profile() -> httpx.Response:
+        return await client.put(
+            f"{API}/profiles/profiles/{rng.choice(data['user_ids'])}",
+            json={
+                "first_name": f"Name{rng.randrange(10**6)}",
+                "gender": rng.choice(list(ProfileGender)).value,
+                "birth_date": str(date(1980, 1, 1) + timedelta(days=rng.randrange(9000))),
+                "image_url": None,
+            },
+        )
+
+    return {
+        "register": register,
+        "login": login,
+        "list_ads": list_ads,
+        "get_ad": get_ad,
+        "update_profile": update_profile,
+    }
+
+
+async def drive(
+    operations: Dict[str, Callable[[], Awaitable[httpx.Response]]],
+    concurrency: int,
+    total: int,
+    rng: random.Random,
+) -> Dict[str, Any]:
+    names = list(WEIGHTS)
+    plan = rng.choices(names, weights=[WEIGHTS[n] for n in names], k=total)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    queue = iter(plan)
+
+    async def worker() -> None:
+        for name in queue:
+            started = time.perf_counter()
+            response = await operations[name]()
+            latencies[name].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        values = sorted(latencies[name])
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+        }
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def measure_allocations(
+    operations: Dict[str, Callable[[], Awaitable[httpx.Response]]], samples: int
+) -> Dict[str, float]:
+    """Average peak traced memory per request, one request at a time."""
+    tracemalloc.start()
+    peaks = {}
+    try:
+        for name, operation in operations.items():
+            await operation()  # warm-up
+            total = 0
+            for _ in range(samples):
+                baseline, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                await operation()
+                total += tracemalloc.get_traced_memory()[1] - baseline
+            peaks[name] = total / samples
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    data = await seed(args.users, args.ads, rng)
+    transport = httpx.ASGITransport(app=app)
+    async with lifespan(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            operations = build_operations(client, data, rng)
+            results = await drive(operations, args.concurrency, args.requests, rng)
+            peaks = await measure_allocations(operations, args.alloc_samples)
+    for name, peak in peaks.items():
+        results["endpoints"][name]["peak_alloc_bytes"] = peak
+    results["meta"] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "target": args.target,
+        "python": platform.python_version(),
+        "params": {
+            key: getattr(args, key)
+            for key in ("users", "ads", "concurrency", "requests", "alloc_samples", "seed")
+        },
+    }
+    return results
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(
+        f"{'endpoint':<16}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}{'req/s':>9}{'alloc KiB':>11}"
+    )
+    for name, row in results["endpoints"].items():
+        print(
+            f"{name:<16}{row['requests']:>9}{row['errors']:>8}{row['p50_ms']:>9.2f}"
+            f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['throughput_rps']:>9.1f}"
+            f"{row.get('peak_alloc_bytes', 0) / 1024:>11.1f}"
+        )
+    print(
+        f"total: {results['throughput_rps']:.1f} req/s over {results['elapsed_s']:.2f} s"
+    )
+
+
+def main() -> None:
+    results = asyncio.run(run(ARGS))
+    print_report(results)
+    if ARGS.json:
+        with open(ARGS.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
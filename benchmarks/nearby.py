@@ -0,0 +1,171 @@
+"""
+Nearby search latency over a large number of located ads.
+
+Usage:
+    python -m benchmarks.nearby [--ads 100000] [--queries 200] [--json results.json]
+
+Seeds a throwaway SQLite database (or $BENCH_POSTGRES_URL, whose tables are
+dropped and recreated) with ads clustered around a few cities plus a uniform scatter,
+loads the nearby index and prints p50/p95/max latency per search radius for
+
+    index     GeohashIndex.nearby() alone (in-process fallback only)
+    endpoint  GET /ads/nearby in-process, including fetching the ads
+
+The first index results for each radius are checked against a brute-force scan
+of all ads.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from tests.database import use_throwaway_database
+
+# The database URL is read when the app is imported, so it is set up first.
+# Never $DATABASE_URL: the tables are dropped, so Postgres only when asked for
+if __name__ == "__main__":
+    use_throwaway_database(os.environ.get("BENCH_POSTGRES_URL"))
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.geo import encode_geohash, haversine_km  # noqa: E402
+from app.database.base import Base  # noqa: E402
+from app.database.config import async_session_maker, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Ad, User  # noqa: E402
+from app.services.geo import ad_geo  # noqa: E402
+
+API = settings.API_V1_STR
+RADII_KM = (1, 5, 25, 100)
+LIMIT = 20
+# Queries per radius whose results are checked by a brute-force scan
+VERIFIED_QUERIES = 20
+
+# (lat, lon) of the clusters
+CITIES = [(55.7558, 37.6173), (59.9343, 30.3351), (52.52, 13.405), (48.8566, 2.3522)]
+
+
+def random_point(rng: random.Random) -> Tuple[float, float]:
+    if rng.random() < 0.8:
+        lat, lon = rng.choice(CITIES)
+        return lat + rng.gauss(0, 0.15), lon + rng.gauss(0, 0.25)
+    return rng.uniform(35, 70), rng.uniform(-10, 60)
+
+
+async def seed(count: int, rng: random.Random) -> List[Tuple[uuid.UUID, float, float]]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    owner_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    points = [(uuid.uuid4(), *random_point(rng)) for _ in range(count)]
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(User),
+            [{"id": owner_id, "email": "owner@bench.example.com",
+              "hashed_password": "not-a-real-hash"}],
+        )
+        for start in range(0, count, 10_000):
+            await session.execute(
+                insert(Ad),
+                [
+                    {"ad_id": ad_id, "owner_id": owner_id, "title": f"Room {i}",
+                     "latitude": lat, "longitude": lon,
+                     "geohash": encode_geohash(lat, lon), "created_at": now}
+                    for i, (ad_id, lat, lon) in enumerate(
+                        points[start:start + 10_000], start
+                    )
+                ],
+            )
+        await session.commit()
+    return points
+
+
+def brute_force(
+    points: List[Tuple[uuid.UUID, float, float]], lat: float, lon: float, radius_km: float
+) -> List[uuid.UUID]:
+    hits = []
+    for ad_id, other_lat, other_lon in points:
+        distance = haversine_km(lat, lon, other_lat, other_lon)
+        if distance <= radius_km:
+            hits.append((distance, ad_id))
+    return [ad_id for _, ad_id in sorted(hits)[:LIMIT]]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": samples[int(len(samples) * 0.95) - 1] * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+async def run(count: int, queries: int) -> dict:
+    rng = random.Random(21)
+    points = await seed(count, rng)
+    started = time.perf_counter()
+    await ad_geo.ensure_loaded()
+    results: dict = {"index_load_s": time.perf_counter() - started, "radii": {}}
+
+    centers = [random_point(rng) for _ in range(queries)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for radius in RADII_KM:
+            index_times, endpoint_times = [], []
+            for i, (lat, lon) in enumerate(centers):
+                if ad_geo.in_process:
+                    started = time.perf_counter()
+                    hits = ad_geo.index.nearby(lat, lon, radius, LIMIT)
+                    index_times.append(time.perf_counter() - started)
+                    if i < VERIFIED_QUERIES:
+                        expected = brute_force(points, lat, lon, radius)
+                        found = [ad_id for ad_id, _ in hits]
+                        assert found == expected, (lat, lon, radius)
+
+                started = time.perf_counter()
+                response = await client.get(
+                    f"{API}/ads/ads/nearby",
+                    params={"lat": lat, "lon": lon, "radius_km": radius, "limit": LIMIT},
+                )
+                endpoint_times.append(time.perf_counter() - started)
+                response.raise_for_status()
+            results["radii"][radius] = {"endpoint": summarize(endpoint_times)}
+            if index_times:
+                results["radii"][radius]["index"] = summarize(index_times)
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ads", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.ads, args.queries))
+    print(f"index loaded in {results['index_load_s']:.2f}s")
+    print(f"{'radius km':<11}{'path':<10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    for radius, paths in results["radii"].items():
+        for path, row in paths.items():
+            print(
+                f"{radius:<11}{path:<10}{row['p50_ms']:>9.2f}"
+                f"{row['p95_ms']:>9.2f}{row['max_ms']:>9.2f}"
+            )
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Registration write path: user and profile in separate transactions vs one.
+
+Usage:
+    python -m benchmarks.registration [--users 2000] [--concurrency N] [--json results.json]
+
+Creates users directly through the user database adapter, skipping password
+hashing, which would otherwise dominate the timings. Two strategies run
+against a throwaway SQLite database, or against the database at
+$BENCH_POSTGRES_URL when it is set (its tables are dropped and recreated):
+
+    separate  the previous flow: SQLAlchemyUserDatabase.create() commits and
+              re-reads the user, then a second session inserts and commits
+              the profile
+    single    UserDatabase.create(): user and profile in one transaction
+              (one INSERT statement on Postgres), no re-read
+
+For each it prints registrations per second and statements and commits per
+registration.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from tests.database import use_throwaway_database
+
+# The database URL is read when the app is imported, so it is set up first.
+# Never $DATABASE_URL: the tables are dropped, so Postgres only when asked for
+if __name__ == "__main__":
+    use_throwaway_database(os.environ.get("BENCH_POSTGRES_URL"))
+
+from fastapi_users.db import SQLAlchemyUserDatabase  # noqa: E402
+
+from app.database.base import Base  # noqa: E402
+from app.database.config import async_session_maker, engine  # noqa: E402
+from app.database.deps import UserDatabase  # noqa: E402
+from app.models import User  # noqa: E402
+from app.repositories.profile import UserProfileRepository  # noqa: E402
+
+from benchmarks.round_trips import RoundTripCounter  # noqa: E402
+
+HASHED_PASSWORD = "not-a-real-hash"
+
+
+async def register_separate(email: str) -> None:
+    async with async_session_maker() as session:
+        user = await SQLAlchemyUserDatabase(session, User).create(
+            {"email": email, "hashed_password": HASHED_PASSWORD}
+        )
+    async with async_session_maker() as session:
+        await UserProfileRepository.create_user_profile(user.id, {}, session)
+
+
+async def register_single(email: str) -> None:
+    async with async_session_maker() as session:
+        await UserDatabase(session, User).create(
+            {"email": email, "hashed_password": HASHED_PASSWORD}
+        )
+
+
+STRATEGIES = {"separate": register_separate, "single": register_single}
+
+
+async def measure(
+    name: str, users: int, concurrency: int, counter: RoundTripCounter, prefix: str = ""
+) -> dict:
+    register = STRATEGIES[name]
+    emails = iter(f"{prefix}{name}{i}@bench.example.com" for i in range(users))
+
+    async def worker() -> None:
+        for email in emails:
+            await register(email)
+
+    counter.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "registrations_per_second": users / elapsed,
+        "statements_per_registration": counter.statements / users,
+        "commits_per_registration": counter.commits / users,
+    }
+
+
+async def run(users: int, concurrency: int) -> dict:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    counter = RoundTripCounter()
+    # Warm up connections and statement caches
+    for name in STRATEGIES:
+        await measure(name, min(users, 50), concurrency, counter, prefix="warmup-")
+    results = {}
+    for name in STRATEGIES:
+        results[name] = await measure(name, users, concurrency, counter)
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Registration write path benchmark")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="concurrent registrations (default: 1 on SQLite, which has a single writer; 10 otherwise)",
+    )
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args()
+
+    concurrency = args.concurrency or (
+        1 if os.environ["DATABASE_URL"].startswith("sqlite") else 10
+    )
+    results = asyncio.run(run(args.users, concurrency))
+
+    print(f"{'strategy':<12}{'reg/s':>10}{'statements':>12}{'commits':>9}")
+    for name, row in results.items():
+        print(
+            f"{name:<12}{row['registrations_per_second']:>10.1f}"
+            f"{row['statements_per_registration']:>12.2f}"
+            f"{row['commits_per_registration']:>9.2f}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
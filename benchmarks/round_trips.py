@@ -0,0 +1,114 @@
+"""
+Counts database round trips (statements and commits) per API endpoint.
+
+Usage:
+    python -m benchmarks.round_trips [--json results.json]
+
+Runs every endpoint in-process against a throwaway SQLite database and prints
+how many SQL statements and COMMITs each request issued.
+"""
+
+import argparse
+import asyncio
+import json
+
+from tests.database import use_throwaway_database
+
+# The database URL is read when the app is imported, so it is set up first.
+# Never $DATABASE_URL: the requests write to it
+if __name__ == "__main__":
+    use_throwaway_database()
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.database.config import create_db_and_tables, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+API = settings.API_V1_STR
+
+
+class RoundTripCounter:
+    def __init__(self) -> None:
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_statement)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_statement(self, *args) -> None:
+        self.statements += 1
+
+    def _on_commit(self, *args) -> None:
+        self.commits += 1
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+async def run() -> dict:
+    await create_db_and_tables()
+    counter = RoundTripCounter()
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def measure(name: str, method: str, url: str, **kwargs) -> httpx.Response:
+            counter.reset()
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+            results[name] = {
+                "statements": counter.statements,
+                "commits": counter.commits,
+                "round_trips": counter.statements + counter.commits,
+            }
+            return response
+
+        response = await measure(
+            "register",
+            "POST",
+            f"{API}/auth/register",
+            json={"email": "bench@example.com", "password": "benchmark-password"},
+        )
+        user_id = response.json()["id"]
+
+        response = await measure(
+            "create_ad",
+            "POST",
+            f"{API}/ads/ads/",
+            json={"owner_id": user_id, "title": "Room", "budget": 500},
+        )
+        ad_id = response.json()["ad_id"]
+        await measure("update_ad", "PUT", f"{API}/ads/ads/{ad_id}", json={"budget": 550})
+        await measure(
+            "update_profile",
+            "PUT",
+            f"{API}/profiles/profiles/{user_id}",
+            json={"first_name": "Bench", "gender": None, "birth_date": None,
+                  "image_url": None},
+        )
+        await measure("delete_ad", "DELETE", f"{API}/ads/ads/{ad_id}")
+        await measure("delete_profile", "DELETE", f"{API}/profiles/profiles/{user_id}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run())
+    print(f"{'endpoint':<16}{'statements':>12}{'commits':>10}{'round trips':>14}")
+    for name, counts in results.items():
+        print(
+            f"{name:<16}{counts['statements']:>12}{counts['commits']:>10}"
+            f"{counts['round_trips']:>14}"
+        )
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
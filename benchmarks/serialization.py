@@ -0,0 +1,142 @@
+"""
+List endpoint throughput with and without FAST_LIST_SERIALIZATION.
+
+Usage:
+    python -m benchmarks.serialization [--rows 5000] [--repeat 20] [--json results.json]
+
+Seeds a throwaway SQLite database (or $BENCH_POSTGRES_URL, whose tables are
+dropped and recreated) with `--rows` profiles and `--rows` ads of a single owner, then
+requests each list endpoint in-process `--repeat` times per mode and prints
+rows served per second:
+
+    ads_page      GET /ads?limit=<ADS_MAX_PAGE_SIZE>
+    ads_by_owner  GET /ads/owner/{owner_id}   (all --rows ads)
+    profiles      GET /profiles               (all --rows profiles)
+
+"orm" is the regular path (ORM objects validated into the response model),
+"fast" selects the response columns and encodes them in one pass.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from tests.database import use_throwaway_database
+
+# The database URL is read when the app is imported, so it is set up first.
+# Never $DATABASE_URL: the tables are dropped, so Postgres only when asked for
+if __name__ == "__main__":
+    use_throwaway_database(os.environ.get("BENCH_POSTGRES_URL"))
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.database.base import Base  # noqa: E402
+from app.database.config import async_session_maker, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Ad, User, UserProfile  # noqa: E402
+from app.models.ads import Gender as AdGender  # noqa: E402
+from app.models.profiles import Gender as ProfileGender  # noqa: E402
+
+API = settings.API_V1_STR
+MODES = {"orm": False, "fast": True}
+
+
+async def seed(rows: int) -> uuid.UUID:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    user_ids = [uuid.uuid4() for _ in range(rows)]
+    now = datetime.now(timezone.utc)
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(User),
+            [
+                {"id": user_id, "email": f"user{i}@bench.example.com",
+                 "hashed_password": "not-a-real-hash"}
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        await session.execute(
+            insert(UserProfile),
+            [
+                {"id": uuid.uuid4(), "user_id": user_id, "first_name": f"User{i}",
+                 "last_name": "Bench", "bio": "Quiet, tidy, likes cooking",
+                 "gender": list(ProfileGender)[i % 2],
+                 "birth_date": date(1990, 1, 1) + timedelta(days=i % 3000),
+                 "image_url": f"https://img.example.com/{i}.jpg"}
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        await session.execute(
+            insert(Ad),
+            [
+                {"ad_id": uuid.uuid4(), "owner_id": user_ids[0], "title": f"Room {i}",
+                 "description": "Bright room close to the university",
+                 "budget": Decimal(300 + i % 700), "number_of_roommates": i % 4,
+                 "age_requirements": 18 + i % 20, "gender": list(AdGender)[i % 3],
+                 "nationality": "any", "lifestyle": "student",
+                 "created_at": now - timedelta(seconds=i)}
+                for i in range(rows)
+            ],
+        )
+        await session.commit()
+    return user_ids[0]
+
+
+async def run(rows: int, repeat: int) -> dict:
+    owner_id = await seed(rows)
+    endpoints = {
+        "ads_page": (f"{API}/ads/ads/", {"limit": settings.ADS_MAX_PAGE_SIZE}),
+        "ads_by_owner": (f"{API}/ads/ads/owner/{owner_id}", {}),
+        "profiles": (f"{API}/profiles/profiles/", {}),
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, (url, params) in endpoints.items():
+            bodies = {}
+            for mode, fast in MODES.items():
+                settings.FAST_LIST_SERIALIZATION = fast
+                response = await client.get(url, params=params)  # warm-up
+                response.raise_for_status()
+                bodies[mode] = response.content
+                body = response.json()
+                count = len(body["items"] if isinstance(body, dict) else body)
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    await client.get(url, params=params)
+                elapsed = time.perf_counter() - started
+                results.setdefault(name, {})[mode] = count * repeat / elapsed
+            assert bodies["orm"] == bodies["fast"], f"{name}: responses differ"
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.rows, args.repeat))
+    print(f"{'endpoint':<14}{'orm rows/s':>12}{'fast rows/s':>13}{'speedup':>9}")
+    for name, row in results.items():
+        print(
+            f"{name:<14}{row['orm']:>12.0f}{row['fast']:>13.0f}"
+            f"{row['fast'] / row['orm']:>8.2f}x"
+        )
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Add ads.created_at and the keyset pagination indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Ads created before the column existed get the time of the upgrade; their
+order among themselves then follows ad_id. Steps already applied (e.g. by
+create_all on a new database) are skipped.
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = {
+    "ix_ads_created_at_ad_id": ["created_at", "ad_id"],
+    "ix_ads_owner_created_at": ["owner_id", "created_at", "ad_id"],
+    "ix_ads_gender_created_at": ["gender", "created_at", "ad_id"],
+    "ix_ads_roommates_created_at": ["number_of_roommates", "created_at", "ad_id"],
+    "ix_ads_age_created_at": ["age_requirements", "created_at", "ad_id"],
+    "ix_ads_nationality_created_at": ["nationality", "created_at", "ad_id"],
+    "ix_ads_budget_created_at": ["budget", "created_at", "ad_id"],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("ads")}
+    if "created_at" not in columns:
+        created_at = sa.DateTime(timezone=True)
+        op.add_column("ads", sa.Column("created_at", created_at, nullable=True))
+        ads = sa.table("ads", sa.column("created_at", created_at))
+        op.execute(ads.update().values(created_at=datetime.now(timezone.utc)))
+        with op.batch_alter_table("ads") as batch:
+            batch.alter_column("created_at", existing_type=created_at, nullable=False)
+
+    inspector = sa.inspect(op.get_bind())
+    existing = {index["name"] for index in inspector.get_indexes("ads")}
+    for name, columns in _INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "ads", columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in _INDEXES:
+        op.drop_index(name, table_name="ads")
+    with op.batch_alter_table("ads") as batch:
+        batch.drop_column("created_at")
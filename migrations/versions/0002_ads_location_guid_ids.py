@@ -0,0 +1,121 @@
+"""Add ad locations; store SQLite ids in the GUID form
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Adds ads.latitude, ads.longitude and ads.geohash (empty for existing ads) and,
+on Postgres with the postgis extension, the GiST index of nearby search.
+
+On SQLite the ids of ads, profiles and jobs were declared as "UUID" and
+stored as 32 hex characters. They are now GUID columns, CHAR(36) holding the
+dashed form, like users.id. The columns are recreated as CHAR(36) and the
+stored ids rewritten. Ids that SQLite had already turned into numbers cannot
+be recovered and are left as they are. Postgres stores native UUIDs either
+way and needs no change.
+
+Steps already applied (e.g. by create_all on a new database) are skipped.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_LOCATION_COLUMNS = {
+    "latitude": sa.Float(),
+    "longitude": sa.Float(),
+    "geohash": sa.String(12),
+}
+
+_LOCATION_INDEX = "ix_ads_location"
+_LOCATION = "geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))"
+
+# SQLite id columns switched from postgresql.UUID to GUID
+_ID_COLUMNS = {
+    "ads": ["ad_id", "owner_id"],
+    "profiles": ["id", "user_id"],
+    "jobs": ["id"],
+}
+
+
+def _dashed(column: str) -> str:
+    return (
+        f"lower(substr({column}, 1, 8) || '-' || substr({column}, 9, 4) || '-' || "
+        f"substr({column}, 13, 4) || '-' || substr({column}, 17, 4) || '-' || "
+        f"substr({column}, 21))"
+    )
+
+
+def _postgis_installed(bind) -> bool:
+    query = sa.text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")
+    return bind.execute(query).scalar() is not None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {column["name"] for column in inspector.get_columns("ads")}
+    for name, type_ in _LOCATION_COLUMNS.items():
+        if name not in columns:
+            op.add_column("ads", sa.Column(name, type_, nullable=True))
+
+    if bind.dialect.name == "postgresql" and _postgis_installed(bind):
+        op.create_index(
+            _LOCATION_INDEX,
+            "ads",
+            [sa.text(_LOCATION)],
+            postgresql_using="gist",
+            if_not_exists=True,
+        )
+
+    if bind.dialect.name != "sqlite":
+        return
+    tables = set(inspector.get_table_names())
+    for table, names in _ID_COLUMNS.items():
+        if table not in tables:
+            continue
+        types = {
+            column["name"]: column["type"]
+            for column in sa.inspect(bind).get_columns(table)
+        }
+        to_alter = [name for name in names if not isinstance(types[name], sa.CHAR)]
+        if to_alter:
+            with op.batch_alter_table(table) as batch:
+                for name in to_alter:
+                    batch.alter_column(
+                        name, existing_type=types[name], type_=sa.CHAR(36)
+                    )
+        for name in names:
+            op.execute(
+                f"UPDATE {table} SET {name} = {_dashed(name)} "
+                f"WHERE typeof({name}) = 'text' AND length({name}) = 32"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        # Back to the hex form that postgresql.UUID binds on SQLite
+        tables = set(sa.inspect(bind).get_table_names())
+        for table, names in _ID_COLUMNS.items():
+            if table not in tables:
+                continue
+            for name in names:
+                op.execute(
+                    f"UPDATE {table} SET {name} = replace({name}, '-', '') "
+                    f"WHERE length({name}) = 36"
+                )
+
+    if bind.dialect.name == "postgresql":
+        op.drop_index(_LOCATION_INDEX, table_name="ads", if_exists=True)
+    with op.batch_alter_table("ads") as batch:
+        for name in _LOCATION_COLUMNS:
+            batch.drop_column(name)
@@ -0,0 +1,48 @@
+from tests.database import use_throwaway_database
+
+# Before the app (and its engine) is imported by anything below
+use_throwaway_database()
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+import pytest_asyncio  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.database.base import Base  # noqa: E402
+from app.database.config import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+class StatementCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args) -> None:
+        self.count += 1
+
+
+@pytest_asyncio.fixture
+async def database():
+    """Empty tables in the throwaway database; yields the app's engine."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(database):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def statements(database):
+    """Counts the SQL statements sent to the database during the test."""
+    counter = StatementCounter()
+    event.listen(database.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(database.sync_engine, "before_cursor_execute", counter)
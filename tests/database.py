@@ -0,0 +1,24 @@
+"""
+Throwaway database for the test suite and the benchmarks.
+
+The app reads DATABASE_URL when it is first imported, so
+use_throwaway_database() has to run before anything imports `app`.
+"""
+
+import os
+import tempfile
+from typing import Optional
+
+
+def use_throwaway_database(url: Optional[str] = None) -> str:
+    """
+    Point the app at `url`, or at a new SQLite file when it is None.
+
+    Never at $DATABASE_URL: callers drop and recreate the tables. The rate
+    limiter is switched off as well, since every request comes from one client.
+    """
+    if url is None:
+        url = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='app-')}/test.db"
+    os.environ["DATABASE_URL"] = url
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    return url
@@ -0,0 +1,94 @@
+"""
+The owner profiles of an ads page and the profile of the current user are
+loaded eagerly: the number of statements must not grow with the page size.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.database.config import async_session_maker
+from app.models import Ad, User, UserProfile
+
+API = settings.API_V1_STR
+PASSWORD = "test-password"
+
+
+async def add_owners(start: int, stop: int) -> None:
+    """Users `start`..`stop - 1`, each with a profile and one ad."""
+    user_ids = [uuid.uuid4() for _ in range(start, stop)]
+    now = datetime.now(timezone.utc)
+    async with async_session_maker() as session:
+        await session.execute(
+            insert(User),
+            [
+                {"id": user_id, "email": f"owner{i}@test.example.com",
+                 "hashed_password": "not-a-real-hash"}
+                for i, user_id in enumerate(user_ids, start)
+            ],
+        )
+        await session.execute(
+            insert(UserProfile),
+            [
+                {"id": uuid.uuid4(), "user_id": user_id, "first_name": f"Owner{i}"}
+                for i, user_id in enumerate(user_ids, start)
+            ],
+        )
+        await session.execute(
+            insert(Ad),
+            [
+                {"ad_id": uuid.uuid4(), "owner_id": user_id, "title": f"Room {i}",
+                 "created_at": now - timedelta(seconds=i)}
+                for i, user_id in enumerate(user_ids, start)
+            ],
+        )
+        await session.commit()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", ["joined", "selectin"])
+async def test_statement_count_does_not_grow_with_page_size(
+    client, statements, monkeypatch, strategy
+):
+    monkeypatch.setattr(settings, "EAGER_LOADING_STRATEGY", strategy)
+    response = await client.post(
+        f"{API}/auth/register", json={"email": "me@test.example.com", "password": PASSWORD}
+    )
+    response.raise_for_status()
+    response = await client.post(
+        f"{API}/auth/jwt/login",
+        data={"username": "me@test.example.com", "password": PASSWORD},
+    )
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    # The first request also fills the token cache: keep it out of the counts
+    response = await client.get(f"{API}/users/me/profile", headers=headers)
+    response.raise_for_status()
+
+    counts = {"ads_with_owner_profile": [], "me_profile": []}
+    owners = 0
+    for size in (2, 20):
+        await add_owners(owners, size)
+        owners = size
+
+        statements.count = 0
+        response = await client.get(
+            f"{API}/ads/ads/", params={"limit": size, "include": "owner_profile"}
+        )
+        response.raise_for_status()
+        items = response.json()["items"]
+        assert len(items) == size
+        assert all(item["owner_profile"] for item in items)
+        counts["ads_with_owner_profile"].append(statements.count)
+
+        statements.count = 0
+        response = await client.get(f"{API}/users/me/profile", headers=headers)
+        response.raise_for_status()
+        assert response.json()["profile"] is not None
+        counts["me_profile"].append(statements.count)
+
+    for endpoint, (small, large) in counts.items():
+        assert small == large, endpoint
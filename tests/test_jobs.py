@@ -0,0 +1,138 @@
+"""
+Claiming, retrying and completing outbox jobs on the throwaway SQLite database.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database.config import async_session_maker
+from app.models.jobs import Job, JobStatus
+from app.repositories.job import JobRepository
+from app.services import jobs
+from app.services.jobs import JobWorker, enqueue
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+async def all_jobs():
+    async with async_session_maker() as session:
+        return list((await session.execute(select(Job))).scalars().all())
+
+
+async def no_jobs_left() -> bool:
+    return not await all_jobs()
+
+
+@pytest.fixture
+def worker(database):
+    return JobWorker(async_session_maker, concurrency=4, poll_interval=0.01, lease_seconds=5)
+
+
+@pytest.mark.asyncio
+async def test_successful_job_is_deleted(worker, monkeypatch):
+    done = []
+
+    async def handler(payload):
+        done.append(payload)
+
+    monkeypatch.setitem(jobs._handlers, "test.ok", handler)
+    async with async_session_maker() as session:
+        await enqueue(session, "test.ok", {"n": 1})
+
+    worker.start()
+    try:
+        await wait_until(no_jobs_left)
+    finally:
+        await worker.stop(grace=1)
+    assert done == [{"n": 1}]
+
+
+@pytest.mark.asyncio
+async def test_failing_job_is_retried_until_failed(worker, monkeypatch):
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        raise ValueError("boom")
+
+    monkeypatch.setitem(jobs._handlers, "test.fail", handler)
+    # Retry right away instead of after the real backoff
+    monkeypatch.setattr(jobs, "backoff", lambda attempts: 0.0)
+    async with async_session_maker() as session:
+        await enqueue(session, "test.fail", {}, max_attempts=3)
+
+    async def failed() -> bool:
+        return [job.status for job in await all_jobs()] == [JobStatus.FAILED]
+
+    worker.start()
+    try:
+        await wait_until(failed)
+    finally:
+        await worker.stop(grace=1)
+
+    [job] = await all_jobs()
+    assert len(calls) == 3
+    assert job.attempts == 3
+    assert job.last_error == "ValueError: boom"
+    assert job.locked_until is None
+    async with async_session_maker() as session:
+        assert await JobRepository.claim_due_jobs(10, 5, session) == []
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_claimed_again(database):
+    async with async_session_maker() as session:
+        job = await enqueue(session, "test.crash", {})
+
+    async with async_session_maker() as session:
+        [claimed] = await JobRepository.claim_due_jobs(10, 60, session)
+    assert claimed.id == job.id
+    assert claimed.status == JobStatus.RUNNING
+    assert claimed.attempts == 1
+
+    # Still leased to the first worker
+    async with async_session_maker() as session:
+        assert await JobRepository.claim_due_jobs(10, 60, session) == []
+
+    # The first worker crashed and its lease ran out
+    async with async_session_maker() as session:
+        await session.execute(
+            update(Job)
+            .where(Job.id == job.id)
+            .values(locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+        )
+        await session.commit()
+
+    async with async_session_maker() as session:
+        [reclaimed] = await JobRepository.claim_due_jobs(10, 60, session)
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+    # The crashed worker's late result is ignored: its attempt is no longer current
+    async with async_session_maker() as session:
+        await JobRepository.complete(claimed, session)
+    assert [row.id for row in await all_jobs()] == [job.id]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_never_share_a_job(database):
+    async with async_session_maker() as session:
+        enqueued = [(await enqueue(session, "test.claim", {"n": n})).id for n in range(20)]
+
+    async def claim():
+        async with async_session_maker() as session:
+            return await JobRepository.claim_due_jobs(20, 60, session)
+
+    batches = await asyncio.gather(*(claim() for _ in range(4)))
+    claimed = [job.id for batch in batches for job in batch]
+    assert len(claimed) == len(set(claimed))
+    assert sorted(claimed) == sorted(enqueued)
+    assert all(job.attempts == 1 for batch in batches for job in batch)
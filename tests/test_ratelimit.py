@@ -0,0 +1,207 @@
+"""
+Token buckets, route rules and load shedding of app.core.ratelimit, on a fake
+clock.
+"""
+
+import types
+
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+
+from app.core import ratelimit
+from app.core.ratelimit import (
+    Limit,
+    LoadShedder,
+    LocalBucketStore,
+    RateLimitMiddleware,
+    RouteLimits,
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", types.SimpleNamespace(monotonic=clock))
+    return clock
+
+
+class FakePoolStats:
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.timeouts = 0
+
+
+async def ok_app(scope, receive, send):
+    await JSONResponse({"ok": True})(scope, receive, send)
+
+
+def client_for(middleware):
+    transport = httpx.ASGITransport(app=middleware)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_bucket_allows_burst_then_refills(clock):
+    store = LocalBucketStore()
+    limit = Limit(rate=2, burst=3)
+
+    assert [store.take_now("a", limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take_now("a", limit) == 0.5
+    # Other keys have buckets of their own
+    assert store.take_now("b", limit) == 0.0
+
+    # A rejected request takes nothing: half a token has refilled
+    clock.now = 0.25
+    assert store.take_now("a", limit) == 0.25
+    clock.now = 0.5
+    assert store.take_now("a", limit) == 0.0
+
+    # Never more than the burst, however long the bucket was idle
+    clock.now = 100
+    assert [store.take_now("a", limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take_now("a", limit) == 0.5
+
+
+def test_full_buckets_are_dropped_at_max_keys(clock):
+    store = LocalBucketStore(max_keys=2)
+    limit = Limit(rate=1, burst=2)
+    store.take_now("a", limit)
+    store.take_now("b", limit)
+    store.take_now("b", limit)
+
+    # "a" is full again after 1s, "b" only after 2s
+    clock.now = 1.5
+    store.take_now("c", limit)
+    assert set(store._buckets) == {"b", "c"}
+
+
+def test_route_rules_match_templates_and_ignore_trailing_slashes():
+    limits = RouteLimits(
+        Limit(10, 50),
+        {
+            "GET /api/v1/ads/ads/{ad_id}": (1, 2),
+            "POST /api/v1/auth/register/": (0.1, 3),
+        },
+    )
+
+    for method, path in [
+        ("GET", "/api/v1/ads/ads/123"),
+        ("GET", "/api/v1/ads/ads/123/"),
+        ("HEAD", "/api/v1/ads/ads/123"),
+    ]:
+        assert limits.resolve(method, path) == ("GET /api/v1/ads/ads/{ad_id}", Limit(1, 2))
+    for path in ("/api/v1/auth/register", "/api/v1/auth/register/"):
+        assert limits.resolve("POST", path) == ("POST /api/v1/auth/register/", Limit(0.1, 3))
+    for method, path in [
+        ("DELETE", "/api/v1/ads/ads/123"),
+        ("GET", "/api/v1/ads/ads/123/images"),
+        ("GET", "/api/v1/auth/register"),
+    ]:
+        assert limits.resolve(method, path) == (RouteLimits.DEFAULT, Limit(10, 50))
+
+
+def test_rules_for_missing_routes_are_reported():
+    from app.main import app
+
+    limits = RouteLimits(
+        Limit(10, 50),
+        {
+            "GET /api/v1/ads/ads/{ad_id}": (1, 2),
+            "POST /api/v1/auth/register/": (0.1, 3),
+            "GET /api/v1/ads/{ad_id}": (1, 2),
+        },
+    )
+    assert limits.unmatched(app.router.routes) == ["GET /api/v1/ads/{ad_id}"]
+
+
+def test_shedder_counts_requests_in_flight(clock):
+    shedder = LoadShedder(max_in_flight=2, max_db_wait=0.5, window=1)
+    shedder.in_flight = 1
+    assert not shedder.overloaded()
+    shedder.in_flight = 2
+    assert shedder.overloaded()
+
+
+def test_shedder_samples_pool_checkouts_once_per_window(clock):
+    stats = FakePoolStats()
+    shedder = LoadShedder(max_in_flight=100, max_db_wait=0.5, window=1, pool_stats=[stats])
+
+    # Checkouts waited 1s on average, seen once the window is over
+    stats.checkouts, stats.wait_time_total = 10, 10.0
+    clock.now = 0.5
+    assert not shedder.overloaded()
+    clock.now = 1.0
+    assert shedder.overloaded()
+    clock.now = 1.5
+    assert shedder.overloaded()
+
+    # Only the last window counts
+    stats.checkouts, stats.wait_time_total = 20, 11.0
+    clock.now = 2.0
+    assert not shedder.overloaded()
+
+    # A single timeout is enough, whatever the wait
+    stats.timeouts = 1
+    clock.now = 3.0
+    assert shedder.overloaded()
+
+
+@pytest.mark.asyncio
+async def test_middleware_answers_429_with_retry_after(clock):
+    limits = RouteLimits(Limit(10, 50), {"GET /slow": (0.25, 1)})
+    middleware = RateLimitMiddleware(
+        ok_app,
+        limits,
+        LocalBucketStore(),
+        LoadShedder(max_in_flight=10, max_db_wait=0.5, window=1),
+        identify=lambda token: None,
+    )
+    async with client_for(middleware) as client:
+        assert (await client.get("/slow")).status_code == 200
+        response = await client.get("/slow/")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "4"
+        # The default bucket is separate
+        assert (await client.get("/other")).status_code == 200
+
+        clock.now = 4
+        assert (await client.get("/slow")).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_load_with_503(clock):
+    stats = FakePoolStats()
+    shedder = LoadShedder(max_in_flight=1, max_db_wait=0.5, window=2, pool_stats=[stats])
+    middleware = RateLimitMiddleware(
+        ok_app,
+        RouteLimits(Limit(1000, 1000), {}),
+        LocalBucketStore(),
+        shedder,
+        identify=lambda token: None,
+        exempt_paths=["/metrics"],
+    )
+    async with client_for(middleware) as client:
+        assert (await client.get("/ads")).status_code == 200
+        assert shedder.in_flight == 0
+
+        shedder.in_flight = 1
+        response = await client.get("/ads")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+        assert (await client.get("/metrics")).status_code == 200
+        shedder.in_flight = 0
+
+        stats.checkouts, stats.timeouts = 1, 1
+        clock.now = 2
+        assert (await client.get("/ads")).status_code == 503
+        clock.now = 4
+        assert (await client.get("/ads")).status_code == 200
@@ -0,0 +1,163 @@
+"""
+SavedSearchIndex.match() must return exactly the searches a full scan with
+_Search.matches() finds, whatever bucket each search ended up in.
+"""
+
+import random
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.models.ads import Gender
+from app.services.saved_searches import (
+    _MAX_BUDGET_BANDS,
+    SavedSearchIndex,
+    _decode_change,
+    _encode_change,
+    _Search,
+)
+from app.services.search import tokenize
+
+WORDS = ["sunny", "quiet", "room", "balcony", "garden", "central", "cosy", "studio"]
+USERS = [uuid.uuid4() for _ in range(5)]
+
+
+def random_budget_range(rng: random.Random):
+    kind = rng.choice(["none", "min", "max", "narrow", "wide"])
+    low = Decimal(rng.randint(1, 2000))
+    if kind == "none":
+        return None, None
+    if kind == "min":
+        return low, None
+    if kind == "max":
+        return None, low
+    if kind == "narrow":
+        return low, low * rng.randint(1, 4)
+    # More power-of-two bands than are indexed
+    return low, low * 2 ** (_MAX_BUDGET_BANDS + rng.randint(0, 3))
+
+
+def random_search(rng: random.Random):
+    budget_min, budget_max = random_budget_range(rng)
+    words = rng.sample(WORDS, rng.choice([0, 0, 1, 2]))
+    return {
+        "id": uuid.uuid4(),
+        "user_id": rng.choice(USERS),
+        "query": " ".join(words) or None,
+        "gender": rng.choice([None, Gender.MALE, Gender.FEMALE]),
+        "number_of_roommates": rng.choice([None, 1, 2]),
+        "age_requirements": rng.choice([None, 18, 25]),
+        "nationality": rng.choice([None, "FR", "DE"]),
+        "budget_min": budget_min,
+        "budget_max": budget_max,
+    }
+
+
+def random_ad(rng: random.Random):
+    budget = rng.choice([None, Decimal("0.5"), Decimal(rng.randint(1, 600000))])
+    return {
+        "ad_id": uuid.uuid4(),
+        "owner_id": rng.choice(USERS),
+        "title": " ".join(rng.sample(WORDS, rng.randint(0, 3))),
+        "description": " ".join(rng.sample(WORDS, rng.randint(0, 3))) or None,
+        "gender": rng.choice([None, Gender.MALE, Gender.FEMALE]),
+        "number_of_roommates": rng.choice([None, 1, 2]),
+        "age_requirements": rng.choice([None, 18, 25]),
+        "nationality": rng.choice([None, "FR", "DE"]),
+        "budget": budget,
+    }
+
+
+def brute_force(searches, ad):
+    terms = set(tokenize(ad["title"] or "")) | set(tokenize(ad["description"] or ""))
+    return sorted(
+        (search["id"], search["user_id"])
+        for search in searches
+        if search["user_id"] != ad["owner_id"] and _Search(search).matches(ad, terms)
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_match_agrees_with_a_full_scan(seed):
+    rng = random.Random(seed)
+    searches = [random_search(rng) for _ in range(300)]
+    ads = [random_ad(rng) for _ in range(300)]
+    index = SavedSearchIndex()
+    for search in searches:
+        index.upsert(search)
+
+    matched = 0
+    for ad in ads:
+        expected = brute_force(searches, ad)
+        assert sorted(index.match(ad)) == expected
+        matched += len(expected)
+    # The comparison means little if nothing ever matches
+    assert matched > 0
+
+    removed, searches = searches[::3], [s for i, s in enumerate(searches) if i % 3]
+    for search in removed:
+        index.remove({"id": search["id"]})
+    assert len(index) == len(searches)
+    for ad in ads:
+        assert sorted(index.match(ad)) == brute_force(searches, ad)
+
+
+def test_owner_is_not_alerted_about_their_own_ad():
+    owner, other = USERS[:2]
+    index = SavedSearchIndex()
+    for user_id in (owner, other):
+        index.upsert({"id": uuid.uuid4(), "user_id": user_id, "query": "balcony"})
+    ad = {"ad_id": uuid.uuid4(), "owner_id": owner, "title": "Room with a balcony"}
+
+    assert [user_id for _, user_id in index.match(ad)] == [other]
+
+
+def test_updated_search_moves_to_its_new_bucket():
+    search = {"id": uuid.uuid4(), "user_id": USERS[0], "query": "garden"}
+    index = SavedSearchIndex()
+    index.upsert(search)
+    index.upsert({**search, "query": None, "budget_min": Decimal(100)})
+    ad = {"ad_id": uuid.uuid4(), "owner_id": USERS[1], "budget": Decimal(150)}
+
+    assert index.match(ad) == [(search["id"], USERS[0])]
+    assert index.match({**ad, "budget": Decimal(50), "title": "garden"}) == []
+
+
+def test_change_messages_round_trip():
+    search = {
+        "id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "query": "sunny studio",
+        "gender": Gender.FEMALE,
+        "number_of_roommates": 2,
+        "age_requirements": None,
+        "nationality": "FR",
+        "budget_min": Decimal("300.50"),
+        "budget_max": None,
+        "name": "not sent",
+    }
+    for name in ("saved_search.created", "saved_search.updated"):
+        op, decoded = _decode_change(_encode_change(name, search))
+        assert op == "upsert"
+        assert decoded == {
+            **{key: value for key, value in search.items() if key != "name"},
+            "gender": "female",
+        }
+
+    # A worker that applies the message matches the ads the sender would
+    index = SavedSearchIndex()
+    index.upsert(decoded)
+    ad = {
+        "ad_id": uuid.uuid4(),
+        "owner_id": USERS[0],
+        "title": "Sunny studio",
+        "gender": Gender.FEMALE,
+        "number_of_roommates": 2,
+        "nationality": "FR",
+        "budget": Decimal(400),
+    }
+    assert index.match(ad) == [(search["id"], search["user_id"])]
+
+    op, decoded = _decode_change(_encode_change("saved_search.deleted", search))
+    assert (op, decoded) == ("delete", {"id": search["id"]})